@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+##
+## Compares the shared memory ControlBlock against the old
+## multiprocessing.Manager().dict() control plane
+##
+##      - flag read throughput (reads per second)
+##      - startup RSS (gadget process + any helper server process)
+##
+## and the CPU used by the idle loop, busy-spin vs blocking on
+## GadgetEvents
+##
+## usage: python3 bench_control.py [reads] [idle seconds]
+##
+
+import os
+import sys
+import time
+import json
+import subprocess
+import multiprocessing
+
+from control import ControlBlock, GadgetEvents
+
+
+def rss_kb(pid):
+    try:
+        with open('/proc/{}/status'.format(pid)) as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+
+    except IOError:
+        pass
+
+    return 0
+
+
+def build(design):
+    if design == 'manager':
+        manager = multiprocessing.Manager()
+        d = manager.dict()
+        d['search'] = False
+        d['blocking'] = False
+        d['subject_found'] = False
+        return manager, d
+
+    else:
+        cb = ControlBlock()
+        cb.search = False
+        cb.blocking = False
+        cb.subject_found = False
+        return None, cb
+
+
+def read_throughput(design, reads):
+    manager, plane = build(design)
+
+    s = time.perf_counter()
+
+    if design == 'manager':
+        for i in range(reads):
+            plane['search']
+
+    else:
+        for i in range(reads):
+            plane.search
+
+    elapsed = time.perf_counter()-s
+
+    if manager is not None:
+        manager.shutdown()
+
+    return reads/elapsed
+
+
+def startup_rss(design):
+    ##
+    ## run in a fresh interpreter so that the two designs
+    ## don't share any allocations
+    ##
+    out = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--rss', design])
+    return json.loads(out.decode('utf-8'))
+
+
+def _rss_child(design):
+    before = rss_kb(os.getpid())
+    manager, plane = build(design)
+    after = rss_kb(os.getpid())
+
+    server = 0
+    if manager is not None:
+        server = rss_kb(manager._process.pid)
+
+    print(json.dumps({
+        'process_delta_kb' : after-before,
+        'server_kb' : server,
+        'total_kb' : (after-before)+server
+    }))
+
+    if manager is not None:
+        manager.shutdown()
+
+
+def idle_cpu(design, seconds):
+    ##
+    ## fraction of one core used by the idle loop, measured in a
+    ## separate process so nothing else is counted
+    ##
+    events = GadgetEvents()
+    result = multiprocessing.RawValue('d', 0.0)
+
+    def waiter():
+        start = time.process_time()
+        end = time.monotonic()+seconds
+
+        if design == 'busy_spin':
+            ##
+            ## the old _ev3_waiter
+            ##
+            while time.monotonic() < end:
+                time.sleep(0)
+
+        else:
+            while time.monotonic() < end:
+                if events.wait(timeout=max(0, end-time.monotonic())) & GadgetEvents.SHUTDOWN:
+                    break
+
+        result.value = (time.process_time()-start)/seconds
+
+    p = multiprocessing.Process(target=waiter)
+    p.start()
+    p.join()
+
+    return result.value
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--rss':
+        _rss_child(sys.argv[2])
+        sys.exit(0)
+
+    reads = 100000
+    if len(sys.argv) > 1:
+        reads = int(sys.argv[1])
+
+    seconds = 5
+    if len(sys.argv) > 2:
+        seconds = float(sys.argv[2])
+
+    results = {}
+    for design in ('manager', 'control_block'):
+        n = reads
+        if design == 'manager':
+            ##
+            ## each Manager read is an IPC round trip ... keep it short
+            ##
+            n = max(1, reads//100)
+
+        results[design] = {
+            'reads_per_second' : read_throughput(design, n),
+            'rss' : startup_rss(design)
+        }
+
+    for design in ('manager', 'control_block'):
+        r = results[design]
+        print('[+] {:14s} {:>14,.0f} flag reads/s   startup RSS +{} kB (server process {} kB)'.format(
+            design, r['reads_per_second'], r['rss']['total_kb'], r['rss']['server_kb']))
+
+    speedup = results['control_block']['reads_per_second']/results['manager']['reads_per_second']
+    saved = results['manager']['rss']['total_kb']-results['control_block']['rss']['total_kb']
+
+    print('[+] ControlBlock reads are {:.0f}x faster and save {} kB of RSS'.format(speedup, saved))
+
+    before = idle_cpu('busy_spin', seconds)
+    after = idle_cpu('events', seconds)
+
+    print('[+] idle loop CPU over {:.0f} s: busy-spin {:.1f}% -> blocking {:.2f}%'.format(seconds, before*100, after*100))
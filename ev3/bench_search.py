@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+
+##
+## Monte Carlo time-to-find benchmark for the search strategies
+##
+## Every trial drops the subject (a disc of color) at a random spot on
+## the floor and replays a strategy's legs (patterns.py) with the robot
+## constants of the simulator, until the color sensor would confirm the
+## subject or the time limit runs out.  Trials are spread over a
+## process pool.
+##
+## Turns are taken as exact here (the turn controller settles within a
+## degree or so), so this measures the strategies, not the turn
+## controller ... use sim.py for that.
+##
+## usage: python3 bench_search.py [trials] [strategy ...]
+##
+##      strategies: spiral, perimeter, perimeter:<columns>x<rows>,
+##      expanding_square, sector, parallel_track, creeping_line
+##
+
+import sys
+import math
+import random
+import datetime
+import multiprocessing
+
+import sim
+import patterns
+
+from grid import GridGraph
+from planner import RoutePlanner
+
+
+##
+## the gadget's defaults (main.py)
+##
+FIELD = (120.0, 120.0)
+SUBJECT_RADIUS = 4.0
+SENSOR_FOOTPRINT = 2.0
+COVERAGE_FACTOR = 1.5
+DRIVE_SPEED = 70
+TURN_SPEED = 50
+TIME_LIMIT = 1800.0
+
+##
+## color sampler: a find needs HITS matching samples at RATE Hz
+##
+RATE = 50
+HITS = 3
+
+
+class Robot(object):
+    """
+    Replays legs for one trial, tracking time, distance and turns
+    """
+
+    def __init__( self, x, y, heading, subject, radius, limit,
+                  drive_speed=DRIVE_SPEED,
+                  turn_speed=TURN_SPEED ):
+        self.x = x
+        self.y = y
+        self.theta = math.radians(heading)
+        self.t = 0.0
+        self.distance = 0.0
+        self.turns = 0
+
+        self.subject = subject
+        self.radius = radius
+        self.limit = limit
+
+        self.found = None
+
+        self.drive_rps = drive_speed/100.0*sim.MAX_RPS
+        wheel = turn_speed/100.0*sim.MAX_RPS*sim.INCHES_PER_ROTATION
+        self.turn_rate = 2*wheel/sim.TRACK
+
+        ##
+        ## time the sensor has to stay on the subject to be confirmed
+        ##
+        self.confirm = HITS/float(RATE)
+
+
+    def sensor(self):
+        return ( self.x+sim.SENSOR_OFFSET*math.sin(self.theta),
+                 self.y-sim.SENSOR_OFFSET*math.cos(self.theta) )
+
+
+    def _sweep(self, a, b, duration):
+        """
+        Sensor moves a -> b in duration seconds from self.t ... records
+        the find if it stays on the subject long enough
+        """
+        sx, sy = self.subject
+        dx, dy = b[0]-a[0], b[1]-a[1]
+        fx, fy = a[0]-sx, a[1]-sy
+
+        qa = dx*dx+dy*dy
+        qb = 2*(fx*dx+fy*dy)
+        qc = fx*fx+fy*fy-self.radius*self.radius
+
+        if qa == 0:
+            if qc <= 0 and duration >= self.confirm:
+                self.found = self.t+self.confirm
+            return
+
+        disc = qb*qb-4*qa*qc
+        if disc < 0:
+            return
+
+        root = math.sqrt(disc)
+        u0 = max(0.0, (-qb-root)/(2*qa))
+        u1 = min(1.0, (-qb+root)/(2*qa))
+
+        if u1-u0 > 0 and (u1-u0)*duration >= self.confirm:
+            self.found = self.t+u0*duration+self.confirm
+
+
+    def drive(self, rotations):
+        duration = abs(rotations)/self.drive_rps
+        inches = rotations*sim.INCHES_PER_ROTATION
+
+        a = self.sensor()
+        self.x += inches*math.sin(self.theta)
+        self.y -= inches*math.cos(self.theta)
+        b = self.sensor()
+
+        self._sweep(a, b, duration)
+
+        self.t += duration
+        self.distance += abs(inches)
+
+
+    def turn(self, degrees, pause=0.0):
+        total = math.radians(degrees)
+        duration = abs(total)/self.turn_rate
+
+        ##
+        ## the sensor swings on an arc around the axle, checked as
+        ## chords of at most 15 degrees
+        ##
+        steps = max(1, int(abs(degrees)//15))
+        for i in range(steps):
+            a = self.sensor()
+            self.theta += total/steps
+            b = self.sensor()
+
+            self._sweep(a, b, duration/steps)
+            if self.found is not None:
+                break
+
+            self.t += duration/steps
+
+        if self.found is None:
+            self._sweep(self.sensor(), self.sensor(), pause)
+
+        self.t += pause
+        self.turns += 1
+
+
+    def run(self, legs, pause=0.0):
+        for leg in legs:
+            if leg[0] == patterns.DRIVE:
+                self.drive(leg[1])
+            else:
+                self.turn(leg[1], pause)
+
+            if self.found is not None or self.t >= self.limit:
+                break
+
+        if self.found is not None and self.found > self.limit:
+            self.found = None
+
+        return self.found
+
+
+class CoverageRobot(Robot):
+    """
+    Replays legs with no subject, marking the floor the sensor sweeps:
+    every cell (cell inches square) whose center comes within radius
+    of the sensor, i.e. everywhere the subject would have been seen,
+    and when it was first swept
+    """
+
+    def __init__(self, x, y, heading, field, radius, limit, cell=2.0, **kwargs):
+        Robot.__init__(self, x, y, heading, None, radius, limit, **kwargs)
+
+        self.cell = cell
+        self.columns = int(math.ceil(field[0]/cell))
+        self.rows = int(math.ceil(field[1]/cell))
+
+        reach = int(math.ceil(radius/cell))+1
+        self.offsets = [ (dc, dr) for dr in range(-reach, reach+1) for dc in range(-reach, reach+1) ]
+
+        ##
+        ## cell index -> time first swept
+        ##
+        self.swept = {}
+
+
+    def _mark(self, x, y, t):
+        column, row = int(x//self.cell), int(y//self.cell)
+
+        for dc, dr in self.offsets:
+            c, r = column+dc, row+dr
+
+            if 0 <= c < self.columns and 0 <= r < self.rows:
+                cx, cy = (c+0.5)*self.cell, (r+0.5)*self.cell
+
+                if (cx-x)*(cx-x)+(cy-y)*(cy-y) <= self.radius*self.radius:
+                    self.swept.setdefault(r*self.columns+c, t)
+
+
+    def _sweep(self, a, b, duration):
+        steps = max(1, int(math.hypot(b[0]-a[0], b[1]-a[1])/(self.cell/2.0)))
+
+        for i in range(steps+1):
+            u = i/float(steps)
+            self._mark(a[0]+u*(b[0]-a[0]), a[1]+u*(b[1]-a[1]), self.t+u*duration)
+
+
+    def coverage(self, share=0.9):
+        """
+        (share of the field swept, seconds until share of it was)
+        """
+        cells = self.columns*self.rows
+        times = sorted(self.swept.values())
+
+        needed = int(math.ceil(share*cells))
+
+        return ( len(times)/float(cells),
+                 times[needed-1] if len(times) >= needed else None )
+
+
+def run_coverage(job):
+    """
+    Pool worker: (strategy, field, radius, limit, params) -> (share of
+    the field the strategy sweeps within limit seconds, seconds to
+    sweep 90% of it or None)
+    """
+    strategy, field, radius, limit, params = job
+    params = params or {}
+
+    x, y, heading, legs, pause = strategy_legs(strategy, field, params)
+    robot = CoverageRobot( x, y, heading, field, radius, limit,
+                           drive_speed=params.get('default_bowstearn_speed', DRIVE_SPEED),
+                           turn_speed=params.get('default_portstarboard_speed', TURN_SPEED) )
+    robot.run(legs, pause)
+
+    return robot.coverage()
+
+
+##
+## per process cache of planned tours and pattern tables
+##
+_tours = {}
+_library = patterns.PatternLibrary()
+
+
+def strategy_legs(strategy, field, params=None):
+    """
+    (start x, start y, heading, legs, pause after turns) for a strategy
+    """
+    width, height = field
+    params = params or {}
+
+    if strategy == 'spiral':
+        ##
+        ## intellisearch_function: from the center, heading north
+        ##
+        legs = patterns.spiral( first=params.get('spiral_first', 1),
+                                grow=params.get('spiral_grow', 2),
+                                angle=90 )
+
+        return (width/2, height/2, 0, legs, 0.0)
+
+    if strategy.startswith('perimeter'):
+        columns, rows = 3, 3
+        if ':' in strategy:
+            columns, rows = [int(n) for n in strategy.split(':')[1].split('x')]
+
+        g = GridGraph(columns, rows)
+        start = g.cardinal_node(4)
+
+        key = (columns, rows)
+        if key not in _tours:
+            _tours[key] = RoutePlanner().perimeter_tour(g, start, 0)
+
+        spacing_ew, spacing_ns = g.spacing(width/12.0, height/12.0)
+        row, column = g.position(start)
+
+        legs = patterns.tour(g, _tours[key], spacing_ew, spacing_ns, sim.INCHES_PER_ROTATION)
+
+        return (column*spacing_ew, row*spacing_ns, 0, legs, 0.0)
+
+    if strategy in patterns.LIBRARY:
+        ##
+        ## intellisearch_function with a library pattern: from the
+        ## center, heading north, lanes one track spacing apart
+        ##
+        spacing = (SENSOR_FOOTPRINT+2*SUBJECT_RADIUS)/params.get('coverage_factor', COVERAGE_FACTOR)
+        start = (width/2, height/2, 0)
+
+        legs = _library.legs(strategy, width, height, spacing, sim.INCHES_PER_ROTATION, start)
+
+        return start+(legs, 0.0)
+
+    raise ValueError('unknown strategy {}'.format(strategy))
+
+
+def run_trials(job):
+    """
+    Pool worker: (strategy, seed, trials, field, radius, limit, params)
+    -> list of (time to find or None, distance, turns)
+    """
+    strategy, seed, trials, field, radius, limit, params = job
+    params = params or {}
+    rng = random.Random(seed)
+
+    results = []
+    for i in range(trials):
+        subject = (rng.uniform(0, field[0]), rng.uniform(0, field[1]))
+
+        x, y, heading, legs, pause = strategy_legs(strategy, field, params)
+        robot = Robot( x, y, heading, subject, radius, limit,
+                       drive_speed=params.get('default_bowstearn_speed', DRIVE_SPEED),
+                       turn_speed=params.get('default_portstarboard_speed', TURN_SPEED) )
+        found = robot.run(legs, pause)
+
+        results.append((found, robot.distance, robot.turns))
+
+    return results
+
+
+def percentile(values, p):
+    if not values:
+        return None
+
+    values = sorted(values)
+    i = min(len(values)-1, int(math.ceil(p/100.0*len(values)))-1)
+
+    return values[max(0, i)]
+
+
+def summarize(results):
+    times = [r[0] for r in results if r[0] is not None]
+    n = len(results)
+
+    return {
+        'trials' : n,
+        'found' : len(times),
+        'found_rate' : len(times)/float(n) if n else 0,
+        'mean' : sum(times)/len(times) if times else None,
+        'p95' : percentile(times, 95),
+        'worst' : max(times) if times else None,
+        'distance' : sum(r[1] for r in results)/float(n) if n else 0,
+        'turns' : sum(r[2] for r in results)/float(n) if n else 0
+    }
+
+
+def benchmark( strategies, trials=2000,
+               field=FIELD,
+               radius=SUBJECT_RADIUS,
+               limit=TIME_LIMIT,
+               seed=1,
+               processes=None,
+               chunk=100 ):
+    """
+    Returns {strategy: summary}.  Every strategy sees the same subjects
+    """
+    jobs = []
+    for strategy in strategies:
+        for start in range(0, trials, chunk):
+            jobs.append((strategy, seed+start, min(chunk, trials-start), field, radius, limit, None))
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        chunks = pool.map(run_trials, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+    results = {}
+    for job, chunk_results in zip(jobs, chunks):
+        results.setdefault(job[0], []).extend(chunk_results)
+
+    return dict((strategy, summarize(results[strategy])) for strategy in strategies)
+
+
+def _fmt(seconds):
+    return '-' if seconds is None else '{:.1f}'.format(seconds)
+
+
+if __name__ == '__main__':
+    trials = 2000
+    if len(sys.argv) > 1:
+        trials = int(sys.argv[1])
+
+    strategies = sys.argv[2:] or ['spiral', 'perimeter', 'perimeter:5x5']
+
+    s = datetime.datetime.now()
+    summary = benchmark(strategies, trials)
+
+    print('[+] {} trials per strategy on a {:.0f} x {:.0f} in floor, {:.0f} s limit ({:.1f} s on {} cores)'.format(
+        trials, FIELD[0], FIELD[1], TIME_LIMIT, (datetime.datetime.now()-s).total_seconds(), multiprocessing.cpu_count()))
+
+    print('[+] {:16s} {:>7s} {:>8s} {:>8s} {:>8s} {:>10s} {:>7s}'.format('strategy', 'found', 'mean s', 'p95 s', 'worst s', 'drove in', 'turns'))
+
+    for strategy in strategies:
+        r = summary[strategy]
+        print('[+] {:16s} {:>6.1f}% {:>8s} {:>8s} {:>8s} {:>10.0f} {:>7.1f}'.format(
+            strategy, r['found_rate']*100, _fmt(r['mean']), _fmt(r['p95']), _fmt(r['worst']), r['distance'], r['turns']))
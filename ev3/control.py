@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+
+import time
+import multiprocessing
+
+
+##
+## a stop request has to reach whoever is waiting on a motion
+## in under 50 ms
+##
+INTERRUPT_LATENCY_BUDGET = 0.05
+
+
+##############################################################################
+##############################################################################
+##
+## MOTION COMPLETION
+##
+##      completion/interrupt primitive shared by all gadget processes
+##
+##############################################################################
+##############################################################################
+
+
+class MotionCompletion(object):
+    """
+    Wakes a process waiting on a motion as soon as the motors report
+    that they are finished, or as soon as a stop is requested
+
+    begin() hands out a token for the new motion.  The process driving
+    the motors calls complete(token) when the tank stops on its own, and
+    the killswitch calls interrupt().  Either one wakes every wait() on
+    that token right away.  Starting a new motion also releases anyone
+    still waiting on the previous token.
+
+    An interrupt also halts motion until resume(): every motion begun in
+    the meantime starts out HALTED, so a process that missed the stop
+    (e.g. a walker between a turn and its next leg) can't start the
+    motors again.  Each new mission calls resume() before it moves.
+    """
+
+    IDLE = 0
+    RUNNING = 1
+    COMPLETE = 2
+    INTERRUPTED = 3
+    SUPERSEDED = 4
+    TIMEOUT = 5
+    HALTED = 6
+
+    def __init__(self, history=64):
+
+        ##
+        ## all state lives in shared memory so that it survives fork(),
+        ## the condition only guards changes and wakes the waiters
+        ##
+        self._cond = multiprocessing.Condition()
+        self._token = multiprocessing.RawValue('i', 0)
+        self._state = multiprocessing.RawValue('i', self.IDLE)
+        self._interrupt_time = multiprocessing.RawValue('d', 0.0)
+        self._halted = multiprocessing.RawValue('i', 0)
+
+        ##
+        ## ring of the most recent interrupt latencies (seconds)
+        ##
+        self._history = history
+        self._latency = multiprocessing.RawArray('d', history)
+        self._latency_count = multiprocessing.RawValue('i', 0)
+
+
+    def begin(self):
+        with self._cond:
+            self._token.value += 1
+            self._state.value = self.HALTED if self._halted.value else self.RUNNING
+            self._cond.notify_all()
+
+            return self._token.value
+
+
+    def complete(self, token):
+        with self._cond:
+            ##
+            ## only the current motion may complete, and an interrupt
+            ## wins over a late completion report
+            ##
+            if token == self._token.value and self._state.value == self.RUNNING:
+                self._state.value = self.COMPLETE
+                self._cond.notify_all()
+
+
+    def interrupt(self):
+        with self._cond:
+            self._interrupt_time.value = time.monotonic()
+            self._halted.value = 1
+            self._state.value = self.INTERRUPTED
+            self._cond.notify_all()
+
+
+    def resume(self):
+        """
+        Lift the halt left by the last interrupt, for a new mission
+        """
+        with self._cond:
+            self._halted.value = 0
+
+
+    def halted(self):
+        return self._halted.value != 0
+
+
+    def running(self, token):
+        """
+        Lock-free check that the motion identified by token is still
+        current and has neither completed nor been interrupted
+        """
+        return token == self._token.value and self._state.value == self.RUNNING
+
+
+    def wait(self, token, timeout=None):
+        """
+        Block until the motion identified by token completes, is
+        interrupted or is superseded.  Returns one of the state constants
+        """
+        def finished():
+            return (token != self._token.value) or (self._state.value != self.RUNNING)
+
+        with self._cond:
+            if not self._cond.wait_for(finished, timeout):
+                return self.TIMEOUT
+
+            if token != self._token.value:
+                return self.SUPERSEDED
+
+            state = self._state.value
+
+            if state == self.INTERRUPTED:
+                latency = time.monotonic()-self._interrupt_time.value
+                self._latency[self._latency_count.value%self._history] = latency
+                self._latency_count.value += 1
+
+                if latency > INTERRUPT_LATENCY_BUDGET:
+                    print('[-] Interrupt latency {:.1f} ms exceeds the {:.0f} ms budget'.format(
+                        latency*1000, INTERRUPT_LATENCY_BUDGET*1000))
+
+            return state
+
+
+    def latency_stats(self):
+        """
+        count/last/mean/max of the measured interrupt latencies (seconds)
+        """
+        with self._cond:
+            count = self._latency_count.value
+            n = min(count, self._history)
+            samples = [self._latency[i] for i in range(n)]
+
+            last = None
+            if count > 0:
+                last = self._latency[(count-1)%self._history]
+
+        stats = {
+            'count' : count,
+            'last' : last,
+            'mean' : (sum(samples)/n) if n else None,
+            'max' : max(samples) if n else None,
+            'budget' : INTERRUPT_LATENCY_BUDGET
+        }
+
+        return stats
+
+
+##############################################################################
+##############################################################################
+##
+## CONTROL BLOCK
+##
+##      shared memory flags and counters (replaces the Manager dict)
+##
+##############################################################################
+##############################################################################
+
+
+def _flag(index):
+    def getter(self):
+        return self._flags[index] != 0
+
+    def setter(self, value):
+        self._flags[index] = 1 if value else 0
+
+    return property(getter, setter)
+
+
+class ControlBlock(object):
+    """
+    Flags and counters shared by every gadget process
+
+    Everything lives in anonymous shared memory that is inherited across
+    fork(), so a read is a plain memory load instead of a round trip to
+    a multiprocessing.Manager server process.  Flags are single machine
+    words, so reads and writes never need a lock.  Counter reads are
+    lock-free as well ... only increments take the lock, since several
+    processes may bump the same counter.
+    """
+
+    FLAGS = (
+        'search',
+        'blocking',
+        'subject_found'
+    )
+
+    COUNTERS = (
+        'motions',
+        'searches',
+        'killswitches',
+        'color_samples'
+    )
+
+    search = _flag(0)
+    blocking = _flag(1)
+    subject_found = _flag(2)
+
+    def __init__(self):
+        self._flags = multiprocessing.RawArray('i', len(self.FLAGS))
+
+        ##
+        ## 'l' is a single machine word on the brick (32 bit ARM)
+        ##
+        self._counters = multiprocessing.RawArray('l', len(self.COUNTERS))
+        self._counter_lock = multiprocessing.Lock()
+
+        self._counter_index = {}
+        for i, name in enumerate(self.COUNTERS):
+            self._counter_index[name] = i
+
+
+    def increment(self, name, amount=1):
+        i = self._counter_index[name]
+        with self._counter_lock:
+            self._counters[i] += amount
+
+
+    def count(self, name):
+        return self._counters[self._counter_index[name]]
+
+
+    def snapshot(self):
+        d = {}
+        for i, name in enumerate(self.FLAGS):
+            d[name] = self._flags[i] != 0
+
+        for i, name in enumerate(self.COUNTERS):
+            d[name] = self._counters[i]
+
+        return d
+
+
+##############################################################################
+##############################################################################
+##
+## GADGET EVENTS
+##
+##      what the idle loop blocks on
+##
+##############################################################################
+##############################################################################
+
+
+class GadgetEvents(object):
+    """
+    Event bits any gadget process can raise to wake the idle loop
+
+    wait() blocks on a condition variable (zero CPU while nothing
+    happens) and returns, and clears, every bit raised since the
+    last call.
+    """
+
+    DIRECTIVE = 1
+    JOB_DONE = 2
+    SHUTDOWN = 4
+
+    def __init__(self):
+        self._cond = multiprocessing.Condition()
+        self._pending = multiprocessing.RawValue('i', 0)
+
+
+    def signal(self, event):
+        with self._cond:
+            self._pending.value |= event
+            self._cond.notify_all()
+
+
+    def wait(self, timeout=None):
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending.value != 0, timeout)
+
+            events = self._pending.value
+            self._pending.value = 0
+
+            return events
+
+
+##############################################################################
+##############################################################################
+##
+## MOTION MODEL
+##
+##      measured seconds per rotation, shared by all gadget processes
+##
+##############################################################################
+##############################################################################
+
+
+class MotionModel(object):
+    """
+    How long the drive motors take per rotation, by speed
+
+    Starts from one guess (seconds_per_rotation at reference_speed,
+    scaled for other speeds) and learns from every move the motor worker
+    times off the tacho counts: an exponentially weighted moving average
+    per 10% speed band, so it follows the battery as it runs down and
+    covers backward moves and other speeds as well.
+    """
+
+    BANDS = 10
+
+    def __init__(self, seconds_per_rotation=0.5, reference_speed=70, rampup=0.05, alpha=0.3):
+        self.rampup = rampup
+        self.alpha = alpha
+
+        self._seconds = multiprocessing.RawArray('d', self.BANDS+1)
+        self._samples = multiprocessing.RawArray('i', self.BANDS+1)
+
+        for band in range(1, self.BANDS+1):
+            self._seconds[band] = seconds_per_rotation*reference_speed/(band*10.0)
+
+        self._seconds[0] = self._seconds[1]
+
+
+    def band(self, speed):
+        return min(self.BANDS, max(1, int(round(abs(speed)/10.0))))
+
+
+    def seconds_per_rotation(self, speed):
+        return self._seconds[self.band(speed)]
+
+
+    def estimate(self, rotations, speed):
+        """
+        Seconds for a move of rotations at speed (percent, either sign)
+        """
+        return self.rampup+self.seconds_per_rotation(speed)*abs(rotations)
+
+
+    def observe(self, rotations, speed, seconds):
+        """
+        Fold in a measured move ... very short moves are mostly ramp up
+        and are left out
+        """
+        if abs(rotations) < 0.25 or seconds <= self.rampup:
+            return
+
+        band = self.band(speed)
+        measured = (seconds-self.rampup)/abs(rotations)
+
+        if self._samples[band] == 0:
+            self._seconds[band] = measured
+        else:
+            self._seconds[band] += self.alpha*(measured-self._seconds[band])
+
+        self._samples[band] += 1
+
+
+    def stats(self):
+        """
+        {speed band (percent): (seconds per rotation, moves measured)}
+        """
+        return dict( (band*10, (self._seconds[band], self._samples[band]))
+                     for band in range(1, self.BANDS+1) )
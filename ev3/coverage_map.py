@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+
+import math
+import time
+import multiprocessing
+
+import patterns
+
+##
+## numpy is optional on the brick (apt install python3-numpy) ... without
+## it there is no coverage map and the searches run as before
+##
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+##############################################################################
+##############################################################################
+##
+## COVERAGE MAP
+##
+##      which floor the color sensor has seen, and where the subject
+##      is most likely to be
+##
+##############################################################################
+##############################################################################
+
+
+class CoverageMap(object):
+    """
+    The field split into cells the size of the color sensor footprint,
+    with how often the sensor has looked at each cell and the
+    probability that the subject's center is in it
+
+    Every cell starts equally likely.  The sensor sees the subject when
+    it is within subject_radius of the center, so a look that does not
+    see it multiplies every cell within that radius by (1-p_detect),
+    the chance of missing it if it were there, and the map is
+    renormalised (Bayes' rule for a miss).  sample() only buffers the
+    sensor position; every `batch` samples flush() applies the looks in
+    one vectorised step, each cell counted once per batch however many
+    samples landed in it (they are the same look).  A cell is only
+    looked at again once the sensor has moved at least `moved` inches
+    from where it was at the cell's last look: while the tank stands
+    still or turns on the spot the sensor keeps reading the same floor,
+    and counting every reading as another independent miss would drive
+    the probability there to zero.
+
+    The arrays live in shared memory, so the color search process
+    writes them and the search planner in another process reads them.
+    Create the map before forking.
+    """
+
+    ##
+    ## published statistics (shared memory slots)
+    ##
+    S_SAMPLES = 0
+    S_FLUSHES = 1
+    S_FLUSH_TIME = 2
+    S_FLUSH_TIME_MAX = 3
+
+    def __init__(self, width, height, cell=2.0, subject_radius=4.0, p_detect=0.9, batch=25, moved=None):
+        if numpy is None:
+            raise RuntimeError('the coverage map needs numpy')
+
+        self.width = float(width)
+        self.height = float(height)
+        self.cell = float(cell)
+        self.p_detect = p_detect
+        self.moved = self.cell if moved is None else float(moved)
+
+        self.columns = int(math.ceil(self.width/self.cell))
+        self.rows = int(math.ceil(self.height/self.cell))
+        cells = self.columns*self.rows
+
+        self._p = multiprocessing.RawArray('d', cells)
+        self._seen = multiprocessing.RawArray('H', cells)
+        self._last_x = multiprocessing.RawArray('d', cells)
+        self._last_y = multiprocessing.RawArray('d', cells)
+        self._shared = multiprocessing.RawArray('d', 4)
+
+        self.p = numpy.frombuffer(self._p, dtype=numpy.float64)
+        self.seen = numpy.frombuffer(self._seen, dtype=numpy.uint16)
+
+        ##
+        ## sensor position at each cell's last look (NaN: never looked at)
+        ##
+        self.last_x = numpy.frombuffer(self._last_x, dtype=numpy.float64)
+        self.last_y = numpy.frombuffer(self._last_y, dtype=numpy.float64)
+
+        self.p[:] = 1.0/cells
+        self.last_x[:] = numpy.nan
+        self.last_y[:] = numpy.nan
+
+        ##
+        ## (column, row) offsets of the cells a look rules out
+        ##
+        reach = int(math.ceil(subject_radius/self.cell))
+        offsets = [ (dc, dr) for dr in range(-reach, reach+1) for dc in range(-reach, reach+1)
+                    if math.hypot(dc, dr)*self.cell <= subject_radius ] or [(0, 0)]
+
+        self._dc = numpy.array([dc for dc, dr in offsets])
+        self._dr = numpy.array([dr for dc, dr in offsets])
+
+        ##
+        ## sample buffer, allocated once (per process)
+        ##
+        self.batch = batch
+        self._xs = numpy.zeros(batch)
+        self._ys = numpy.zeros(batch)
+        self._n = 0
+
+
+    def looks(self, xs, ys):
+        """
+        (cell, x, y) for every cell a look at each of the points rules
+        out, in the order of the points, those off the field dropped
+        """
+        columns = (numpy.floor(xs/self.cell).astype(numpy.int64)[:, None]+self._dc).ravel()
+        rows = (numpy.floor(ys/self.cell).astype(numpy.int64)[:, None]+self._dr).ravel()
+
+        inside = (columns >= 0) & (columns < self.columns) & (rows >= 0) & (rows < self.rows)
+
+        k = len(self._dc)
+        xs = numpy.repeat(xs, k)[inside]
+        ys = numpy.repeat(ys, k)[inside]
+
+        return rows[inside]*self.columns+columns[inside], xs, ys
+
+
+    def cells(self, xs, ys):
+        """
+        Distinct indices of the cells a look at any of the points rules
+        out, those off the field dropped
+        """
+        return numpy.unique(self.looks(xs, ys)[0])
+
+
+    def sample(self, x, y):
+        """
+        The sensor looked at (x, y) inches and did not see the subject
+        """
+        self._xs[self._n] = x
+        self._ys[self._n] = y
+        self._n += 1
+
+        if self._n >= self.batch:
+            self.flush()
+
+
+    def flush(self):
+        if self._n == 0:
+            return
+
+        start = time.monotonic()
+
+        cells, xs, ys = self.looks(self._xs[:self._n], self._ys[:self._n])
+
+        ##
+        ## only looks from far enough from the cell's last one (NaN,
+        ## never looked at, compares False, so it counts as moved)
+        ##
+        dx = xs-self.last_x[cells]
+        dy = ys-self.last_y[cells]
+        moved = ~(dx*dx+dy*dy < self.moved*self.moved)
+
+        ##
+        ## each cell once, remembering the newest position it was
+        ## looked at from
+        ##
+        cells, xs, ys = cells[moved][::-1], xs[moved][::-1], ys[moved][::-1]
+        idx, newest = numpy.unique(cells, return_index=True)
+
+        if idx.size:
+            self.last_x[idx] = xs[newest]
+            self.last_y[idx] = ys[newest]
+
+            self.p[idx] *= 1.0-self.p_detect
+
+            total = self.p.sum()
+            if total > 0:
+                self.p /= total
+
+            seen = self.seen[idx]
+            self.seen[idx] = seen+(seen < 65535)
+
+        elapsed = time.monotonic()-start
+
+        s = self._shared
+        s[self.S_SAMPLES] += self._n
+        s[self.S_FLUSHES] += 1
+        s[self.S_FLUSH_TIME] += elapsed
+        if elapsed > s[self.S_FLUSH_TIME_MAX]:
+            s[self.S_FLUSH_TIME_MAX] = elapsed
+
+        self._n = 0
+
+
+    def sweep(self, x0, y0, x1, y1):
+        """
+        Cells ruled out by the sensor going from (x0, y0) to (x1, y1)
+        """
+        steps = max(1, int(math.hypot(x1-x0, y1-y0)/(self.cell/2.0)))
+        t = numpy.linspace(0.0, 1.0, steps+1)
+
+        return self.cells(x0+(x1-x0)*t, y0+(y1-y0)*t)
+
+
+    def gain(self, x0, y0, x1, y1, exclude=None):
+        """
+        Chance of finding the subject by sweeping the sensor from
+        (x0, y0) to (x1, y1), leaving out the cells in exclude
+        """
+        idx = self.sweep(x0, y0, x1, y1)
+
+        if exclude is not None and exclude.size:
+            idx = numpy.setdiff1d(idx, exclude, assume_unique=True)
+
+        return float(self.p[idx].sum())*self.p_detect
+
+
+    def next_leg( self, x, y, heading,
+                  lengths=(6, 12, 24, 36, 48),
+                  turns=(0, 90, -90, 180),
+                  drive_rate=7.5,
+                  turn_rate=90.0,
+                  offset=2.5,
+                  exclude=None ):
+        """
+        (degrees to turn, inches to drive, gain) of the leg from the
+        tank's pose (axle at x, y, facing heading) that finds the
+        subject most probably per second spent turning and driving,
+        staying on the field.  None if no leg gains anything
+        """
+        best = None
+        best_rate = 0.0
+
+        for turn in turns:
+            h = math.radians(heading+turn)
+            sx, sy = math.sin(h), -math.cos(h)
+
+            for length in lengths:
+                ex, ey = x+length*sx, y+length*sy
+
+                if not (0 <= ex <= self.width and 0 <= ey <= self.height):
+                    continue
+
+                gain = self.gain( x+offset*sx, y+offset*sy,
+                                  ex+offset*sx, ey+offset*sy,
+                                  exclude )
+
+                seconds = abs(turn)/turn_rate+length/drive_rate
+                if gain/seconds > best_rate:
+                    best = (turn, length, gain)
+                    best_rate = gain/seconds
+
+        return best
+
+
+    def most_likely(self):
+        """
+        (x, y) inches of the center of the most likely cell
+        """
+        row, column = divmod(int(self.p.argmax()), self.columns)
+
+        return ((column+0.5)*self.cell, (row+0.5)*self.cell)
+
+
+    def coverage(self):
+        """
+        Share of the field the sensor has seen
+        """
+        return float(numpy.count_nonzero(self.seen))/self.seen.size
+
+
+    def stats(self):
+        s = self._shared
+        flushes = int(s[self.S_FLUSHES])
+
+        return {
+            'cells' : self.seen.size,
+            'coverage' : self.coverage(),
+            'max_probability' : float(self.p.max()),
+            'samples' : int(s[self.S_SAMPLES]),
+            'flushes' : flushes,
+            'mean_flush_time' : (s[self.S_FLUSH_TIME]/flushes) if flushes else None,
+            'max_flush_time' : s[self.S_FLUSH_TIME_MAX]
+        }
+
+
+def greedy_legs( coverage, start,
+                 inches_per_rotation=3.75,
+                 min_gain=1e-4,
+                 **kwargs ):
+    """
+    Legs (patterns.py format) chosen one at a time with
+    CoverageMap.next_leg from start (x, y, heading), each planned from
+    where the one before is expected to end, with the cells it sweeps
+    left out (the color search has not seen them yet when the next leg
+    is planned).  kwargs go to next_leg.  When nothing in reach gains
+    at least min_gain, the next leg heads for the most likely cell
+    instead.  Never ends
+    """
+    x, y, heading = start
+    offset = kwargs.get('offset', 2.5)
+    pending = None
+
+    while True:
+        leg = coverage.next_leg(x, y, heading, exclude=pending, **kwargs)
+
+        if leg is None or leg[2] < min_gain:
+            tx, ty = coverage.most_likely()
+            bearing = math.degrees(math.atan2(tx-x, -(ty-y)))
+
+            leg = (int(round((bearing-heading+180)%360-180)), max(1.0, math.hypot(tx-x, ty-y)-offset), 0.0)
+
+        turn, length, gain = leg
+
+        if turn != 0:
+            yield (patterns.TURN, turn)
+
+        heading = (heading+turn)%360
+        h = math.radians(heading)
+
+        x0, y0 = x+offset*math.sin(h), y-offset*math.cos(h)
+        x += length*math.sin(h)
+        y -= length*math.cos(h)
+
+        pending = coverage.sweep(x0, y0, x+offset*math.sin(h), y-offset*math.cos(h))
+
+        yield (patterns.DRIVE, length/float(inches_per_rotation))
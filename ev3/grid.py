@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+import array
+
+
+##############################################################################
+##############################################################################
+##
+## GRID GRAPH
+##
+##      search grid as a lattice of nodes with array backed adjacency
+##
+##############################################################################
+##############################################################################
+
+
+##
+## headings
+##
+NORTH = 0
+EAST = 1
+SOUTH = 2
+WEST = 3
+
+HEADING_NAMES = ('north', 'east', 'south', 'west')
+
+##
+## turn needed to go from heading h to heading h+n (positive is right)
+##
+TURN_ANGLES = (0, 90, 180, -90)
+
+##
+## names of the nine cardinal positions used by set_grid, in the
+## same order as the nodes of a 3 x 3 grid
+##
+CARDINAL_NAMES = (
+    'northwest',
+    'north',
+    'northeast',
+    'west',
+    'center',
+    'east',
+    'southwest',
+    'south',
+    'southeast'
+)
+
+
+def complement(heading):
+    """
+    The opposite heading
+    """
+    return (heading+2)%4
+
+
+def turn_angle(heading, target):
+    """
+    Degrees to turn to get from heading to target, positive is a right
+    turn, -90 a left turn and 180 turning around
+    """
+    return TURN_ANGLES[(target-heading)%4]
+
+
+class GridGraph(object):
+    """
+    Search grid of `columns` x `rows` nodes, numbered row by row from
+    the north west corner
+
+        0 ---- 1 ---- 2         North
+        |      |      |
+        3 ---- 4 ---- 5
+        |      |      |
+        6 ---- 7 ---- 8         South
+
+    Every node keeps one neighbour slot per heading in a flat int array
+    (node*4+heading, -1 where the grid ends), so the heading of an edge
+    is the slot it sits in and nothing is allocated per node.  Edges
+    have ids too: the east edges of each row first, then the south
+    edges, which lets a walk keep track of what it has driven in a
+    bytearray.
+
+    A 3 x 3 grid has the same node numbers as the original hand drawn
+    search grid.
+    """
+
+    def __init__(self, columns=3, rows=3):
+        if columns < 2 or rows < 2:
+            raise ValueError('grid needs at least 2 x 2 nodes, got {} x {}'.format(columns, rows))
+
+        self.columns = columns
+        self.rows = rows
+        self.nodes = columns*rows
+
+        ##
+        ## east edges: rows*(columns-1), south edges: (rows-1)*columns
+        ##
+        self.east_edges = rows*(columns-1)
+        self.edges = self.east_edges+(rows-1)*columns
+
+        self.perimeter_edges = 2*(columns-1)+2*(rows-1)
+
+        ##
+        ## neighbour per (node, heading) ... built a whole row or
+        ## column at a time with strided slice assignment instead of a
+        ## python loop per node
+        ##
+        n = self.nodes
+        adjacency = array.array('i', [-1])*(n*4)
+
+        adjacency[4*columns+NORTH::4] = array.array('i', range(0, n-columns))
+        adjacency[SOUTH:4*(n-columns):4] = array.array('i', range(columns, n))
+
+        east = array.array('i', range(1, n+1))
+        west = array.array('i', range(-1, n-1))
+        for r in range(rows):
+            ##
+            ## no east neighbour for the last column, no west neighbour
+            ## for the first
+            ##
+            east[r*columns+columns-1] = -1
+            west[r*columns] = -1
+
+        adjacency[EAST::4] = east
+        adjacency[WEST::4] = west
+
+        self.adjacency = adjacency
+
+
+    @classmethod
+    def for_field(cls, width, height, spacing):
+        """
+        Grid over a width x height field (feet) with nodes at most
+        spacing inches apart (e.g. the color sensor footprint)
+        """
+        columns = max(2, int(-(-width*12//spacing))+1)
+        rows = max(2, int(-(-height*12//spacing))+1)
+
+        return cls(columns, rows)
+
+
+    def neighbour(self, node, heading):
+        return self.adjacency[node*4+heading]
+
+
+    def neighbours(self, node):
+        """
+        (heading, node) pairs for every edge leaving node
+        """
+        base = node*4
+        adjacency = self.adjacency
+
+        return [ (h, adjacency[base+h]) for h in range(4) if adjacency[base+h] >= 0 ]
+
+
+    def degree(self, node):
+        base = node*4
+        adjacency = self.adjacency
+
+        return (adjacency[base] >= 0)+(adjacency[base+1] >= 0)+(adjacency[base+2] >= 0)+(adjacency[base+3] >= 0)
+
+
+    def edge(self, node, heading):
+        """
+        Id of the edge leaving node on heading (the same id from either
+        end), or -1 if there is none
+        """
+        if self.adjacency[node*4+heading] < 0:
+            return -1
+
+        if heading == WEST:
+            node -= 1
+            heading = EAST
+
+        elif heading == NORTH:
+            node -= self.columns
+            heading = SOUTH
+
+        r, c = divmod(node, self.columns)
+
+        if heading == EAST:
+            return r*(self.columns-1)+c
+
+        return self.east_edges+node
+
+
+    def edge_nodes(self, edge):
+        """
+        (node, heading, node) for an edge id, from its north/west end
+        """
+        if edge < self.east_edges:
+            r, c = divmod(edge, self.columns-1)
+            node = r*self.columns+c
+
+            return node, EAST, node+1
+
+        node = edge-self.east_edges
+
+        return node, SOUTH, node+self.columns
+
+
+    def position(self, node):
+        """
+        (row, column) of node
+        """
+        return divmod(node, self.columns)
+
+
+    def node(self, row, column):
+        return row*self.columns+column
+
+
+    def is_perimeter(self, node):
+        r, c = divmod(node, self.columns)
+
+        return r == 0 or c == 0 or r == self.rows-1 or c == self.columns-1
+
+
+    def is_perimeter_edge(self, edge):
+        a, heading, b = self.edge_nodes(edge)
+        ra, ca = divmod(a, self.columns)
+
+        if heading == EAST:
+            return ra == 0 or ra == self.rows-1
+
+        return ca == 0 or ca == self.columns-1
+
+
+    def cardinal_node(self, position):
+        """
+        Node for one of the nine cardinal positions (0 north west ...
+        4 center ... 8 south east), i.e. the corners, edge midpoints and
+        center of the grid, whatever its size
+        """
+        pr, pc = divmod(position, 3)
+
+        return self.node(pr*(self.rows-1)//2, pc*(self.columns-1)//2)
+
+
+    def describe(self, node):
+        """
+        Readable name for a node, the cardinal name where there is one
+        """
+        for position in range(9):
+            if self.cardinal_node(position) == node:
+                return CARDINAL_NAMES[position]
+
+        return 'row {} column {}'.format(*self.position(node))
+
+
+    def spacing(self, width, height):
+        """
+        Distance (inches) between neighbouring nodes going east/west
+        and going north/south on a width x height field (feet)
+        """
+        return (width*12.0/(self.columns-1), height*12.0/(self.rows-1))
@@ -7,8 +7,9 @@ import os
 import trace 
 import datetime
 import time 
-import uuid
 import multiprocessing
+import threading
+import copy
 import math
 
 from agt import AlexaGadget 
@@ -34,6 +35,26 @@ from ev3dev2.sensor.lego import ColorSensor, TouchSensor, GyroSensor, InfraredSe
 
 from ev3dev2.sound import Sound
 
+from control import MotionCompletion, ControlBlock, GadgetEvents, MotionModel
+from motor_worker import MotorWorker, run_for_rotations
+from pipeline import MotionPipeline
+from scheduler import CommandScheduler
+from sampler import ColorSampler
+from sensor_hub import SensorHub, HubGyro
+from pose import PoseEstimator
+from mission_state import MissionState
+from speed import SpeedController
+from turn import TurnController, TurnCalibration
+
+import telemetry
+
+import grid
+from grid import GridGraph
+from planner import RoutePlanner, PathTable
+
+import patterns
+import coverage_map
+
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO) 
 logger = logging.getLogger(__name__) 
@@ -62,14 +83,33 @@ class EV3SearchGadget(AlexaGadget):
         self.tank_pair = MoveTank(OUTPUT_B, OUTPUT_C)
 
         ##
-        ## Setup a separate thread for server-like operations 
+        ## flags and counters shared by every gadget process
+        ## (shared memory, so no Manager server process and no IPC)
+        ##
+        self.control = ControlBlock()
+        self.control.search = False
+        self.control.blocking = False
+        self.control.subject_found = False
+
+        ##
+        ## walker and search processes, kept by the gadget process only
+        ## (the idle loop reaps them while the killswitch swaps them
+        ## out, so both go through the lock)
+        ##
+        self.motor_processes = []
+        self.motor_processes_lock = threading.Lock()
+        self.gadget_pid = os.getpid()
+
+        ##
+        ## wakes anyone waiting on a motion when the motors finish
+        ## or when the killswitch fires
         ##
+        self.motion = MotionCompletion()
 
-        self.proc_manager = multiprocessing.Manager().dict()
-        self.proc_manager['search'] = False
-        self.proc_manager['blocking'] = False
-        self.proc_manager['subject_found'] = False
-        self.proc_manager['motor_processes'] = []
+        ##
+        ## directives, finished jobs and shutdown wake the idle loop
+        ##
+        self.events = GadgetEvents()
 
         self.data = {}
 
@@ -78,14 +118,209 @@ class EV3SearchGadget(AlexaGadget):
         ##
         self.data['default_color'] = 3
 
+        ##
+        ## color sampling rate (Hz), and a find needs this many
+        ## matching samples out of the last window
+        ##
+        self.data['color_sample_rate'] = 50
+        self.data['color_debounce_window'] = 5
+        self.data['color_debounce_hits'] = 3
+
         self.data['inches_per_rotation'] = 3.75
         self.data['default_bowstearn_speed'] = 70
+        self.data['default_bowstearn_rotations'] = 10
         self.data['default_portstarboard_speed'] = 50
         self.data['default_portstarboard_angle'] = 90
         self.data['default_portstarboard_direction'] = 'right'
 
-        self.data['instruction_id_list'] = []
-        self.data['instruction_data'] = {}
+        ##
+        ## closed loop turns (turn.py): PID gains on the remaining angle
+        ## (degrees -> speed), the slowest speed that still turns the
+        ## tank, how close (degrees) counts as done and the gyro
+        ## sampling rate (Hz)
+        ##
+        self.data['turn_kp'] = 3.0
+        self.data['turn_ki'] = 0.0
+        self.data['turn_kd'] = 0.02
+        self.data['turn_min_speed'] = 6
+        self.data['turn_tolerance'] = 1
+        self.data['turn_sample_rate'] = 100
+
+        ##
+        ## sensor hub (sensor_hub.py) sampling rates (Hz) ... the color
+        ## sensor is read at color_sample_rate, and the gyro twice as
+        ## fast as the turn loop so a turn never acts on a stale angle
+        ##
+        self.data['gyro_sample_rate'] = 200
+        self.data['touch_sample_rate'] = 20
+        self.data['infrared_sample_rate'] = 10
+
+        ##
+        ## dead reckoning (pose.py): distance between the wheels
+        ## (inches), how often the pose is updated (Hz) and how hard each
+        ## update pulls the heading towards the gyro (0..1).  Grid legs
+        ## are aimed from the pose at the next node, ignoring heading
+        ## errors under pose_heading_tolerance degrees, unless the pose
+        ## is more than pose_max_drift inches from where the grid says
+        ## the tank is (then it is not trusted)
+        ##
+        self.data['track_width'] = 4.75
+        self.data['pose_rate'] = 50
+        self.data['pose_gyro_weight'] = 0.05
+        self.data['pose_heading_tolerance'] = 2
+        self.data['pose_max_drift'] = 12
+
+        ##
+        ## how far ahead of the axle the color sensor sits (inches), to
+        ## place a find
+        ##
+        self.data['color_sensor_offset'] = 2.5
+
+        ##
+        ## intellisearch spiral: first leg (rotations), and every other
+        ## leg grows by this many rotations
+        ##
+        self.data['spiral_first'] = 1
+        self.data['spiral_grow'] = 2
+
+        ##
+        ## start search pattern when the skill does not name one:
+        ## 'spiral', 'coverage' (legs chosen one at a time off the
+        ## coverage map, needs numpy), or one of the standard patterns
+        ## in patterns.LIBRARY ('expanding_square', 'sector',
+        ## 'parallel_track', 'creeping_line')
+        ##
+        self.data['search_pattern'] = 'spiral'
+
+        ##
+        ## coverage map (coverage_map.py): cell size in inches (about the
+        ## color sensor footprint), the subject's radius (inches), the
+        ## chance the sensor sees the subject when it passes over it,
+        ## and the leg lengths (inches) the coverage search picks from
+        ##
+        self.data['sensor_footprint'] = 2
+        self.data['subject_radius'] = 4
+        self.data['coverage_p_detect'] = 0.9
+        self.data['coverage_leg_lengths'] = [6, 12, 24, 36, 48]
+
+        ##
+        ## standard patterns: the sweep width (the sensor footprint
+        ## plus the subject's diameter) over the coverage factor is the
+        ## track spacing, so lanes overlap by a third at 1.5
+        ##
+        self.data['coverage_factor'] = 1.5
+
+        ##
+        ## time lost between one leg and the next (seconds), for the
+        ## skill's mission time predictions (mission_model)
+        ##
+        self.data['leg_gap'] = 0.25
+
+        ##
+        ## search speed (speed.py): searches drive as fast as the color
+        ## sampling rate allows without the sensor skipping floor, from
+        ## search_speed_min percent up to default_bowstearn_speed (the
+        ## drive speed sweep.py tunes for traction and detection, which
+        ## the sampling rate knows nothing about).  False always drives
+        ## them at default_bowstearn_speed
+        ##
+        self.data['search_speed_control'] = True
+        self.data['search_speed_min'] = 20
+
+        ##
+        ## the killswitch has this long (seconds from directive receipt)
+        ## to stop the tank and tear down every in-flight job
+        ##
+        self.data['killswitch_deadline'] = 0.25
+
+        ##
+        ## drive timing: seconds per rotation at the default speed (only
+        ## a first guess, every move is timed off the tacho counts and
+        ## learned per speed), how often the motor worker reads the
+        ## counts (Hz), and how much longer than the estimate a move may
+        ## take before waiters give up on it
+        ##
+        self.data['seconds_per_rotation'] = 0.5
+        self.data['encoder_poll_rate'] = 50
+        self.data['motion_timeout_factor'] = 2
+
+        ##
+        ## how many search legs may be queued on the motor worker at
+        ## once (the running one included), so the next leg is already
+        ## there when the current one ends
+        ##
+        self.data['pipeline_depth'] = 2
+
+        ##
+        ## search grid resolution: with grid_spacing set, nodes at most
+        ## that many inches apart over the whole field (e.g. the sensor
+        ## footprint, to cover a large field at sensor resolution),
+        ## following grid_width/grid_height as they change.  None keeps
+        ## the grid_columns x grid_rows nodes below
+        ##
+        self.data['grid_spacing'] = None
+
+        ##
+        ## the most edges a search grid may have: the map of the edges
+        ## driven (MissionState) is allocated once for this many, before
+        ## any mission process forks, and a finer grid_spacing grid is
+        ## coarsened to fit
+        ##
+        self.data['grid_max_edges'] = 65536
+
+        ##
+        ## tuning written by sweep.py overrides the defaults above
+        ##
+        self.data['tuning_file'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tuning.json')
+        self._load_tuning(self.data['tuning_file'])
+
+        self.motion_model = MotionModel( self.data['seconds_per_rotation'],
+                                         reference_speed=self.data['default_bowstearn_speed'] )
+
+        self.turn_controller = TurnController( kp=self.data['turn_kp'],
+                                               ki=self.data['turn_ki'],
+                                               kd=self.data['turn_kd'],
+                                               min_speed=self.data['turn_min_speed'],
+                                               tolerance=self.data['turn_tolerance'],
+                                               rate=self.data['turn_sample_rate'] )
+
+        ##
+        ## learned turn leads (calibrate_turns), kept on the brick ...
+        ## calibrated at startup if asked to and there is no table yet
+        ##
+        self.data['turn_calibration_file'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'turn_calibration.json')
+        self.data['turn_calibrate_on_startup'] = False
+
+        if os.path.exists(self.data['turn_calibration_file']):
+            self.turn_controller.calibration = TurnCalibration.load(self.data['turn_calibration_file'])
+
+        ##
+        ## created up front so that its statistics (shared memory) are
+        ## visible to every process, not just the color search process
+        ##
+        self.color_sampler = ColorSampler( self.data['default_color'],
+                                           rate=self.data['color_sample_rate'],
+                                           window=self.data['color_debounce_window'],
+                                           hits=self.data['color_debounce_hits'] )
+
+        self.speed_controller = SpeedController( self.motion_model,
+                                                 inches_per_rotation=self.data['inches_per_rotation'],
+                                                 footprint=self.data['sensor_footprint'],
+                                                 subject_radius=self.data['subject_radius'],
+                                                 track_spacing=self.track_spacing(),
+                                                 hits=self.data['color_debounce_hits'],
+                                                 min_speed=self.data['search_speed_min'],
+                                                 max_speed=self.data['default_bowstearn_speed'] )
+
+        ##
+        ## mission telemetry ... fixed size ring in shared memory,
+        ## flushed to an append-only binary log on the brick
+        ##
+        self.data['telemetry_log'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'telemetry.bin')
+        self.data['telemetry_capacity'] = 256
+
+        self.telemetry = telemetry.TelemetryRing( self.data['telemetry_log'],
+                                                  capacity=self.data['telemetry_capacity'] )
 
         self.data['coordinate_data'] = {}
 
@@ -123,13 +358,6 @@ class EV3SearchGadget(AlexaGadget):
             3 = true west
         '''
 
-        self.data['coordinate_data']['heading_list'] = {
-            0 : 'north',
-            1 : 'east',
-            2 : 'south',
-            3 : 'west'
-        }
-
         '''
         Assumptions about heading:
 
@@ -152,241 +380,106 @@ class EV3SearchGadget(AlexaGadget):
 
         '''
 
-        self.data['coordinate_data']['heading_compliments'] = {}
-        self.data['coordinate_data']['heading_compliments'][0] = 2
-        self.data['coordinate_data']['heading_compliments'][1] = 3
-        self.data['coordinate_data']['heading_compliments'][2] = 0
-        self.data['coordinate_data']['heading_compliments'][3] = 1
-
         ##
-        ## agnles to get from one heading to another
-        ##   if my heading is n, then 
-        ##      go heading_angles[n][x] to get to 
-        ##      heading x
+        ## default heading = North
         ##
-        self.data['coordinate_data']['heading_angles'] = {}
+        self.data['coordinate_data']['heading'] = 0
 
         ##
-        ## pointing north
+        ## search grid ... columns x rows nodes laid over the
+        ## grid_width x grid_height field, nodes numbered row by row
+        ## from the north west corner (see grid.py).  The default 3 x 3
+        ## grid has a node at each of the nine cardinal positions; set
+        ## grid_spacing (above, or in tuning.json) to cover large fields
+        ## at a finer resolution instead
         ##
-        self.data['coordinate_data']['heading_angles'][0] = {
-            1 : 90, # east, right turn
-            2 : 180, # south, behind me
-            3 : -90 # west, left turn
-        }
+        self.data['coordinate_data']['grid_columns'] = 3
+        self.data['coordinate_data']['grid_rows'] = 3
 
-        ##
-        ## pointing east
-        ##
-        self.data['coordinate_data']['heading_angles'][1] = {
-            0 : -90, # north, left turn
-            2 : 90, # south, right turn
-            3 : 180 # west, behind me
-        }
+        self.grid_graph = None
+        self.grid_key = None
+        self.route_planner = RoutePlanner()
+        self.pattern_library = patterns.PatternLibrary()
 
         ##
-        ## pointing south
+        ## a 90 degree turn costs as much as driving this many inches,
+        ## when choosing a route to a position
         ##
-        self.data['coordinate_data']['heading_angles'][2] = {
-            0 : 180, # north, behind me
-            1 : -90, # east, left turn
-            3 : 90 # west, right turn
-        }
+        self.data['coordinate_data']['turn_cost'] = 12
 
         ##
-        ## pointing west
+        ## from here on the coordinate data lives in shared memory, so
+        ## a walk's position and heading (and the edges it drove) reach
+        ## every process and the next mission, not just the walker
         ##
-        self.data['coordinate_data']['heading_angles'][3] = {
-            0 : 90, # north, right turn
-            1 : 180, # east, behind me
-            2 : -90 # south, left turn
-        }
+        self.data['coordinate_data'] = MissionState( self.data['coordinate_data'],
+                                                     capacity=self.data['grid_max_edges'],
+                                                     edges=self.search_grid().edges )
 
         ##
-        ## default heading = North
+        ## which floor the color sensor has seen, shared by every search
         ##
-        self.data['coordinate_data']['heading'] = 0
+        self.coverage = self.new_coverage_map()
 
-        '''
-        edges (to assist in future graph theory)
-
-        To aid in determining best possible search routes throughtout
-        the defined grid, edges will be assigned letters and given a
-        source and destination node number.  Source nodes will be the
-        north or western most node in the pair, and destination nodes
-        will be the south or eastern most node in the pair
-
-            0                   1                   2       North
-            -------- a ------------------ b --------
-            | | ->              | | ->            | |       ^
-            | V                 | V               V |       |
-            |                   |                   |
-
-            c                   d                   e
-
-            |                   |                   |
-            |                   |                   |
-            |                   |4                  |
-           3 ------- f --------- -------- g --------- 5
-            | | ->              | | ->            | |
-            | V                 | V               V |
-            |                   |                   |
-
-            h                   i                   j
-
-            |                   |                   |
-            |                   |                   |       |
-            | ->                | ->                |       V
-            -------- k ------------------ l --------
-            6                   7                   8       South
-
-            a = 0 to 1
-            b = 1 to 2
-            c = 0 to 3
-            d = 1 to 4
-            e = 2 to 5
-            f = 3 to 4
-            g = 4 to 5
-            h = 3 to 6
-            i = 4 to 7
-            j = 5 to 8
-            k = 6 to 7
-            l = 7 to 8
-        '''
-    
-        self.data['coordinate_data']['quadrant_list'] = {
-            0 : 'northwest',
-            1 : 'north',
-            2 : 'northeast',
-            3 : 'west',
-            4 : 'center',
-            5 : 'east',
-            6 : 'southwest',
-            7 : 'south',
-            8 : 'southeast',
-        }
+        self.path_table = None
 
         ##
-        ## nodes
+        ## one long-lived process owns the sensors, opens each port once
+        ## and publishes the readings to shared memory, where the turn
+        ## loop and the color search read them without going to sysfs
         ##
-        self.data['coordinate_data']['nodes'] = {}
-
-        self.data['coordinate_data']['nodes'][0] = {
-            'edges' : ['a', 'c']
-        }
-        self.data['coordinate_data']['nodes'][1] = {
-            'edges' : ['a', 'b', 'd']
-        }
-        self.data['coordinate_data']['nodes'][2] = {
-            'edges' : ['b', 'e']
-        }
-        self.data['coordinate_data']['nodes'][3] = {
-            'edges' : ['c', 'f', 'h']
-        }
-        self.data['coordinate_data']['nodes'][4] = {
-            'edges' : ['d', 'g', 'i', 'f']
-        }
-        self.data['coordinate_data']['nodes'][5] = {
-            'edges' : ['e', 'g', 'j']
-        }
-        self.data['coordinate_data']['nodes'][6] = {
-            'edges' : ['h', 'k']
-        }
-        self.data['coordinate_data']['nodes'][7] = {
-            'edges' : ['k', 'i', 'l']
-        }
-        self.data['coordinate_data']['nodes'][8] = {
-            'edges' : ['j', 'l']
-        }
+        self.sensor_hub = SensorHub()
+        self.sensor_hub.add('gyro', GyroSensor, lambda sensor: sensor.angle, self.data['gyro_sample_rate'])
+        self.sensor_hub.add('color', ColorSensor, lambda sensor: sensor.color, self.data['color_sample_rate'])
+        self.sensor_hub.add('touch', TouchSensor, lambda sensor: 1 if sensor.is_pressed else 0, self.data['touch_sample_rate'])
+        self.sensor_hub.add('infrared', InfraredSensor, lambda sensor: sensor.proximity, self.data['infrared_sample_rate'])
+        self.sensor_hub.add('left', lambda: LargeMotor(OUTPUT_B), lambda motor: motor.position, self.data['pose_rate'])
+        self.sensor_hub.add('right', lambda: LargeMotor(OUTPUT_C), lambda motor: motor.position, self.data['pose_rate'])
 
         ##
-        ## edges
+        ## the pose is kept up to date by the hub, off the encoder and
+        ## gyro channels, and can be read from any process
         ##
-        self.data['coordinate_data']['edges'] = {}
-
-        self.data['coordinate_data']['edges']['a'] = {
-            'source_node' : 0,
-            'destination_node' : 1,
-            'heading' : 1,
-            'description' : 'northwest to true north'
-        }
-
-        self.data['coordinate_data']['edges']['b'] = {
-            'source_node' : 1,
-            'destination_node' : 2,
-            'heading' : 1,
-            'description' : 'true north to northeast'
-        }
-
-        self.data['coordinate_data']['edges']['c'] = {
-            'source_node' : 0,
-            'destination_node' : 3,
-            'heading' : 2,
-            'description' : 'northwest to true west'
-        }
-
-        self.data['coordinate_data']['edges']['d'] = {
-            'source_node' : 1,
-            'destination_node' : 4,
-            'heading' : 2,
-            'description' : 'true north to center'
-        }
-
-        self.data['coordinate_data']['edges']['e'] = {
-            'source_node' : 2,
-            'destination_node' : 5,
-            'heading' : 2,
-            'description' : 'northeast to true east'
-        }
-
-        self.data['coordinate_data']['edges']['f'] = {
-            'source_node' : 3,
-            'destination_node' : 4,
-            'heading' : 1,
-            'description' : 'true west to center'
-        }
+        self.pose = PoseEstimator( self.data['inches_per_rotation'],
+                                   self.data['track_width'],
+                                   self.data['pose_gyro_weight'] )
 
-        self.data['coordinate_data']['edges']['g'] = {
-            'source_node' : 4,
-            'destination_node' : 5,
-            'heading' : 1,
-            'description' : 'center to true east'
-        }
+        self.sensor_hub.attach('pose', self.pose.update, self.data['pose_rate'])
+        self.data['coordinate_data'].pose = self.pose
+        self.sensor_hub.start()
 
-        self.data['coordinate_data']['edges']['h'] = {
-            'source_node' : 3,
-            'destination_node' : 6,
-            'heading' : 2,
-            'description' : 'true west to south west'
-        }
+        self.place_pose()
+        self.prepare_patterns()
 
-        self.data['coordinate_data']['edges']['i'] = {
-            'source_node' : 4,
-            'destination_node' : 7,
-            'heading' : 2,
-            'description' : 'center to true south'
-        }
+        ##
+        ## one long-lived process owns the drive motors and runs
+        ## motion commands from a queue (no fork per motion) ... started
+        ## last, once everything it shares (motion, events, data,
+        ## telemetry) exists, since it forks a copy of the gadget
+        ##
+        self.motor_worker = MotorWorker( self.motion,
+                                         lambda: MoveTank(OUTPUT_B, OUTPUT_C),
+                                         events=self.events )
+        self.motor_worker.register('drive', self._tank_rotations)
+        self.motor_worker.register('turn', self._tank_turn)
+        self.motor_worker.start()
 
-        self.data['coordinate_data']['edges']['j'] = {
-            'source_node' : 5,
-            'destination_node' : 8,
-            'heading' : 2,
-            'description' : 'true east to south east'
-        }
+        ##
+        ## directives are queued and run off the callback thread
+        ##
+        self.scheduler = CommandScheduler()
+        self._register_directives()
+        self.scheduler.start()
 
-        self.data['coordinate_data']['edges']['k'] = {
-            'source_node' : 6,
-            'destination_node' : 7,
-            'heading' : 1,
-            'description' : 'south west to true south'
-        }
+        if self.data['turn_calibrate_on_startup'] and self.turn_controller.calibration is None:
+            self.scheduler.submit('calibrate_turns', {'intent' : 'calibrate_turns', 'startup' : True})
 
-        self.data['coordinate_data']['edges']['l'] = {
-            'source_node' : 7,
-            'destination_node' : 8,
-            'heading' : 1,
-            'description' : 'true south to south east'
-        }
+        ##
+        ## idle loop, blocks until one of self.events fires
+        ##
+        self.waiter = threading.Thread(target=self._ev3_waiter)
+        self.waiter.daemon = True
+        self.waiter.start()
 
 
 ############################################################################## 
@@ -398,55 +491,48 @@ class EV3SearchGadget(AlexaGadget):
 ############################################################################## 
 
 
-    def artificial_block(self, rotations):
-        ##
-        ## seconds for motors to come up to speed
-        ##        
-        self.rampup_time = 0.05
+    def artificial_block(self, rotations, token=None, speed=None):
+        if speed is None:
+            speed = self.data['default_bowstearn_speed']
 
         ##
-        ## @ 70% power it takes roughly 0.5 seconds per rotation
+        ## learned from the moves timed so far (MotionModel)
         ##
-        self.seconds_per_rotation = 0.5
+        total_time = self.motion_model.estimate(rotations, speed)
 
-        rampup_time = self.rampup_time
-        running_time = self.seconds_per_rotation*rotations
-
-        total_time = rampup_time+running_time
-
-        floor = math.floor(total_time)
-        ceiling = math.ceil(total_time)
-        delta = float(total_time-floor)
-
-        self.proc_manager['blocking'] = True
+        if token is None:
+            ##
+            ## nobody will report completion for this motion, fall back
+            ## to the time estimate (the killswitch still wakes us)
+            ##
+            token = self.motion.begin()
+            timeout = total_time
 
-        for a in range(int(ceiling)):
+        else:
             ##
-            ## sleep for one second up to the ceiling iteration
-            ## and then sleep for the delta between running_time
-            ## and floor
+            ## the estimate is only a safety net now ... the motor
+            ## worker reports completion, so allow it plenty of headroom
             ##
-            if self.proc_manager['blocking'] is True:
+            timeout = total_time*self.data['motion_timeout_factor']
 
-                if a == int(ceiling-1):
-                    ##
-                    ## sleep delta value
-                    ##
-                    sleep_time = delta
+        self.control.blocking = True
 
-                else:
-                    ##
-                    ## sleep whole second
-                    ##
-                    sleep_time = 1
+        ##
+        ## wakes as soon as the motors finish or the killswitch fires
+        ##
+        s = time.time()
+        state = self.motion.wait(token, timeout=timeout)
 
-                time.sleep(sleep_time)
+        self.control.blocking = False
 
-            else:
-                print('[+] ({}) Artificial blocker interrupted at {}'.format(datetime.datetime.now(), a))
-                break
+        if state == MotionCompletion.INTERRUPTED:
+            stats = self.motion.latency_stats()
+            print('[+] ({}) Artificial blocker interrupted after {:.3f} seconds (interrupt latency {:.1f} ms)'.format(datetime.datetime.now(), time.time()-s, stats['last']*1000))
 
-        return
+        elif state == MotionCompletion.TIMEOUT and timeout > total_time:
+            print('[-] ({}) Artificial blocker timed out after {:.3f} seconds'.format(datetime.datetime.now(), time.time()-s))
+
+        return state
 
 
 ############################################################################## 
@@ -460,7 +546,8 @@ class EV3SearchGadget(AlexaGadget):
 
     def respond_to_alexa( self, report=None, 
                           namespace='Custom.EV3SearchGadget', 
-                          name='EV3Response'):
+                          name='EV3Response',
+                          data=None):
         """
         Callback to Alexa to report
         """
@@ -474,6 +561,9 @@ class EV3SearchGadget(AlexaGadget):
                 'report' : report
             }
 
+            if data is not None:
+                payload.update(data)
+
             print('[+] Responding to Alexa: {} : {}'.format(namespace, name))
             self.send_custom_event(namespace, name, payload)
 
@@ -497,82 +587,214 @@ class EV3SearchGadget(AlexaGadget):
         """ 
 
         payload = json.loads(directive.payload.decode("utf-8")) 
+
+        ##
+        ## receipt time, used to time the stop path of the killswitch
+        ##
+        payload['received_at'] = time.monotonic()
   
-        self.data['instruction_id_list'].append(payload)
+        self.telemetry.record(telemetry.DIRECTIVE, a=telemetry.intent_code(payload.get('intent')))
 
         ## 
-        ## do thing here 
+        ## hand the directive to the scheduler and return right away,
+        ## so a killswitch is never stuck behind a running command
         ## 
 
         if 'slots' in payload:
-            slots = payload['slots']
-            print(slots)
+            print(payload['slots'])
 
         if 'intent' in payload:
-            if payload['intent'] == 'launch':
-                print('[+] {}'.format('Receieved Launch'))
-                self.launch_robot()
+            print('[+] ({}) Receieved {}'.format(datetime.datetime.now(), payload['intent']))
+            self.scheduler.submit(payload['intent'], payload)
+            self.events.signal(GadgetEvents.DIRECTIVE)
+
+
+############################################################################## 
+############################################################################## 
+## 
+## 
+## 
+############################################################################## 
+############################################################################## 
+
+
+    def _load_tuning(self, path):
+        """
+        Override data keys with the winning configuration of a parameter
+        sweep (sweep.py), if there is one.  Unknown keys are ignored
+        """
+        if not os.path.exists(path):
+            return
+
+        try:
+            with open(path) as f:
+                tuning = json.load(f)
+
+            for key, value in tuning.items():
+                if key.startswith('_') or key not in self.data:
+                    continue
+
+                print('[+] ({}) Tuning {}: {} -> {}'.format(datetime.datetime.now(), key, self.data[key], value))
+                self.data[key] = value
+
+        except Exception as e:
+            exc_type, exc_obj, exc_tb = sys.exc_info()
+            print('[-] Load Tuning Error: {} on line {}'.format(e, exc_tb.tb_lineno))
+
+
+############################################################################## 
+############################################################################## 
+## 
+## 
+## 
+############################################################################## 
+############################################################################## 
+
+
+    def _register_directives(self):
+        """
+        Dispatch table for Custom.EV3SearchGadget.Response intents
+        """
+        s = self.scheduler
+
+        s.register('launch', lambda payload: self.launch_robot())
+
+        ##
+        ## anything that moves the robot first lifts the halt the last
+        ## killswitch left on the motion completion
+        ##
+        moves = self._resume_motion
+
+        s.register( 'move_robot', moves(self._dispatch_move_robot),
+                    coalesce=self._coalesce_amount( 'BowStearnDirection', 'BowStearnDuration',
+                                                    'default_bowstearn_rotations' ) )
+
+        s.register( 'turn_robot', moves(self._dispatch_turn_robot),
+                    coalesce=self._coalesce_amount( 'PortStarboardDirection', 'PortStarboardDuration',
+                                                    'default_portstarboard_angle' ) )
+
+        s.register('start_search', moves(self._dispatch_start_search))
+        s.register('walk_perimeter', moves(lambda payload: self.walk_perimeter(payload=payload)))
+        s.register('set_grid', self._dispatch_set_grid, coalesce=self._coalesce_set_grid)
+        s.register('go_to_position', moves(self._dispatch_go_to_position))
+        s.register('calibrate_turns', moves(lambda payload: self.calibrate_turns(payload=payload)))
+
+        ##
+        ## stop/cancel and expiry jump ahead of queued motion
+        ##
+        s.register('stop_cancel', lambda payload: self.stop_cancel_robot(), priority=CommandScheduler.HIGH)
+        s.register('expired', lambda payload: self.stop_cancel_robot(), priority=CommandScheduler.HIGH)
+
+        ##
+        ## killswitch and pause preempt everything
+        ##
+        s.register('pause_robot', lambda payload: self.pause_robot(), preempt=True)
+        s.register('killswitch', lambda payload: self.killswitch(received=payload.get('received_at')), preempt=True, clear_queue=True)
+
+
+    def _resume_motion(self, handler):
+        """
+        Wrap a directive handler so it resumes motion before it runs
+        """
+        def run(payload):
+            self.motion.resume()
+            return handler(payload)
+
+        return run
+
+
+    def _dispatch_move_robot(self, payload):
+        ##
+        ## one answer per request, even when several were collapsed
+        ## into this one move
+        ##
+        for request in range(self._requests(payload)):
+            self.respond_to_alexa( report='move robot',
+                                   name='EV3ResponseAfterMove')
+
+        ##
+        ## the motion itself runs on the motor worker, this only waits
+        ## on it (the killswitch interrupts the wait)
+        ##
+        self.move_robot(payload=payload, slots=payload.get('slots'))
 
-            elif payload['intent'] == 'move_robot':
-                print('[+] {}'.format('Receieved move robot'))
 
+    def _dispatch_turn_robot(self, payload):
+        self.turn_robot(payload=payload, slots=payload.get('slots'))
 
-                kwargs = {
-                    'payload' : payload,
-                    'slots' : slots
-                }
 
-                mv = multiprocessing.Process(target=self.move_robot, kwargs=kwargs) 
-                mv.start() 
-                self.proc_manager['motor_processes'].append(mv)
+    def _dispatch_start_search(self, payload):
+        self.control.search = True
+        self.start_search(payload=payload)
 
-                self.respond_to_alexa( report='move robot',
-                                       name='EV3ResponseAfterMove')
+        self.respond_to_alexa( report='start search',
+                               name='EV3ResponseAfterStartSearch')
 
-            elif payload['intent'] == 'turn_robot':
-                print('[+] {}'.format('Receieved turn robot'))
-                self.turn_robot(payload=payload, slots=slots)
 
-            elif payload['intent'] == 'start_search':
-                print('[+] ({}) {}'.format(datetime.datetime.now(), 'Receieved start_search'))
+    def _dispatch_set_grid(self, payload):
+        self.set_grid(payload=payload, slots=payload.get('slots'))
 
-                self.proc_manager['search'] = True
 
-                kwargs = {
-                    'payload' : payload
-                }
+    def _dispatch_go_to_position(self, payload):
+        self.go_to_position(payload=payload, slots=payload.get('slots'))
 
-                search = multiprocessing.Process(target=self.start_search, kwargs=kwargs) 
-                search.start() 
-                self.proc_manager['motor_processes'].append(search)
 
-                self.respond_to_alexa( report='start search',
-                                       name='EV3ResponseAfterStartSearch')
+    def _coalesce_amount(self, direction_slot, amount_slot, default_key):
+        """
+        Two queued moves (or turns) in the same direction collapse
+        into one with the summed amount, a missing amount counting as
+        the configured default (data key default_key, read when they
+        are merged)
+        """
+        def slot_value(payload, name):
+            slot = (payload.get('slots') or {}).get(name) or {}
+            return slot.get('value')
+
+        def coalesce(queued, new):
+            if slot_value(queued, direction_slot) != slot_value(new, direction_slot):
+                return None
+
+            try:
+                amount = 0
+                for p in (queued, new):
+                    value = slot_value(p, amount_slot)
+                    amount += int(value) if value is not None else self.data[default_key]
+
+            except ValueError:
+                return None
+
+            merged = copy.deepcopy(new)
+            slots = merged.setdefault('slots', {})
+            slots.setdefault(amount_slot, {'name' : amount_slot})
+            slots[amount_slot]['value'] = str(amount)
+
+            merged['coalesced'] = self._requests(queued)+self._requests(new)
+
+            return merged
 
+        return coalesce
 
-            elif payload['intent'] == 'walk_perimeter':
-                print('[+] {}'.format('Receieved walk_perimeter'))
-                self.walk_perimeter(payload=payload)
 
-            elif payload['intent'] == 'pause_robot':
-                print('[+] {}'.format('Receieved pause robot'))
-                self.pause_robot()
+    def _coalesce_set_grid(self, queued, new):
+        ##
+        ## setting the same grid value twice ... the newer one wins
+        ##
+        if set((queued.get('slots') or {}).keys()) == set((new.get('slots') or {}).keys()):
+            merged = dict(new)
+            merged['coalesced'] = self._requests(queued)+self._requests(new)
 
-            elif payload['intent'] == 'killswitch':
-                print('[+] {}'.format('Receieved killswitch'))
-                self.killswitch()
+            return merged
 
-            elif payload['intent'] == 'stop_cancel':
-                print('[+] {}'.format('Receieved stop/cancel'))
-                self.stop_cancel_robot()
+        return None
 
-            elif payload['intent'] == 'expired':
-                print('[+] {}'.format('Receieved expired'))
-                self.stop_cancel_robot()
 
-            elif payload['intent'] == 'set_grid':
-                print('[+] {}'.format('Receieved set grid'))
-                self.set_grid(payload=payload, slots=slots)
+    def _requests(self, payload):
+        """
+        How many skill requests a directive answers: more than one once
+        queued requests have been collapsed into it, and the skill still
+        waits for an answer to each
+        """
+        return (payload or {}).get('coalesced', 1)
 
 
 ############################################################################## 
@@ -588,29 +810,30 @@ class EV3SearchGadget(AlexaGadget):
 
         print('[+] Executing walk_perimeter function')
 
-        instruction_id = str(uuid.uuid4())
-        s = time.time()
-        self.data['instruction_id_list'].append(instruction_id)
+        rec = self.telemetry.begin(telemetry.WALK_PERIMETER)
 
-        i = {
-            'type' : 'start_walk_perimeter',
-            'start_time' : s
-        }
+        self.control.increment('searches')
 
-        self.data['instruction_data'][instruction_id] = i
+        ##
+        ## plan (or fetch the cached plan) here, before forking, so the
+        ## tour stays cached in the gadget rather than in the walker
+        ##
+        g, position, heading = self.walk_start()
+        self.route_planner.perimeter_tour(g, position, heading)
 
         ##
         ## color search thread
         ##
-        color_search = multiprocessing.Process(target=self.color_search_function) 
+        color_search = multiprocessing.Process(target=self._run_job, args=(self.color_search_function,)) 
         color_search.start() 
 
-        walker = multiprocessing.Process(target=self.walk_perimeter_function) 
+        walker = multiprocessing.Process(target=self._run_job, args=(self.walk_perimeter_function,)) 
         walker.start() 
-        self.proc_manager['motor_processes'].append(walker)
 
-        end = time.time()
-        self.data['instruction_data'][instruction_id]['end_time'] = end
+        with self.motor_processes_lock:
+            self.motor_processes.append(walker)
+
+        self.telemetry.end(rec)
 
 
 ############################################################################## 
@@ -622,235 +845,499 @@ class EV3SearchGadget(AlexaGadget):
 ############################################################################## 
 
 
-    def walk_perimeter_function(self, payload=None): 
-        print('[+] Executing walk_perimeter_function')
+    def search_grid(self):
+        """
+        The grid graph for the configured resolution: nodes at most
+        grid_spacing inches apart over the field, or grid_columns x
+        grid_rows nodes.  Rebuilt only when that changes
+        """
+        coordinates = self.data['coordinate_data']
+        spacing = self.data['grid_spacing']
 
-        instruction_id = str(uuid.uuid4())
-        s = time.time()
-        self.data['instruction_id_list'].append(instruction_id)
+        if spacing:
+            key = (coordinates['grid_width'], coordinates['grid_height'], spacing)
+        else:
+            key = (coordinates['grid_columns'], coordinates['grid_rows'])
 
-        try:
+        g = self.grid_graph
+        if g is None or self.grid_key != key:
+            if spacing:
+                g = GridGraph.for_field(*key)
 
-            self.proc_manager['search'] = True
+                while g.edges > self.data['grid_max_edges']:
+                    spacing *= 1.25
+                    g = GridGraph.for_field(key[0], key[1], spacing)
 
-            speed = self.data['default_bowstearn_speed']
-            width = self.data['coordinate_data']['grid_width']
-            height = self.data['coordinate_data']['grid_height']
+                if spacing != key[2]:
+                    print('[-] ({}) A {} inch grid spacing is finer than grid_max_edges allows, using {:.1f} inches'.format(
+                        datetime.datetime.now(), key[2], spacing))
 
-            if self.data['coordinate_data']['current_grid_position'] is None:
-                position = self.data['coordinate_data']['starting_grid_position']
             else:
-                position = self.data['coordinate_data']['current_grid_position']
+                g = GridGraph(*key)
 
-            heading = self.data['coordinate_data']['heading']
+                if g.edges > self.data['grid_max_edges']:
+                    raise ValueError('a {} x {} grid has more than the {} edges allowed'.format(g.columns, g.rows, self.data['grid_max_edges']))
 
-            i = {
-                'type' : 'walk_perimeter_function',
-                'start_time' : s,
-                'grid_width' : width,
-                'grid_height' : height,
-                'position' : position,
-                'heading' : heading
-            }
-            self.data['instruction_data'][instruction_id] = i
+            self.grid_graph = g
+            self.grid_key = key
 
-            nodes = self.data['coordinate_data']['nodes']
-            edges = self.data['coordinate_data']['edges']
+            print('[+] ({}) Built {} x {} search grid: {} nodes, {} edges'.format(datetime.datetime.now(), g.columns, g.rows, g.nodes, g.edges))
 
-            total_nodes = len(nodes)
-            total_edges = len(edges)
+        return g
 
-            nodes_traversed = []
-            edges_traversed = []
-            perimeter_edges_traversed = []
 
-            nodes_repeated = []
-            edges_repeated = []
+    def walk_start(self):
+        """
+        (grid, node, heading) the next walk starts from
+        """
+        g = self.search_grid()
 
-            ##
-            ## need to append starting node to list
-            ## to prevent an immediate repeat visit
-            ##
-            nodes_traversed.append(position)
+        ##
+        ## node and heading from the same update
+        ##
+        state = self.data['coordinate_data'].snapshot()
 
-            p = self.data['coordinate_data']['quadrant_list'][position]
+        position = state['current_grid_position']
+        if position is None or position >= g.nodes:
+            position = g.cardinal_node(state['starting_grid_position'])
 
-            print('[+] Starting position: {}'.format(p))
-            print('[+] Starting heading: {}'.format(heading))
-            print('[+] There are {} nodes to traverse'.format(total_nodes))
-            print('[+] There are {} edges to traverse'.format(total_edges))
+        return g, position, state['heading']
 
-            while (len(nodes_traversed) < total_nodes) or (len(perimeter_edges_traversed) < 8):
 
-                if self.proc_manager['search'] is True:
+    def paths(self):
+        """
+        Shortest path table for the current grid, reweighted when the
+        grid dimensions change
+        """
+        g = self.search_grid()
+        spacing_ew, spacing_ns = g.spacing( self.data['coordinate_data']['grid_width'],
+                                            self.data['coordinate_data']['grid_height'] )
 
-                    ##
-                    ## get the current node
-                    ##
-                    current_node = nodes[position]
+        t = self.path_table
+        if t is None or t.g is not g:
+            t = PathTable(g, spacing_ew, spacing_ns, self.data['coordinate_data']['turn_cost'])
+            self.path_table = t
 
-                    ##
-                    ## walk through the current nodes and score them as
-                    ## possible next-hop targets
-                    ##
-                    data = {}
-                    for line in current_node['edges']:
-                        node_score = 0
-                        edge = edges[line]
-                        edge_heading = edge['heading']
-                        edge_destination = edge['destination_node']
-                        edge_source = edge['source_node']
+        elif t.set_spacing(spacing_ew, spacing_ns):
+            print('[+] ({}) Reweighted path table for {} x {} inch spacing'.format(datetime.datetime.now(), spacing_ew, spacing_ns))
 
-                        ##
-                        ## if the edge destination node is less than the current node
-                        ## then lookup the heading compliment to get the reverse heading 
-                        ## from the heading data structure
-                        ##
-                        if edge_destination == position:
-                            edge_destination = edge_source
+        return t
 
-                        if position > edge_destination:
-                            edge_heading = self.data['coordinate_data']['heading_compliments'][edge_heading]
 
-                        p = self.data['coordinate_data']['quadrant_list'][edge_destination]
+############################################################################## 
+############################################################################## 
+## 
+## 
+## 
+############################################################################## 
+############################################################################## 
 
-                        if edge_heading == heading:
-                            node_score += 1
-                        else:
-                            turn_angle = self.data['coordinate_data']['heading_angles'][heading][edge_heading]
-                            if turn_angle > 0:
-                                node_score -= (abs(turn_angle)/90)
 
-                        if edge_destination not in nodes_traversed:
-                            node_score += 1
+    def node_inches(self, g, node):
+        """
+        (x, y) of a grid node in inches east and south of the north
+        west corner, the pose estimator's frame
+        """
+        spacing_ew, spacing_ns = g.spacing( self.data['coordinate_data']['grid_width'],
+                                            self.data['coordinate_data']['grid_height'] )
+        row, column = g.position(node)
 
-                        if line not in edges_traversed:
-                            node_score += 1
+        return (column*spacing_ew, row*spacing_ns)
 
-                            ##
-                            ## check that destination node is not center
-                            ##
-                            dest_edges = self.data['coordinate_data']['nodes'][edge_destination]['edges']
-                            if len(dest_edges) < 4:
-                                ##
-                                ## then the destination node for this edge is the center
-                                ## node.  And since this algorithm should favor
-                                ## untraversed perimeter nodes, then downgrade this
-                                ## edge's node score
-                                ##
-                                node_score += 1
-
-                        data[line] = node_score
 
-                    ##
-                    ## select the next node based on scoring
-                    ##
-                    top_score = None
-                    for d in data:
-                        if top_score is None:
-                            top_score =  data[d]
-                            selected_edge = d
-                        elif data[d] >= top_score:
-                            top_score = data[d]
-                            selected_edge = d
+    def place_pose(self):
+        """
+        Put the pose estimate on the node and heading the next walk
+        starts from
+        """
+        g, node, heading = self.walk_start()
+        x, y = self.node_inches(g, node)
 
-                    ##
-                    ## OK, travelling to next hop
-                    ##
-                    selected_edge_heading = edges[selected_edge]['heading']
-                    selected_edge_destination = edges[selected_edge]['destination_node']
-                    selected_edge_source = edges[selected_edge]['source_node']
+        self.pose.place(x, y, heading*90)
 
-                    if selected_edge_destination == position:
-                        selected_edge_destination = selected_edge_source
-                        selected_edge_heading = self.data['coordinate_data']['heading_compliments'][selected_edge_heading]
 
+    def leg_to(self, g, node, heading, leg):
+        """
+        (degrees to turn, inches to drive) for the grid leg from node,
+        facing heading, along leg
 
-                    print('[+] ({}) Destination node: {} Destination Heading: {}'.format(datetime.datetime.now(), selected_edge_destination, selected_edge_heading))
+        Aimed from the pose estimate at the next node, so drift picked
+        up on earlier legs is driven out instead of carried along.  The
+        nominal leg if there is no estimate or it has wandered too far
+        from the grid to be trusted
+        """
+        spacing_ew, spacing_ns = g.spacing( self.data['coordinate_data']['grid_width'],
+                                            self.data['coordinate_data']['grid_height'] )
 
-                    if selected_edge_heading != heading:
-                        print('[+] ({}) Calculating turn angle based on current heading {} and destination heading {}'.format(datetime.datetime.now(), heading, selected_edge_heading))
-                        turn_angle = self.data['coordinate_data']['heading_angles'][heading][selected_edge_heading]
-                        ##
-                        ## now turn the bot
-                        ##
-                        print('[+] ({}) Turning the bot {} degrees'.format(datetime.datetime.now(), turn_angle))
-                        self.move_port_starboard( degrees=turn_angle, block=False)
+        degrees = grid.turn_angle(heading, leg) if leg != heading else 0
+        inches = spacing_ew if leg%2 > 0 else spacing_ns
+
+        pose = self.pose.pose()
+        if pose is None:
+            return (degrees, inches)
+
+        x, y, theta = pose
+        cx, cy = self.node_inches(g, node)
+
+        if math.hypot(x-cx, y-cy) > self.data['pose_max_drift']:
+            print('[-] ({}) Pose ({:.1f}, {:.1f}) is too far from {}, driving the nominal leg'.format(
+                datetime.datetime.now(), x, y, g.describe(node)))
+
+            return (degrees, inches)
+
+        tx, ty = self.node_inches(g, g.neighbour(node, leg))
+        dx, dy = tx-x, ty-y
+
+        bearing = math.degrees(math.atan2(dx, -dy))
+        correction = (bearing-theta+180)%360-180
+
+        if abs(correction) < self.data['pose_heading_tolerance']:
+            correction = 0
+
+        return (int(round(correction)), math.hypot(dx, dy))
+
+
+    def new_coverage_map(self):
+        """
+        An empty coverage map of the configured field, or None without
+        numpy
+        """
+        if coverage_map.numpy is None:
+            print('[-] numpy is not installed, searching without a coverage map')
+            return None
+
+        return coverage_map.CoverageMap( self.data['coordinate_data']['grid_width']*12,
+                                         self.data['coordinate_data']['grid_height']*12,
+                                         cell=self.data['sensor_footprint'],
+                                         subject_radius=self.data['subject_radius'],
+                                         p_detect=self.data['coverage_p_detect'] )
+
+
+    def sensor_position(self):
+        """
+        (x, y) inches of the color sensor from the pose estimate, or
+        None
+        """
+        pose = self.pose.pose()
+        if pose is None:
+            return None
+
+        x, y, heading = pose
+        offset = self.data['color_sensor_offset']
+
+        return ( x+offset*math.sin(math.radians(heading)),
+                 y-offset*math.cos(math.radians(heading)) )
+
+
+    def search_start(self):
+        """
+        (x, y, heading) the search starts from: the pose estimate, or
+        the current grid node if there is none
+        """
+        start = self.pose.pose()
+        if start is None:
+            g, node, heading = self.walk_start()
+            x, y = self.node_inches(g, node)
+            start = (x, y, heading*90)
+
+        return start
+
+
+    def color_rate(self):
+        """
+        Color samples per second actually being taken: the slower of
+        the sensor hub's color channel (over its recent samples) and the
+        color search loop
+        """
+        rates = []
+
+        samples = self.sensor_hub.recent('color')
+        if len(samples) > 1 and samples[-1][0] > samples[0][0]:
+            rates.append((len(samples)-1)/(samples[-1][0]-samples[0][0]))
+
+        sampled = self.color_sampler.stats()['samples_per_second']
+        if sampled > 0:
+            rates.append(sampled)
+
+        if not rates:
+            return self.data['color_sample_rate']
+
+        return min(rates)
+
+
+    def search_speed(self):
+        """
+        Drive speed (percent) for the next search leg
+        """
+        if not self.data['search_speed_control']:
+            return self.data['default_bowstearn_speed']
+
+        return self.speed_controller.update(self.color_rate())
+
+
+    def report_search_speed(self):
+        """
+        Log and record how fast the last search drove and how much
+        floor it swept per second
+        """
+        stats = self.speed_controller.stats()
+        if stats['updates'] == 0:
+            return
+
+        ##
+        ## a = speed (percent), b = color samples/s, c = square inches
+        ## swept per second
+        ##
+        self.telemetry.record(telemetry.SEARCH_SPEED, a=stats['speed'], b=stats['rate'], c=stats['area_per_second'])
+
+        print('[+] ({}) Search speed {}% ({:.1f} in/s, sampling allows {:.1f} in/s at {:.1f} samples/s, {} of {} legs held back), sweeping {:.0f} sq in/s ({:.1f} sq ft/min)'.format(
+            datetime.datetime.now(), stats['speed'], stats['inches_per_second'], stats['max_inches_per_second'], stats['rate'],
+            stats['limited'], stats['updates'], stats['area_per_second'], stats['area_per_second']*60/144.0))
+
+
+    def track_spacing(self):
+        """
+        Inches between the lanes of the standard search patterns
+        """
+        sweep_width = self.data['sensor_footprint']+2*self.data['subject_radius']
+
+        return sweep_width/float(self.data['coverage_factor'])
+
+
+    def prepare_patterns(self):
+        """
+        Build the leg tables of the standard search patterns for the
+        grid and the tank's place on it, before any search forks
+        """
+        try:
+            s = time.monotonic()
+
+            legs = self.pattern_library.prepare( self.data['coordinate_data']['grid_width']*12,
+                                                 self.data['coordinate_data']['grid_height']*12,
+                                                 self.track_spacing(),
+                                                 self.data['inches_per_rotation'],
+                                                 self.search_start() )
+
+            print('[+] ({}) Search patterns ready: {} legs in {:.1f} ms'.format(
+                datetime.datetime.now(), legs, (time.monotonic()-s)*1000))
+
+        except Exception as e:
+            exc_type, exc_obj, exc_tb = sys.exc_info()
+            print('[-] prepare_patterns Error: {} on line {}'.format(e, exc_tb.tb_lineno))
+
+
+    def search_legs(self, pattern):
+        """
+        Legs for a start search pattern (see search_pattern above)
+        """
+        if pattern == 'coverage' and self.coverage is not None:
+            return self.coverage_legs()
+
+        if pattern in patterns.LIBRARY:
+            return self.pattern_library.legs( pattern,
+                                              self.data['coordinate_data']['grid_width']*12,
+                                              self.data['coordinate_data']['grid_height']*12,
+                                              self.track_spacing(),
+                                              self.data['inches_per_rotation'],
+                                              self.search_start() )
+
+        return patterns.spiral( first=self.data['spiral_first'],
+                                grow=self.data['spiral_grow'],
+                                angle=self.data['default_portstarboard_angle'] )
+
+
+    def mission_model(self):
+        """
+        What the skill needs to predict mission times (lambda
+        estimator.py): the grid, the drive and turn timings measured so
+        far, and the perimeter walk, turn calibration and standard
+        search patterns as planned now, each [rotations, degrees
+        turned, legs]
+        """
+        coordinates = self.data['coordinate_data']
+        rot_inches = self.data['inches_per_rotation']
+
+        g, node, heading = self.walk_start()
+        spacing_ew, spacing_ns = g.spacing(coordinates['grid_width'], coordinates['grid_height'])
+        tour = self.route_planner.perimeter_tour(g, node, heading)
+
+        plans = {}
+        plans['walk_perimeter'] = patterns.totals(patterns.tour(g, tour, spacing_ew, spacing_ns, rot_inches))
+
+        for pattern in patterns.LIBRARY:
+            plans[pattern] = patterns.totals(self.search_legs(pattern))
+
+        ##
+        ## every calibration angle right and left, at every speed
+        ##
+        table = TurnCalibration()
+        plans['calibrate_turns'] = [0, 2*sum(table.angles)*len(table.speeds), 2*len(table.angles)*len(table.speeds)]
+
+        for name in plans:
+            plans[name][0] = round(plans[name][0], 1)
+
+        settle = self.turn_controller.stats()['mean_settle']
+
+        ##
+        ## the walk and the searches drive at the search speed
+        ##
+        search_speed = self.data['default_bowstearn_speed']
+        if self.data['search_speed_control']:
+            search_speed = self.speed_controller.choose(self.color_rate())
+
+        return {
+            'grid_width' : coordinates['grid_width'],
+            'grid_height' : coordinates['grid_height'],
+            'inches_per_rotation' : rot_inches,
+            'seconds_per_rotation' : round(self.motion_model.seconds_per_rotation(self.data['default_bowstearn_speed']), 3),
+            'search_seconds_per_rotation' : round(self.motion_model.seconds_per_rotation(search_speed), 3),
+            'seconds_per_turn' : round(settle, 3) if settle else None,
+            'leg_gap' : self.data['leg_gap'],
+            'default_rotations' : self.data['default_bowstearn_rotations'],
+            'default_degrees' : self.data['default_portstarboard_angle'],
+            'search_pattern' : self.data['search_pattern'],
+            'plans' : plans
+        }
+
+
+    def coverage_legs(self):
+        """
+        Search legs picked one at a time off the coverage map, for the
+        'coverage' search pattern
+        """
+        start = self.search_start()
+
+        speed = self.data['default_bowstearn_speed']
+        drive_rate = self.data['inches_per_rotation']/self.motion_model.seconds_per_rotation(speed)
+
+        turn_rate = 90.0
+        mean_settle = self.turn_controller.stats()['mean_settle']
+        if mean_settle:
+            turn_rate = 90.0/mean_settle
+
+        return coverage_map.greedy_legs( self.coverage,
+                                         start,
+                                         inches_per_rotation=self.data['inches_per_rotation'],
+                                         lengths=self.data['coverage_leg_lengths'],
+                                         drive_rate=drive_rate,
+                                         turn_rate=turn_rate,
+                                         offset=self.data['color_sensor_offset'] )
+
+
+############################################################################## 
+############################################################################## 
+## 
+## 
+## 
+############################################################################## 
+############################################################################## 
+
+
+    def walk_perimeter_function(self, payload=None): 
+        print('[+] Executing walk_perimeter_function')
+
+        rec = None
+
+        try:
+
+            self.control.search = True
+            self.speed_controller.reset()
+
+            g, position, heading = self.walk_start()
+
+            rec = self.telemetry.begin(telemetry.PERIMETER_WALK, a=position, b=heading)
+
+            ##
+            ## the route is planned once per grid, start and heading
+            ##
+            tour = self.route_planner.perimeter_tour(g, position, heading)
+
+            rot_inches = self.data['inches_per_rotation']
+
+            print('[+] Starting position: {}'.format(g.describe(position)))
+            print('[+] Starting heading: {}'.format(heading))
+            print('[+] There are {} nodes and {} edges in the grid'.format(g.nodes, g.edges))
+            print('[+] Planned {} legs ({} repeated, {} turns) ending at {}'.format(len(tour), tour.repeated, tour.turns, g.describe(tour.end)))
+            print('[+] {} edges driven on earlier missions on this grid'.format(self.data['coordinate_data'].snapshot()['covered']))
+
+            legs = 0
+            for selected_edge_heading in tour.legs:
+
+                if self.control.search is not True:
+                    break
 
+                ##
+                ## the turn and the distance come from the pose, so
+                ## drift is corrected on the way to the next node
+                ##
+                turn_angle, segment_inches = self.leg_to(g, position, heading, selected_edge_heading)
+
+                if turn_angle != 0:
                     ##
-                    ## now drive the bot to the new position
+                    ## now turn the bot
                     ##
-                    position = selected_edge_destination
-                    heading = selected_edge_heading
+                    print('[+] ({}) Turning the bot {} degrees'.format(datetime.datetime.now(), turn_angle))
+                    self.move_port_starboard( degrees=turn_angle, block=False)
 
-                    rot_inches = self.data['inches_per_rotation']
-
-                    if heading%2 > 0:
-                        ##
-                        ## odd headings are east/west
-                        ## so use grid width to calculate distance
-                        ##
-                        width = self.data['coordinate_data']['grid_width']
-                        grid_inches = width*12
-                        segment_inches = grid_inches/2
-                        rotations = segment_inches/rot_inches
+                    ##
+                    ## the killswitch may have cut the turn short
+                    ##
+                    if self.control.search is not True:
+                        break
 
-                    else:
-                        ##
-                        ## even headings are north/south
-                        ## so use grid height to calculate distance
-                        ##
-                        height = self.data['coordinate_data']['grid_height']
-                        grid_inches = height*12
-                        segment_inches = grid_inches/2
-                        rotations = segment_inches/rot_inches
+                ##
+                ## now drive the bot to the new position
+                ##
+                edge = g.edge(position, selected_edge_heading)
+                position = g.neighbour(position, selected_edge_heading)
+                heading = selected_edge_heading
 
-                    print('[+] ({}) Driving {} inches using {} rotations'.format(datetime.datetime.now(), segment_inches, rotations))
+                print('[+] ({}) Destination node: {} Destination Heading: {}'.format(datetime.datetime.now(), position, heading))
 
-                    self.move_bow_stearn( rotations=rotations, 
-                                          speed=speed,
-                                          brake=False,
-                                          block=False )
+                rotations = segment_inches/rot_inches
+                speed = self.search_speed()
 
-                    self.artificial_block(rotations)
+                print('[+] ({}) Driving {:.1f} inches using {:.2f} rotations at {}%'.format(datetime.datetime.now(), segment_inches, rotations, speed))
 
-                    if selected_edge_destination not in nodes_traversed:
-                        nodes_traversed.append(selected_edge_destination)
-                    else:
-                        nodes_repeated.append(selected_edge_destination)
+                token = self.move_bow_stearn( rotations=rotations, 
+                                              speed=speed,
+                                              brake=False,
+                                              block=False )
 
-                    if selected_edge not in edges_traversed:
-                        edges_traversed.append(selected_edge)
+                self.artificial_block(rotations, token=token, speed=speed)
 
-                        edge = edges[selected_edge]
-                        edge_heading = edge['heading']
-                        edge_destination = edge['destination_node']
-                        edge_source = edge['source_node']
+                legs += 1
 
-                        dest_edges = self.data['coordinate_data']['nodes'][edge_destination]['edges']
-                        src_edges = self.data['coordinate_data']['nodes'][edge_source]['edges']
+                ##
+                ## shared with the gadget, so the next mission starts
+                ## from here even though this runs in a forked process
+                ##
+                self.data['coordinate_data'].update(current_grid_position=position, heading=heading)
+                self.data['coordinate_data'].cover(edge)
 
-                        if len(dest_edges) < 4 and len(src_edges) < 4:
-                            perimeter_edges_traversed.append(selected_edge)
+            print('[+] Perimeter walk complete ({} of {} legs)'.format(legs, len(tour)))
 
-                    else:
-                        edges_repeated.append(selected_edge)
+            self.report_search_speed()
 
-            print('[+] Perimeter walk complete')
+            ##
+            ## the skill waits for this ... unless the walk was stopped
+            ## (killswitch, subject found), which answers for itself
+            ##
+            if self.control.search is True:
+                self.respond_to_alexa( report='walk perimeter',
+                                       name='EV3ResponseAfterWalkPerimeter',
+                                       data={'legs' : legs} )
 
             ##
             ## got to the end and didn't find the subject ... subject not on perimeter
             ##
-            self.proc_manager['search'] = False
-            self.proc_manager['subject_found'] = True # stops the color search function
+            self.control.search = False
+            self.control.subject_found = True # stops the color search function
 
-            print('[+] Traversed {} nodes of {}'.format(len(nodes_traversed), total_nodes))
-            print('[+] Traversed {} edges of {}'.format(len(edges_traversed), total_edges))
-            print('[+] Repeated {} nodes'.format(len(nodes_repeated)))
-            print('[+] Repeated {} edges'.format(len(edges_repeated)))
-
-            end = time.time()
-            self.data['instruction_data'][instruction_id]['end_time'] = end
+            ##
+            ## a = finishing position, b = heading, c = edges driven
+            ##
+            self.telemetry.end(rec, a=position, b=heading, c=legs)
 
         except Exception as e:
             exc_type, exc_obj, exc_tb = sys.exc_info()
@@ -869,29 +1356,31 @@ class EV3SearchGadget(AlexaGadget):
     def start_search(self, payload=None): 
         print('[+] ({}) Executing start_search function'.format(datetime.datetime.now()))
 
-        instruction_id = str(uuid.uuid4())
-        s = time.time()
-        self.data['instruction_id_list'].append(instruction_id)
+        rec = self.telemetry.begin(telemetry.START_SEARCH)
 
-        i = {
-            'type' : 'start_search',
-            'start_time' : s,
-        }
+        self.control.increment('searches')
 
-        self.data['instruction_data'][instruction_id] = i
+        ##
+        ## pattern named by the skill (StartSearchIntent SearchPattern
+        ## slot), or the default
+        ##
+        pattern = self.data['search_pattern']
+        if payload is not None and payload.get('pattern'):
+            pattern = payload['pattern']
 
         ##
         ## color search thread
         ##
-        color_search = multiprocessing.Process(target=self.color_search_function) 
+        color_search = multiprocessing.Process(target=self._run_job, args=(self.color_search_function,)) 
         color_search.start() 
 
-        intellisearch = multiprocessing.Process(target=self.intellisearch_function) 
+        intellisearch = multiprocessing.Process(target=self._run_job, args=(lambda: self.intellisearch_function(pattern),)) 
         intellisearch.start() 
-        self.proc_manager['motor_processes'].append(intellisearch)
 
-        end = time.time()
-        self.data['instruction_data'][instruction_id]['end_time'] = end
+        with self.motor_processes_lock:
+            self.motor_processes.append(intellisearch)
+
+        self.telemetry.end(rec)
 
 
 ############################################################################## 
@@ -906,22 +1395,13 @@ class EV3SearchGadget(AlexaGadget):
     def launch_robot(self): 
         print('[+] Executing launch_robot function')
 
-        instruction_id = str(uuid.uuid4())
-        s = time.time()
-        self.data['instruction_id_list'].append(instruction_id)
+        rec = self.telemetry.begin(telemetry.LAUNCH)
 
         self.respond_to_alexa( report='launch robot',
-                               name='EV3ResponseAfterLaunch')
+                               name='EV3ResponseAfterLaunch',
+                               data={'model' : self.mission_model()} )
 
-        end = time.time()
-
-        i = {
-            'type' : 'launch',
-            'start_time' : s,
-            'end_time' : end
-        }
-
-        self.data['instruction_data'][instruction_id] = i
+        self.telemetry.end(rec)
 
  
 ############################################################################## 
@@ -936,9 +1416,7 @@ class EV3SearchGadget(AlexaGadget):
     def move_robot(self, payload=None, slots=None): 
         print('[+] Executing move_robot function')
 
-        instruction_id = str(uuid.uuid4())
         s = time.time()
-        self.data['instruction_id_list'].append(instruction_id)
 
         bow_stearn_value = None
 
@@ -946,7 +1424,7 @@ class EV3SearchGadget(AlexaGadget):
         ## defaults
         ##
         speed = self.data['default_bowstearn_speed']
-        rotations = 10
+        rotations = self.data['default_bowstearn_rotations']
 
         try:
             if slots is not None:
@@ -970,14 +1448,7 @@ class EV3SearchGadget(AlexaGadget):
                             ##
                             speed = (0-self.data['default_bowstearn_speed'])
 
-            d = {
-                'type' : 'move',
-                'start_time' : s,
-                'speed' : speed,
-                'rotations' : rotations
-            }
-
-            self.data['instruction_data'][instruction_id] = d
+            rec = self.telemetry.begin(telemetry.MOVE, a=speed, b=rotations)
 
             ##
             ## when block = true, the kill switch
@@ -990,24 +1461,191 @@ class EV3SearchGadget(AlexaGadget):
                 'block':False
             }
 
-            mv = multiprocessing.Process(target=self.move_bow_stearn, kwargs=kwargs) 
-            mv.start() 
-            self.proc_manager['motor_processes'].append(mv)
+            token = self.move_bow_stearn(**kwargs)
+
+
+            ##
+            ## use artificail block so we can still use killswitch
+            ##
+            self.artificial_block(rotations, token=token, speed=speed)
+
+            self.telemetry.end(rec)
+            end = time.time()
+
+            print('[+] ({}) The bot traveled {} rotations in {} seconds'.format(datetime.datetime.now(),rotations, end-s))
+
+            stats = self.motor_worker.dispatch_stats()
+            if stats['count'] > 0:
+                print('[+] Motor dispatch latency over {} commands: last {:.1f} ms, mean {:.1f} ms, max {:.1f} ms'.format(
+                    stats['count'], stats['last']*1000, stats['mean']*1000, stats['max']*1000))
+
+        except Exception as e:
+            exc_type, exc_obj, exc_tb = sys.exc_info()
+            print('[-] move_robot Error: {} on line {}'.format(e, exc_tb.tb_lineno))
+
+
+############################################################################## 
+############################################################################## 
+## 
+## 
+## 
+############################################################################## 
+############################################################################## 
+ 
+ 
+    def turn_robot(self, payload=None, slots=None): 
+        print('[+] Executing turn_robot function')
+
+        direction = self.data['default_portstarboard_direction']
+        degrees = self.data['default_portstarboard_angle']
+
+        try:
+
+            if slots is not None:
+                if 'PortStarboardDirection' in slots:
+                    direction = slots['PortStarboardDirection']['value']
+
+                if 'PortStarboardDuration' in slots:
+                    degrees = int(slots['PortStarboardDuration']['value'])
+
+            if direction == self.data['default_portstarboard_direction']:
+                ##
+                ## turn right
+                ##
+                degrees=degrees
+
+            else:
+                ##
+                ## turn left
+                ##
+                degrees=(0-degrees)
+
+            ##
+            ## a = signed degrees (right is positive)
+            ##
+            rec = self.telemetry.begin(telemetry.TURN, a=degrees)
+
+            self.move_port_starboard( degrees=degrees, block=False)
+
+            self.telemetry.end(rec)
+
+            for request in range(self._requests(payload)):
+                self.respond_to_alexa( report='turn robot',
+                                       name='EV3ResponseAfterTurn')
+
+        except Exception as e:
+            exc_type, exc_obj, exc_tb = sys.exc_info()
+            print('[-] turn_robot Error: {} on line {}'.format(e, exc_tb.tb_lineno))
+
+
+############################################################################## 
+############################################################################## 
+## 
+## 
+## 
+############################################################################## 
+############################################################################## 
+ 
+ 
+    def go_to_position(self, payload=None, slots=None): 
+        print('[+] Executing go_to_position function')
+
+        rec = None
+        legs = 0
+
+        try:
+            g, node, heading = self.walk_start()
+
+            ##
+            ## one of the nine positions set_grid takes (0 north west
+            ## ... 8 south east), from the skill or a spoken number,
+            ## and its node on this grid
+            ##
+            if payload is not None and 'position' in payload:
+                position = int(payload['position'])
+            else:
+                position = int(slots['GridPosition']['value'])
+
+            if position < 0 or position > 8:
+                print('[-] Position {} is not one of the nine grid positions'.format(position))
+                return
+
+            target = g.cardinal_node(position)
+
+            t = self.paths()
+            route = t.route(node, heading, target)
+
+            print('[+] ({}) Going from {} to {}: {} legs, {:.0f} inches including turns'.format(
+                datetime.datetime.now(), g.describe(node), g.describe(target), len(route), t.cost(node, heading, target)))
+
+            rec = self.telemetry.begin(telemetry.GO_TO, a=node, b=target)
+
+            speed = self.data['default_bowstearn_speed']
+            spacing_ew, spacing_ns = g.spacing( self.data['coordinate_data']['grid_width'],
+                                                self.data['coordinate_data']['grid_height'] )
+            rot_inches = self.data['inches_per_rotation']
+
+            ##
+            ## driving time at the speeds measured so far
+            ##
+            drive_time = 0
+            for leg in route:
+                drive_time += self.motion_model.estimate((spacing_ew if leg%2 > 0 else spacing_ns)/rot_inches, speed)
+
+            print('[+] ({}) About {:.1f} seconds of driving'.format(datetime.datetime.now(), drive_time))
+
+            ##
+            ## the killswitch clears the search flag, which ends the trip
+            ##
+            self.control.search = True
+
+            for leg in route:
+
+                if self.control.search is not True:
+                    break
+
+                degrees, inches = self.leg_to(g, node, heading, leg)
+
+                if degrees != 0:
+                    self.move_port_starboard( degrees=degrees, block=False)
 
+                    if self.control.search is not True:
+                        break
+
+                rotations = inches/rot_inches
+
+                token = self.move_bow_stearn( rotations=rotations, 
+                                              speed=speed,
+                                              brake=False,
+                                              block=False )
+
+                self.artificial_block(rotations, token=token, speed=speed)
+
+                self.data['coordinate_data'].cover(g.edge(node, leg))
+
+                node = g.neighbour(node, leg)
+                heading = leg
+                legs += 1
+
+                self.data['coordinate_data'].update(current_grid_position=node, heading=heading)
+
+            self.control.search = False
+
+            print('[+] ({}) Arrived at {} heading {} after {} legs'.format(datetime.datetime.now(), g.describe(node), heading, legs))
 
             ##
-            ## use artificail block so we can still use killswitch
+            ## c = legs driven
             ##
-            self.artificial_block(rotations)
-
-            end = time.time()
-            self.data['instruction_data'][instruction_id]['end_time'] = end
+            self.telemetry.end(rec, c=legs)
 
-            print('[+] ({}) The bot traveled {} rotations in {} seconds'.format(datetime.datetime.now(),rotations, end-s))
+            self.respond_to_alexa( report='go to position',
+                                   name='EV3ResponseAfterGoToPosition',
+                                   data={'position' : node, 'arrived' : node == target, 'legs' : legs,
+                                         'model' : self.mission_model()} )
 
         except Exception as e:
             exc_type, exc_obj, exc_tb = sys.exc_info()
-            print('[-] move_robot Error: {} on line {}'.format(e, exc_tb.tb_lineno))
+            print('[-] go_to_position Error: {} on line {}'.format(e, exc_tb.tb_lineno))
 
 
 ############################################################################## 
@@ -1019,56 +1657,56 @@ class EV3SearchGadget(AlexaGadget):
 ############################################################################## 
  
  
-    def turn_robot(self, payload=None, slots=None): 
-        print('[+] Executing turn_robot function')
+    def calibrate_turns(self, payload=None): 
+        """
+        Turn back and forth through a sweep of angles at each turn
+        speed to learn how far the tank carries on past a turn, store
+        the table on the brick and use it for every turn from now on
+        """
+        print('[+] Executing calibrate_turns function')
 
-        instruction_id = str(uuid.uuid4())
-        s = time.time()
-        self.data['instruction_id_list'].append(instruction_id)
+        try:
+            table = TurnCalibration()
 
-        direction = self.data['default_portstarboard_direction']
-        degrees = self.data['default_portstarboard_angle']
+            rec = self.telemetry.begin(telemetry.CALIBRATE_TURNS)
 
-        try:
+            gyro = HubGyro(self.sensor_hub)
+            token = self.motion.begin()
 
-            if slots is not None:
-                if 'PortStarboardDirection' in slots:
-                    direction = slots['PortStarboardDirection']['value']
+            done = table.calibrate( self.turn_controller,
+                                    self.tank_pair,
+                                    gyro,
+                                    running=lambda: self.motion.running(token) )
 
-                if 'PortStarboardDuration' in slots:
-                    degrees = int(slots['PortStarboardDuration']['value'])
+            self.motion.complete(token)
 
-            d = {
-                'type' : 'turn',
-                'start_time' : s,
-                'direction' : direction,
-                'degrees' : degrees
-            }
-            self.data['instruction_data'][instruction_id] = d
+            leads = [lead for row in table.leads for lead in row]
+            mean_lead = sum(leads)/len(leads)
 
-            if direction == self.data['default_portstarboard_direction']:
-                ##
-                ## turn right
-                ##
-                degrees=degrees
+            ##
+            ## a = 1 if the sweep finished, b = mean lead (degrees)
+            ##
+            self.telemetry.end(rec, a=1 if done else 0, b=mean_lead)
 
-            else:
-                ##
-                ## turn left
-                ##
-                degrees=(0-degrees)
+            if done:
+                table.save(self.data['turn_calibration_file'])
+                self.turn_controller.calibration = table
 
-            self.move_port_starboard( degrees=degrees, block=False)
+                print('[+] ({}) Turns calibrated, mean lead {:.2f} degrees, saved to {}'.format(
+                    datetime.datetime.now(), mean_lead, self.data['turn_calibration_file']))
 
-            end = time.time()
-            self.data['instruction_data'][instruction_id]['end_time'] = end
+            else:
+                print('[+] ({}) Turn calibration interrupted, keeping the old table'.format(datetime.datetime.now()))
 
-            self.respond_to_alexa( report='turn robot',
-                                   name='EV3ResponseAfterTurn')
+            if payload is None or not payload.get('startup'):
+                self.respond_to_alexa( report='calibrate turns',
+                                       name='EV3ResponseAfterCalibrateTurns',
+                                       data={'calibrated' : done, 'mean_lead' : round(mean_lead, 2),
+                                             'model' : self.mission_model()} )
 
         except Exception as e:
             exc_type, exc_obj, exc_tb = sys.exc_info()
-            print('[-] turn_robot Error: {} on line {}'.format(e, exc_tb.tb_lineno))
+            print('[-] calibrate_turns Error: {} on line {}'.format(e, exc_tb.tb_lineno))
 
 
 ############################################################################## 
@@ -1083,35 +1721,36 @@ class EV3SearchGadget(AlexaGadget):
     def set_grid(self, payload=None, slots=None): 
         print('[+] Executing set_grid function')
 
-        instruction_id = str(uuid.uuid4())
-        s = time.time()
-        self.data['instruction_id_list'].append(instruction_id)
-
-        d = {}
+        ##
+        ## a = field (1 width, 2 height, 3 position), b = value
+        ##
+        rec = self.telemetry.begin(telemetry.SET_GRID)
 
         try:
             if slots is not None:
                 if 'GridWidth' in slots:
                     width = int(slots['GridWidth']['value'])
                     self.data['coordinate_data']['grid_width'] = width
+                    self.data['coordinate_data'].clear_coverage(self.search_grid().edges)
+                    self.coverage = self.new_coverage_map()
                     print('[+] Setting grid width to {}'.format(width))
 
-                    d = {
-                        'type' : 'set_grid',
-                        'start_time' : s,
-                        'width' : width
-                    }
+                    rec.a = 1
+                    rec.b = width
+
+                    self.paths()
 
                 elif 'GridHeight' in slots:
                     height = int(slots['GridHeight']['value'])
                     self.data['coordinate_data']['grid_height'] = height
+                    self.data['coordinate_data'].clear_coverage(self.search_grid().edges)
+                    self.coverage = self.new_coverage_map()
                     print('[+] Setting grid height to {}'.format(height))
 
-                    d = {
-                        'type' : 'set_grid',
-                        'start_time' : s,
-                        'height' : height
-                    }
+                    rec.a = 2
+                    rec.b = height
+
+                    self.paths()
 
                 elif 'GridPositionCardinal' in slots or 'GridPosition' in slots:
 
@@ -1132,16 +1771,11 @@ class EV3SearchGadget(AlexaGadget):
                             ##
                             position = self.data['coordinate_data']['starting_grid_position']
 
-                    if position <= 9 and position >= 0:
-                        self.data['coordinate_data']['starting_grid_position'] = position
-                        self.data['coordinate_data']['current_grid_position'] = position
+                    if position <= 8 and position >= 0:
                         print('[+] Setting grid position to {}'.format(position))
 
-                        d = {
-                            'type' : 'set_grid',
-                            'start_time' : s,
-                            'position' : position
-                        }
+                        rec.a = 3
+                        rec.b = position
 
                         if position == 4:
                             ##
@@ -1170,20 +1804,32 @@ class EV3SearchGadget(AlexaGadget):
                             ##
                             heading = 1
 
-                        self.data['coordinate_data']['heading'] = heading
+                        ##
+                        ## start, current node and heading change together
+                        ##
+                        self.data['coordinate_data'].update( starting_grid_position=position,
+                                                             current_grid_position=self.search_grid().cardinal_node(position),
+                                                             heading=heading )
 
                         print('[+] Setting grid position to {} and heading to {}'.format(position, heading))
 
                     else:
                         print('[-] Position out of range ... using default position and heading')
 
-            self.data['instruction_data'][instruction_id] = d
+                ##
+                ## the grid, or the tank's place on it, has changed
+                ##
+                self.place_pose()
+                self.prepare_patterns()
 
-            end = time.time()
-            self.data['instruction_data'][instruction_id]['end_time'] = end
+            self.telemetry.end(rec)
+
+            model = self.mission_model()
 
-            self.respond_to_alexa( report='set grid',
-                                   name='EV3ResponseAfterSetGrid')
+            for request in range(self._requests(payload)):
+                self.respond_to_alexa( report='set grid',
+                                       name='EV3ResponseAfterSetGrid',
+                                       data={'model' : model} )
 
         except Exception as e:
             exc_type, exc_obj, exc_tb = sys.exc_info()
@@ -1199,6 +1845,22 @@ class EV3SearchGadget(AlexaGadget):
 ############################################################################## 
  
  
+    def _read_colors(self, target):
+        """
+        The colors the sensor hub has read since the last call, as
+        (timestamp, color) ... every reading that is not the target
+        also goes on the coverage map
+        """
+        self._color_count, samples = self.sensor_hub.since('color', self._color_count)
+
+        if self.coverage is not None and any(color != target for t, color in samples):
+            position = self.sensor_position()
+            if position is not None:
+                self.coverage.sample(position[0], position[1])
+
+        return [(t, int(color)) for t, color in samples]
+
+
     def color_search_function(self): 
         print('[+] Executing color_search_function')
 
@@ -1219,31 +1881,80 @@ class EV3SearchGadget(AlexaGadget):
         ##
         default_color = self.data['default_color']
 
-        instruction_id = str(uuid.uuid4())
-        s = time.time()
-        self.data['instruction_id_list'].append(instruction_id)
+        rec = self.telemetry.begin(telemetry.COLOR_SEARCH, a=default_color)
+        self.control.subject_found = False
 
-        d = {
-            'type' : 'color_search',
-            'start_time' : s,
-        }
-        self.data['instruction_data'][instruction_id] = d
-        self.proc_manager['subject_found'] = False
+        sampler = self.color_sampler
+        sampler.target = default_color
 
-        cl = ColorSensor()
+        ##
+        ## only colors read from here on count
+        ##
+        self._color_count = self.sensor_hub.count('color')
+
+        found = sampler.run( lambda: self._read_colors(default_color),
+                             lambda: self.control.subject_found is not True )
+
+        stats = sampler.stats()
+        self.control.increment('color_samples', stats['samples'])
+
+        ##
+        ## b = samples taken, c = 1 if the subject was found
+        ##
+        self.telemetry.end(rec, b=stats['samples'], c=1 if found else 0)
+
+        print('[+] Color search sampled {} times at {:.1f} samples/s (target {}/s, {} overruns)'.format(
+            stats['samples'], stats['samples_per_second'], stats['target_rate'], stats['overruns']))
+
+        if self.coverage is not None:
+            self.coverage.flush()
+
+            stats = self.coverage.stats()
+            print('[+] Color sensor has seen {:.1f}% of the field, most likely cell {:.2f}% (map updates {:.2f} ms mean, {:.2f} ms max)'.format(
+                stats['coverage']*100, stats['max_probability']*100,
+                (stats['mean_flush_time'] or 0)*1000, stats['max_flush_time']*1000))
+
+        if found is True:
+            ##
+            ## where the sensor was when the find was confirmed, before
+            ## the tank has had a chance to coast on
+            ##
+            position = self.sensor_position()
+
+            print('[+] Found subject')
+
+            self.control.subject_found = True
+            self.control.search = False
+
+            ##
+            ## the skill hears about the stop from the subject found
+            ## answer below, not from the killswitch
+            ##
+            self.killswitch(announce=False)
+
+            found_at = {}
+
+            if position is not None:
+                x, y = position
+
+                ##
+                ## a = x, b = y (inches from the north west corner)
+                ##
+                self.telemetry.record(telemetry.SUBJECT_FOUND, a=x, b=y)
+
+                print('[+] ({}) Subject is {:.1f} inches east and {:.1f} inches south of the north west corner'.format(
+                    datetime.datetime.now(), x, y))
 
-        while self.proc_manager['subject_found'] is not True:
-            if cl.color == default_color:
-                print('[+] Found subject')
+                found_at = {'east_feet' : round(x/12.0, 1), 'south_feet' : round(y/12.0, 1)}
 
-                self.proc_manager['subject_found'] = True
-                self.proc_manager['search'] = False
-                self.killswitch()
+            self.respond_to_alexa( report='subject found',
+                                   name='EV3ResponseAfterSubjectFound',
+                                   data=found_at )
 
-                opts = '-a 200 -s 130 -v'
-                msg = 'Sir, I have found the subject'
-                sound = Sound()
-                sound.speak(msg, espeak_opts=opts+'en-rp')
+            opts = '-a 200 -s 130 -v'
+            msg = 'Sir, I have found the subject'
+            sound = Sound()
+            sound.speak(msg, espeak_opts=opts+'en-rp')
 
 
 ############################################################################## 
@@ -1255,107 +1966,100 @@ class EV3SearchGadget(AlexaGadget):
 ############################################################################## 
 
 
-    def intellisearch_function(self): 
+    def intellisearch_function(self, pattern=None): 
         print('[+] Executing intellisearch_function')
 
+        turn_speed = self.data['default_portstarboard_speed']
 
-        instruction_id = str(uuid.uuid4())
-        s = time.time()
-        self.data['instruction_id_list'].append(instruction_id)
-
-        bow_stearn_value = None
+        if pattern is None:
+            pattern = self.data['search_pattern']
 
-        speed = self.data['default_bowstearn_speed']
+        try:
+            ##
+            ## the legs come from patterns.py, which the simulator and
+            ## benchmarks drive too, or off the coverage map
+            ##
+            legs = self.search_legs(pattern)
+            self.speed_controller.reset()
 
-        bow_stearn_rotations = 1
-        port_starboard_rotations = 1.39
+            print('[+] ({}) Searching with the {} pattern'.format(datetime.datetime.now(), pattern))
 
-        try:
             ##
-            ## only extend the rotations every other iteration
+            ## the whole search is one motion: the killswitch interrupts
+            ## it, which ends the leg on the motors, and cancels the
+            ## legs still queued behind it
             ##
+            token = self.motion.begin()
+
+            pipeline = MotionPipeline( self.motor_worker,
+                                       depth=self.data['pipeline_depth'],
+                                       keep_going=lambda: self.control.search is True and self.motion.running(token),
+                                       telemetry=self.telemetry )
+
             iteration = 0
 
-            while self.proc_manager['search'] is True:
-                ##
-                ## move forward
-                ##
-                instruction_id = str(uuid.uuid4())
-                s = time.time()
-                self.data['instruction_id_list'].append(instruction_id)
-
-                d = {
-                    'type' : 'move',
-                    'start_time' : s,
-                    'speed' : speed,
-                    'rotations' : bow_stearn_rotations
-                }
-
-                self.data['instruction_data'][instruction_id] = d
-
-                kwargs = {
-                    'rotations':bow_stearn_rotations, 
-                    'speed':speed,
-                    'brake':False,
-                    'block':False
-                }
-
-                mv = multiprocessing.Process(target=self.move_bow_stearn, kwargs=kwargs) 
-                mv.start() 
-                self.proc_manager['motor_processes'].append(mv)
-
-                if bow_stearn_rotations == 1:
-                    blocking_time = 2
+            for leg in legs:
+
+                if leg[0] == patterns.DRIVE:
+                    ##
+                    ## move forward
+                    ##
+                    bow_stearn_rotations = leg[1]
+                    speed = self.search_speed()
+
+                    job = pipeline.submit( 'drive', telemetry.MOVE, a=speed, b=bow_stearn_rotations, c=iteration,
+                                           rotations=bow_stearn_rotations,
+                                           left_speed=speed,
+                                           right_speed=speed,
+                                           brake=False,
+                                           motion_token=token )
+
+                    self.control.increment('motions')
+
                 else:
-                    blocking_time = bow_stearn_rotations
+                    ##
+                    ## turn default direction
+                    ##
+                    degrees = leg[1]
 
-                print('[+] ({}) Intellisearch blocking for {} rotations'.format(datetime.datetime.now(), blocking_time))
-                self.artificial_block(blocking_time)
-                print('[+] ({}) Intellisearch finished blocking for {} rotations'.format(datetime.datetime.now(), blocking_time))
+                    job = pipeline.submit( 'turn', telemetry.TURN, a=degrees, c=iteration,
+                                           degrees=degrees,
+                                           speed=turn_speed,
+                                           motion_token=token )
 
-                end = time.time()
-                self.data['instruction_data'][instruction_id]['end_time'] = end
+                    iteration += 1
 
-                ##
-                ## turn default direction
-                ##
-                instruction_id = str(uuid.uuid4())
-                s = time.time()
-                self.data['instruction_id_list'].append(instruction_id)
+                if job is None:
+                    break
 
+            else:
                 ##
-                ## have to test again here in case we've been stopped mid-move
+                ## a standard pattern has an end ... once its last leg
+                ## is done without a find, the search is over
                 ##
-                if self.proc_manager['search']:
-                    direction = self.data['default_portstarboard_direction']
-                    degrees = self.data['default_portstarboard_angle']
-
-                    d = {
-                        'type' : 'turn',
-                        'start_time' : s,
-                        'direction' : self.data['default_portstarboard_direction'],
-                        'degrees' : self.data['default_portstarboard_angle']
-                    }
+                if pipeline.drain() and self.control.subject_found is not True:
+                    print('[+] ({}) The {} pattern is complete, subject not found'.format(datetime.datetime.now(), pattern))
+                    self.control.search = False
+                    self.control.subject_found = True # stops the color search function
 
-                    self.data['instruction_data'][instruction_id] = d
+            pipeline.drain()
+            self.motion.complete(token)
 
+            ##
+            ## a = motor duty cycle (%), b = legs run, c = mean gap
+            ## between legs (ms)
+            ##
+            stats = pipeline.stats()
 
-                    self.move_port_starboard( degrees=degrees, 
-                                              direction=direction, 
-                                              block=False)
-
-                    ##
-                    ## non-blocking call doesn't have enough time to complete
-                    ##
-                    time.sleep(1)
+            duty_cycle = (stats['duty_cycle'] or 0)*100
+            mean_gap = (stats['mean_gap'] or 0)*1000
 
-                    end = time.time()
-                    self.data['instruction_data'][instruction_id]['end_time'] = end
+            self.telemetry.record(telemetry.PIPELINE, a=duty_cycle, b=stats['legs'], c=mean_gap)
 
-                if iteration > 0 and iteration%2 < 1:
-                    bow_stearn_rotations += 2
+            print('[+] ({}) Intellisearch ran {} legs in {:.1f} seconds, motor duty cycle {:.1f}%, gap between legs mean {:.1f} ms max {:.1f} ms'.format(
+                datetime.datetime.now(), stats['legs'], stats['span'], duty_cycle, mean_gap, (stats['max_gap'] or 0)*1000))
 
-                iteration += 1
+            self.report_search_speed()
 
             return
 
@@ -1376,16 +2080,7 @@ class EV3SearchGadget(AlexaGadget):
     def pause_robot(self): 
         print('[+] Executing pause_robot function')
 
-        instruction_id = str(uuid.uuid4())
-        s = time.time()
-        self.data['instruction_id_list'].append(instruction_id)
-
-        d = {
-            'type' : 'pause',
-            'start_time' : s,
-        }
-
-        self.data['instruction_data'][instruction_id] = d
+        self.telemetry.record(telemetry.PAUSE)
 
         self.respond_to_alexa( report='pause robot',
                                name='EV3ResponseAfterPause')
@@ -1400,49 +2095,117 @@ class EV3SearchGadget(AlexaGadget):
 ############################################################################## 
 
 
-    def killswitch(self): 
+    def killswitch(self, received=None, announce=True): 
         print('[+] Executing killswitch function')
 
+        ##
+        ## everything is timed from directive receipt, or from now when
+        ## the gadget stops itself (e.g. subject found)
+        ##
+        if received is None:
+            received = time.monotonic()
+
+        deadline = received+self.data['killswitch_deadline']
+
         try:
 
+            ##
+            ## motors off first ... one write per motor, and everything
+            ## below can then happen with the robot already stopped
+            ##
+            self.tank_pair.off()
+            motors_off = time.monotonic()
+
             ##
             ## turn off any true/false flags that are controlling any
             ## movement loops throughout
             ##
-            self.proc_manager['search'] = False
-            self.proc_manager['blocking'] = False
-
+            self.control.search = False
+            self.control.blocking = False
+            self.control.increment('killswitches')
 
-            instruction_id = str(uuid.uuid4())
-            s = time.time()
-            self.data['instruction_id_list'].append(instruction_id)
+            ##
+            ## wake anything waiting on a motion right away
+            ##
+            self.motion.interrupt()
 
-            d = {
-                'type' : 'killswitch',
-                'start_time' : s,
-            }
 
-            self.data['instruction_data'][instruction_id] = d
+            rec = self.telemetry.begin(telemetry.KILLSWITCH)
 
             ##
-            ## next, kill the motors
+            ## drop every queued motion in one step
             ##
+            cancelled = self.motor_worker.cancel_all()
 
+            ##
+            ## next, wait for the motor processes ... the flags and the
+            ## interrupt above already stop their loops, so they are
+            ## joined first, sharing what is left of the deadline, and
+            ## only those still running after it are terminated (a
+            ## process killed while holding a shared lock, e.g. the
+            ## mission state or the telemetry ring, would leave it held
+            ## and the next mission would hang on it).  Only the gadget
+            ## process has them to join, not a worker calling this
+            ##
             print('[+] Stopping running motor processes now')
-            for t in self.proc_manager['motor_processes']:
-                t.join()
+
+            processes = []
+            if os.getpid() == self.gadget_pid:
+                with self.motor_processes_lock:
+                    processes = self.motor_processes
+                    self.motor_processes = []
+
+            stragglers = []
+            for t in processes:
+                t.join(max(0, deadline-time.monotonic()))
+                if t.is_alive():
+                    stragglers.append(t)
+
+            for t in stragglers:
                 t.terminate()
-                self.proc_manager['motor_processes'].remove(t)
 
+            ##
+            ## reaped by the idle loop
+            ##
+            if stragglers:
+                with self.motor_processes_lock:
+                    self.motor_processes.extend(stragglers)
 
+            ##
+            ## and once more, in case a dying process restarted the tank
+            ##
             print('[+] Stopping tank now')
             self.tank_pair.off()
 
-            end = time.time()
-            self.data['instruction_data'][instruction_id]['end_time'] = end
+            done = time.monotonic()
+
+            ##
+            ## a = ms from receipt to motors off, b = jobs cancelled
+            ##
+            self.telemetry.end(rec, a=(motors_off-received)*1000, b=cancelled)
+
+            report = {
+                'stop_time_ms' : round((motors_off-received)*1000, 1),
+                'teardown_time_ms' : round((done-received)*1000, 1),
+                'deadline_ms' : round(self.data['killswitch_deadline']*1000, 1),
+                'deadline_met' : done <= deadline,
+                'jobs_cancelled' : cancelled,
+                'processes_stopped' : len(processes)-len(stragglers),
+                'processes_terminated' : len(stragglers)
+            }
+
+            print('[+] Motors off {} ms after receipt, {} jobs cancelled, teardown done in {} ms (deadline {} ms)'.format(
+                report['stop_time_ms'], cancelled, report['teardown_time_ms'], report['deadline_ms']))
 
-            self.respond_to_alexa( report='killswitch',
-                                   name='EV3ResponseAfterKillSwitch')
+            stats = self.motion.latency_stats()
+            if stats['count'] > 0:
+                print('[+] Interrupt latency over {} stops: last {:.1f} ms, mean {:.1f} ms, max {:.1f} ms'.format(
+                    stats['count'], stats['last']*1000, stats['mean']*1000, stats['max']*1000))
+
+            if announce:
+                self.respond_to_alexa( report='killswitch',
+                                       name='EV3ResponseAfterKillSwitch',
+                                       data=report )
 
         except Exception as e:
             exc_type, exc_obj, exc_tb = sys.exc_info()
@@ -1461,14 +2224,8 @@ class EV3SearchGadget(AlexaGadget):
     def stop_cancel_robot(self): 
         print('[+] Executing stop_cancel_robot function')
 
-        instruction_id = str(uuid.uuid4())
-        s = time.time()
-        self.data['instruction_id_list'].append(instruction_id)
-
-        d = {
-            'type' : 'close_skill',
-            'start_time' : s,
-        }
+        self.telemetry.record(telemetry.CLOSE_SKILL)
+        self.telemetry.flush()
 
 
 ############################################################################## 
@@ -1483,14 +2240,7 @@ class EV3SearchGadget(AlexaGadget):
     def expire_robot(self): 
         print('[+] Executing expire_robot function')
 
-        instruction_id = str(uuid.uuid4())
-        s = time.time()
-        self.data['instruction_id_list'].append(instruction_id)
-
-        d = {
-            'type' : 'expire',
-            'start_time' : s,
-        }
+        self.telemetry.record(telemetry.EXPIRE)
 
         return
 
@@ -1508,18 +2258,25 @@ class EV3SearchGadget(AlexaGadget):
                          speed=None, 
                          rotations=10, 
                          brake=True, 
-                         block=False ):
+                         block=False,
+                         token=None ):
 
         '''
-        NOTE: if block is set to True, then the killswitch won't work
-              which means that long distance forward movements can't
-              be interrupted, and long distance search legs will
-              overshoot the search subject
+        NOTE: the motion runs on the motor worker, which blocks on the
+              tank and reports completion on self.motion; set block to
+              True to also wait here (the killswitch still interrupts
+              the wait).  Returns the motion token to pass to
+              artificial_block
         '''
 
         if speed is None:
             speed=self.data['default_bowstearn_speed']
 
+        if token is None:
+            token = self.motion.begin()
+
+        self.control.increment('motions')
+
 
         ##
         ## 1 rotation == 3.75 inches
@@ -1533,21 +2290,68 @@ class EV3SearchGadget(AlexaGadget):
                 'left_speed':speed,
                 'right_speed':speed,
                 'brake':brake,
-                'block':block
+                'motion_token':token
             }
 
+            self.motor_worker.submit('drive', token=token, **kwargs)
 
-            mv = multiprocessing.Process(target=self.tank_pair.on_for_rotations, kwargs=kwargs) 
-            mv.start() 
-            self.proc_manager['motor_processes'].append(mv)
+            if block is True:
+                self.artificial_block(rotations, token=token, speed=speed)
 
-            print('[+] ({}) Finished moving robot bow/stearn {} rotations'.format(datetime.datetime.now(),rotations))
+            print('[+] ({}) Queued robot bow/stearn {} rotations'.format(datetime.datetime.now(),rotations))
 
         except Exception as e:
             exc_type, exc_obj, exc_tb = sys.exc_info()
             print('[-] move_bow_stearn Error: {} on line {}'.format(e, exc_tb.tb_lineno))
 
-        return
+        return token
+
+
+############################################################################## 
+############################################################################## 
+## 
+## 
+## 
+############################################################################## 
+############################################################################## 
+
+
+    def _tank_rotations( self, 
+                         tank, 
+                         rotations=10, 
+                         left_speed=None, 
+                         right_speed=None, 
+                         brake=True,
+                         motion_token=None ):
+
+        ##
+        ## runs on the motor worker, so blocking here is fine ... done
+        ## as soon as the tacho counts say so, and the killswitch (which
+        ## interrupts the motion) ends the wait as well
+        ##
+        running = None
+        if motion_token is not None:
+            running = lambda: self.motion.running(motion_token)
+
+        reached, seconds, turned = run_for_rotations( tank,
+                                                      rotations,
+                                                      left_speed,
+                                                      right_speed,
+                                                      brake=brake,
+                                                      running=running,
+                                                      rate=self.data['encoder_poll_rate'] )
+
+        speed = max(abs(left_speed or 0), abs(right_speed or 0))
+
+        if reached:
+            self.motion_model.observe(rotations, speed, seconds)
+
+            print('[+] ({}) Drove {} rotations in {:.3f} seconds ({:.3f} s/rotation at {}%)'.format(
+                datetime.datetime.now(), rotations, seconds, self.motion_model.seconds_per_rotation(speed), speed))
+
+        elif running is None or running():
+            print('[-] ({}) Drive stalled after {:.3f} seconds, {:.0f} of {:.0f} degrees'.format(
+                datetime.datetime.now(), seconds, turned, abs(rotations)*360))
 
  
 ############################################################################## 
@@ -1573,76 +2377,81 @@ class EV3SearchGadget(AlexaGadget):
 
         speed = self.data['default_portstarboard_speed']
 
-        wiggle_room = 4
-
-        ##
-        ## as angles become larger, the gyro seems to fall off by about 5 degrees
-        ##
-        correction_factor = 5
-
         print('[+] ({}) Moving robot port/starboard {} degrees'.format(datetime.datetime.now(), degrees))
 
         try:
+            ##
+            ## the turn is a motion like any other, so the
+            ## killswitch can interrupt the gyro loop
+            ##
+            token = self.motion.begin()
 
-            gyro = GyroSensor()
-            gyro.reset()
-
-            start_angle = gyro.angle
-
-            if degrees > 0:
-                ##
-                ## turn right
-                ##
-                left_speed=speed 
-                right_speed=(0-speed)
+            self._tank_turn(self.tank_pair, degrees=degrees, speed=speed, motion_token=token)
 
-            else:
-                ##
-                ## turn left
-                ##
-                left_speed=(0-speed)
-                right_speed=speed
+            self.motion.complete(token)
 
-            self.tank_pair.on( left_speed=left_speed, 
-                               right_speed=right_speed )
+        except Exception as e:
+            exc_type, exc_obj, exc_tb = sys.exc_info()
+            print('[-] move_port_starboard Error: {} on line {}'.format(e, exc_tb.tb_lineno))
 
-            if abs(degrees) > correction_factor*2:
-                gyro.wait_until_angle_changed_by((abs(degrees)-correction_factor), direction_sensitive=False)
+        return
 
-            else:
-                gyro.wait_until_angle_changed_by((abs(degrees)), direction_sensitive=False)
 
-            self.tank_pair.off()
+############################################################################## 
+############################################################################## 
+## 
+## 
+## 
+############################################################################## 
+############################################################################## 
+ 
+ 
+    def _tank_turn( self, 
+                    tank, 
+                    degrees=90, 
+                    speed=None,
+                    motion_token=None ):
 
-            end_angle = gyro.angle
-            delta_angle = abs((end_angle-start_angle))
+        ##
+        ## closed loop gyro turn ... called directly by
+        ## move_port_starboard, and as the motor worker's 'turn' job for
+        ## pipelined search legs
+        ##
+        if speed is None:
+            speed = self.data['default_portstarboard_speed']
 
-            if (delta_angle-abs(degrees)) >= wiggle_room:
-                ##
-                ## correct turn in opposite direction
-                ##
-                c_left_speed = (0-left_speed)
-                c_right_speed = (0-right_speed)
+        running = None
+        if motion_token is not None:
+            running = lambda: self.motion.running(motion_token)
 
-                print('[+] ({}) Correcting turn by {} degrees'.format(datetime.datetime.now(), abs(delta_angle-degrees)))
+        gyro = HubGyro(self.sensor_hub)
 
-                self.tank_pair.on( left_speed=c_left_speed, 
-                                   right_speed=c_right_speed )
+        ##
+        ## a = signed degrees, b = overshoot, c = error left at the
+        ## end (degrees) ... the span is the settle time
+        ##
+        rec = self.telemetry.begin(telemetry.TURN_CONTROL, a=degrees)
 
-                if abs(delta_angle-degrees) > correction_factor*2:
-                    gyro.wait_until_angle_changed_by((abs(delta_angle-degrees)-correction_factor), direction_sensitive=False)
+        reached, settle_time, overshoot, error, motions = self.turn_controller.turn( tank,
+                                                                                     gyro,
+                                                                                     degrees,
+                                                                                     running=running,
+                                                                                     max_speed=speed )
 
-                else:
-                    gyro.wait_until_angle_changed_by((abs(delta_angle-degrees)), direction_sensitive=False)
+        self.telemetry.end(rec, b=overshoot, c=error)
 
+        if running is not None and not running():
+            print('[+] ({}) Turn interrupted'.format(datetime.datetime.now()))
 
-                self.tank_pair.off()
+        elif reached:
+            stats = self.turn_controller.stats()
+            print('[+] ({}) Turn settled in {:.3f} seconds and {} motions, overshoot {} degrees (mean {:.3f} seconds over {} turns)'.format(
+                datetime.datetime.now(), settle_time, motions, overshoot, stats['mean_settle'], stats['count']))
 
-        except Exception as e:
-            exc_type, exc_obj, exc_tb = sys.exc_info()
-            print('[-] move_port_starboard Error: {} on line {}'.format(e, exc_tb.tb_lineno))
+        else:
+            print('[-] ({}) Turn gave up after {:.3f} seconds, {} degrees off'.format(datetime.datetime.now(), settle_time, error))
 
-        return
+        return reached
 
 
 ############################################################################## 
@@ -1656,12 +2465,69 @@ class EV3SearchGadget(AlexaGadget):
  
     def _ev3_waiter(self):
         """ 
-        continious cycle function 
+        idle loop ... blocks (zero CPU) until a directive arrives, a job
+        finishes or the gadget shuts down
         """ 
         while True:
 
-            time.sleep(0) 
- 
+            events = self.events.wait() 
+
+            if events & GadgetEvents.SHUTDOWN:
+                print('[+] ({}) Idle loop shutting down'.format(datetime.datetime.now()))
+                break
+
+            if events & GadgetEvents.JOB_DONE:
+                ##
+                ## reap finished search/motor processes so they don't
+                ## linger as zombies
+                ##
+                multiprocessing.active_children()
+
+                with self.motor_processes_lock:
+                    self.motor_processes = [t for t in self.motor_processes if t.is_alive()]
+
+                self.telemetry.flush()
+
+            if events & GadgetEvents.DIRECTIVE:
+                logger.debug('Scheduler queue depth %s', self.scheduler.queue_depth())
+
+
+############################################################################## 
+############################################################################## 
+## 
+## 
+## 
+############################################################################## 
+############################################################################## 
+
+
+    def _run_job(self, target):
+        ##
+        ## process entry point ... tells the idle loop when the job ends
+        ##
+        try:
+            target()
+
+        finally:
+            self.events.signal(GadgetEvents.JOB_DONE)
+
+
+############################################################################## 
+############################################################################## 
+## 
+## 
+## 
+############################################################################## 
+############################################################################## 
+
+
+    def shutdown(self):
+        self.events.signal(GadgetEvents.SHUTDOWN)
+        self.scheduler.shutdown()
+        self.motor_worker.shutdown()
+        self.sensor_hub.shutdown()
+        self.telemetry.flush()
+
 
 ############################################################################## 
 ############################################################################## 
@@ -1673,8 +2539,13 @@ class EV3SearchGadget(AlexaGadget):
  
  
 if __name__ == '__main__': 
+    gadget = None
     try: 
-        EV3SearchGadget().main() 
+        gadget = EV3SearchGadget()
+        gadget.main() 
     except Exception as e: 
         exc_type, exc_obj, exc_tb = sys.exc_info()
         print('[-] Error: {} on line {}'.format(e, exc_tb.tb_lineno))
+    finally:
+        if gadget is not None:
+            gadget.shutdown()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+import math
+import ctypes
+import multiprocessing
+
+
+##############################################################################
+##############################################################################
+##
+## MISSION STATE
+##
+##      one authoritative copy of the grid and the tank's place on it
+##
+##############################################################################
+##############################################################################
+
+
+class MissionState(object):
+    """
+    Grid configuration, current node and heading, and the grid edges
+    driven so far, in shared memory so that every gadget process sees
+    (and keeps) the same values
+
+    A walk runs in a forked process; with a plain dict its position and
+    heading died with the process and the next mission started over
+    from starting_grid_position.  Here the fields are a fixed set of
+    numeric slots taken from the initial dict (None is allowed and kept
+    as NaN), read and written like a dict:
+
+        state['heading']            one slot, no lock, no IPC
+        state['heading'] = 1        one field, atomically
+        state.update(a=1, b=2)      several fields, atomically
+        state.snapshot()            every field at one version
+
+    Writers take a lock and bump a sequence number before and after
+    writing (odd while a write is in progress), then the version.
+    snapshot() reads without the lock and retries until it sees the
+    same even sequence number on both sides, so it never mixes two
+    updates.  update(expected=version) only applies if nothing has
+    been written since that snapshot.
+
+    Driven edges are one byte per grid edge id (grid.py).  The map is
+    allocated once, for capacity edges (the largest grid the gadget
+    builds), so a process forked before the grid changes still shares
+    it; edges (GridGraph.edges) is how much of it the current grid
+    uses, set again by clear_coverage() when the grid changes.  An edge
+    id outside the grid is an error, not something to drop.  With a
+    PoseEstimator attached as pose, snapshots carry the dead reckoned
+    pose as well.
+    """
+
+    def __init__(self, initial, capacity=65536, edges=None):
+        self._names = sorted(initial)
+        self._index = dict((name, i) for i, name in enumerate(self._names))
+
+        ##
+        ## fields given as ints (or None) read back as ints
+        ##
+        self._ints = set( name for name in self._names
+                          if initial[name] is None or isinstance(initial[name], int) )
+
+        self._values = multiprocessing.RawArray('d', len(self._names))
+        self._seq = multiprocessing.RawValue('L', 0)
+        self._version = multiprocessing.RawValue('L', 0)
+        self._lock = multiprocessing.Lock()
+
+        if edges is None:
+            edges = capacity
+
+        if edges > capacity:
+            raise ValueError('grid of {} edges is larger than the {} tracked'.format(edges, capacity))
+
+        self.capacity = capacity
+        self._covered = multiprocessing.RawArray('B', capacity)
+        self._covered_count = multiprocessing.RawValue('L', 0)
+        self._edges = multiprocessing.RawValue('L', edges)
+
+        self.pose = None
+
+        for name in self._names:
+            self._values[self._index[name]] = self._encode(initial[name])
+
+
+    @staticmethod
+    def _encode(value):
+        return float('nan') if value is None else float(value)
+
+
+    def _decode(self, name, value):
+        if math.isnan(value):
+            return None
+
+        if name in self._ints:
+            return int(value)
+
+        return value
+
+
+    def __contains__(self, name):
+        return name in self._index
+
+
+    def __getitem__(self, name):
+        return self._decode(name, self._values[self._index[name]])
+
+
+    def __setitem__(self, name, value):
+        self.update(**{name : value})
+
+
+    def keys(self):
+        return list(self._names)
+
+
+    def get(self, name, default=None):
+        if name not in self._index:
+            return default
+
+        return self[name]
+
+
+    @property
+    def version(self):
+        return self._version.value
+
+
+    @property
+    def edges(self):
+        """
+        Edges of the current grid
+        """
+        return self._edges.value
+
+
+    def update(self, expected=None, **fields):
+        """
+        Write fields as one change.  Returns the new version, or None if
+        expected is given and the state has moved on since
+        """
+        for name in fields:
+            if name not in self._index:
+                raise KeyError(name)
+
+        with self._lock:
+            if expected is not None and expected != self._version.value:
+                return None
+
+            self._seq.value += 1
+
+            for name, value in fields.items():
+                self._values[self._index[name]] = self._encode(value)
+
+            self._version.value += 1
+            self._seq.value += 1
+
+            return self._version.value
+
+
+    def snapshot(self):
+        """
+        dict of every field as of one version, plus 'version', and
+        'covered' (edges driven) and 'pose' ((x, y, heading) or None)
+        as they are now
+        """
+        while True:
+            seq = self._seq.value
+
+            if seq%2:
+                continue
+
+            values = self._values[:]
+            version = self._version.value
+
+            if self._seq.value == seq:
+                break
+
+        snapshot = dict( (name, self._decode(name, values[i])) for i, name in enumerate(self._names) )
+        snapshot['version'] = version
+        snapshot['covered'] = self._covered_count.value
+        snapshot['pose'] = self.pose.pose() if self.pose is not None else None
+
+        return snapshot
+
+
+    def _check(self, edge):
+        if not 0 <= edge < self._edges.value:
+            raise IndexError('edge {} is outside the {} edges of the grid'.format(edge, self._edges.value))
+
+
+    def cover(self, edge):
+        """
+        Mark a grid edge as driven
+        """
+        self._check(edge)
+
+        if not self._covered[edge]:
+            with self._lock:
+                if not self._covered[edge]:
+                    self._covered[edge] = 1
+                    self._covered_count.value += 1
+
+
+    def covered(self, edge):
+        self._check(edge)
+
+        return self._covered[edge] == 1
+
+
+    def clear_coverage(self, edges=None):
+        """
+        Forget the edges driven, and track edges edges from now on if
+        given (a new grid).  The map stays where it is, so every process
+        sees the change
+        """
+        if edges is not None and edges > self.capacity:
+            raise ValueError('grid of {} edges is larger than the {} tracked'.format(edges, self.capacity))
+
+        with self._lock:
+            ctypes.memset(self._covered, 0, self.capacity)
+
+            if edges is not None:
+                self._edges.value = edges
+
+            self._covered_count.value = 0
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import datetime
+import multiprocessing
+
+
+##############################################################################
+##############################################################################
+##
+## MOTOR WORKER
+##
+##      one long-lived process that owns the MoveTank
+##
+##############################################################################
+##############################################################################
+
+
+class MotorWorker(object):
+    """
+    Long-lived process that owns the MoveTank and runs motion commands
+    from a queue, one after the other
+
+    Forking the whole gadget for every motion is slow and expensive on
+    the brick, so the worker is forked once at startup.  Each command is
+    reported as accepted (taken off the queue), started (handed to the
+    motors) and completed.  Job states and timestamps live in a shared
+    memory ring so any gadget process can look them up, and completion
+    is also signalled on the MotionCompletion passed in, so waiters
+    wake immediately.
+
+    cancel_all() drops every job submitted so far in O(1), whatever the
+    queue length: it bumps a shared generation number and the worker
+    discards any job from an older generation as it dequeues it.  Jobs
+    submitted after the cancel, while the MotionCompletion is still
+    halted by the killswitch, are cancelled as well, so a process that
+    missed the stop can't queue the motors up again.
+    """
+
+    SUBMITTED = 0
+    ACCEPTED = 1
+    STARTED = 2
+    COMPLETED = 3
+    FAILED = 4
+    CANCELLED = 5
+
+    ##
+    ## timestamps kept per job slot
+    ##
+    T_SUBMITTED = 0
+    T_ACCEPTED = 1
+    T_STARTED = 2
+    T_COMPLETED = 3
+
+    def __init__(self, motion, tank_factory, events=None, slots=64, history=64):
+        self.motion = motion
+        self.events = events
+
+        self._tank_factory = tank_factory
+        self._handlers = {}
+
+        self._queue = multiprocessing.Queue()
+        self._process = None
+
+        ##
+        ## notified whenever a job is done (completed, failed or
+        ## cancelled), for wait()
+        ##
+        self._done = multiprocessing.Condition()
+
+        self._generation = multiprocessing.RawValue('i', 0)
+
+        ##
+        ## job bookkeeping ring (job id -> slot = id % slots)
+        ##
+        self._slots = slots
+        self._next_id = multiprocessing.Value('i', 0)
+        self._job_id = multiprocessing.RawArray('i', slots)
+        self._job_state = multiprocessing.RawArray('i', slots)
+        self._job_times = multiprocessing.RawArray('d', slots*4)
+
+        ##
+        ## dispatch latency (submitted -> started) ring, in seconds
+        ##
+        self._history = history
+        self._dispatch = multiprocessing.RawArray('d', history)
+        self._dispatch_count = multiprocessing.RawValue('i', 0)
+
+
+    def register(self, kind, handler):
+        """
+        handler(tank, **kwargs) runs inside the worker process and should
+        return once the motors are finished.  Register before start()
+        """
+        self._handlers[kind] = handler
+
+
+    def start(self):
+        self._process = multiprocessing.Process(target=self._run)
+        self._process.daemon = True
+        self._process.start()
+
+        print('[+] ({}) Motor worker started (pid {})'.format(datetime.datetime.now(), self._process.pid))
+
+
+    def shutdown(self, timeout=2):
+        if self._process is not None:
+            self._queue.put(None)
+            self._process.join(timeout)
+
+            if self._process.is_alive():
+                self._process.terminate()
+
+            self._process = None
+
+
+    def submit(self, kind, token=None, **kwargs):
+        """
+        Queue a motion command and return its job id.  token is the
+        MotionCompletion token to complete when the job finishes
+        """
+        with self._next_id.get_lock():
+            self._next_id.value += 1
+            job_id = self._next_id.value
+
+        slot = job_id%self._slots
+        self._job_id[slot] = job_id
+        self._job_state[slot] = self.SUBMITTED
+        self._job_times[slot*4+self.T_SUBMITTED] = time.monotonic()
+
+        if self.motion.halted():
+            print('[-] ({}) Motor worker refused job {} ({}), motion halted by the killswitch'.format(datetime.datetime.now(), job_id, kind))
+
+            self._mark(job_id, self.CANCELLED, self.T_COMPLETED)
+
+            if token is not None:
+                self.motion.complete(token)
+
+            return job_id
+
+        self._queue.put((job_id, self._generation.value, kind, token, kwargs))
+
+        return job_id
+
+
+    def cancel_all(self):
+        """
+        Cancel every job submitted so far.  Returns the number of jobs
+        that had not completed yet
+        """
+        self._generation.value += 1
+
+        pending = 0
+        for slot in range(self._slots):
+            if self._job_id[slot] > 0 and self._job_state[slot] < self.COMPLETED:
+                pending += 1
+
+        return pending
+
+
+    def state(self, job_id):
+        slot = job_id%self._slots
+
+        if self._job_id[slot] != job_id:
+            ##
+            ## slot has been reused by a newer job
+            ##
+            return None
+
+        return self._job_state[slot]
+
+
+    def wait(self, job_id, timeout=None):
+        """
+        Block until the job is done.  Returns its state, or None if it
+        is still running when the timeout expires
+        """
+        def done():
+            state = self.state(job_id)
+            return state is None or state >= self.COMPLETED
+
+        with self._done:
+            if not self._done.wait_for(done, timeout):
+                return None
+
+        return self.state(job_id)
+
+
+    def times(self, job_id):
+        """
+        (submitted, accepted, started, completed) time.monotonic() stamps
+        of a job, or None once its slot has been reused
+        """
+        slot = job_id%self._slots
+
+        if self._job_id[slot] != job_id:
+            return None
+
+        return tuple(self._job_times[slot*4:slot*4+4])
+
+
+    def dispatch_stats(self):
+        """
+        count/last/mean/max of the submit -> start latency (seconds)
+        """
+        count = self._dispatch_count.value
+        n = min(count, self._history)
+        samples = [self._dispatch[i] for i in range(n)]
+
+        last = None
+        if count > 0:
+            last = self._dispatch[(count-1)%self._history]
+
+        stats = {
+            'count' : count,
+            'last' : last,
+            'mean' : (sum(samples)/n) if n else None,
+            'max' : max(samples) if n else None
+        }
+
+        return stats
+
+
+    def _mark(self, job_id, state, t):
+        slot = job_id%self._slots
+        self._job_times[slot*4+t] = time.monotonic()
+        self._job_state[slot] = state
+
+        if state >= self.COMPLETED:
+            with self._done:
+                self._done.notify_all()
+
+
+    def _run(self):
+        tank = self._tank_factory()
+
+        while True:
+            item = self._queue.get()
+
+            if item is None:
+                break
+
+            job_id, generation, kind, token, kwargs = item
+            slot = job_id%self._slots
+
+            self._mark(job_id, self.ACCEPTED, self.T_ACCEPTED)
+
+            if generation != self._generation.value or self.motion.halted():
+                self._mark(job_id, self.CANCELLED, self.T_COMPLETED)
+
+                if token is not None:
+                    self.motion.complete(token)
+
+                continue
+
+            try:
+                handler = self._handlers[kind]
+
+                self._mark(job_id, self.STARTED, self.T_STARTED)
+
+                latency = self._job_times[slot*4+self.T_STARTED]-self._job_times[slot*4+self.T_SUBMITTED]
+                self._dispatch[self._dispatch_count.value%self._history] = latency
+                self._dispatch_count.value += 1
+
+                print('[+] ({}) Motor worker started job {} ({}) after {:.1f} ms'.format(datetime.datetime.now(), job_id, kind, latency*1000))
+
+                handler(tank, **kwargs)
+
+                self._mark(job_id, self.COMPLETED, self.T_COMPLETED)
+
+            except Exception as e:
+                exc_type, exc_obj, exc_tb = sys.exc_info()
+                print('[-] Motor worker job {} ({}) Error: {} on line {}'.format(job_id, kind, e, exc_tb.tb_lineno))
+
+                self._mark(job_id, self.FAILED, self.T_COMPLETED)
+
+            finally:
+                if token is not None:
+                    self.motion.complete(token)
+
+                if self.events is not None:
+                    self.events.signal(self.events.JOB_DONE)
+
+
+def run_for_rotations( tank, rotations, left_speed, right_speed,
+                       brake=True,
+                       running=None,
+                       rate=50,
+                       stall_time=0.5,
+                       tolerance=2 ):
+    """
+    Start the tank on a move of rotations and block until the tacho
+    counts of the moving motors say it is done: every one has turned
+    far enough, or none has moved for stall_time seconds (blocked, or
+    stopped by someone else).  The counts are read at most rate times
+    a second.  running() is checked as often and ends the wait early.
+
+    Returns (reached, seconds, degrees turned by the slowest motor)
+    """
+    motors = []
+    if left_speed:
+        motors.append(tank.left_motor)
+    if right_speed:
+        motors.append(tank.right_motor)
+
+    target = abs(rotations)*360-tolerance
+    period = 1.0/rate
+
+    origin = [m.position for m in motors]
+    start = time.monotonic()
+
+    tank.on_for_rotations( left_speed=left_speed,
+                           right_speed=right_speed,
+                           rotations=rotations,
+                           brake=brake,
+                           block=False )
+
+    reached = False
+    last = None
+    progress = start
+    turned = 0
+
+    while True:
+        time.sleep(period)
+
+        if running is not None and not running():
+            ##
+            ## stopped (killswitch) ... don't leave the motors running
+            ## on to the rotation target
+            ##
+            tank.off(brake=brake)
+            break
+
+        counts = [abs(m.position-o) for m, o in zip(motors, origin)]
+        turned = min(counts) if counts else 0
+        now = time.monotonic()
+
+        if turned >= target:
+            reached = True
+            break
+
+        if counts != last:
+            last = counts
+            progress = now
+
+        elif now-progress >= stall_time:
+            ##
+            ## not going anywhere ... let go of the motors
+            ##
+            tank.off(brake=brake)
+            break
+
+    return (reached, time.monotonic()-start, turned)
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+
+import math
+
+import grid
+
+
+##############################################################################
+##############################################################################
+##
+## SEARCH PATTERNS
+##
+##      the legs each search strategy drives, as plain generators so the
+##      gadget, the simulator and the benchmarks share one definition
+##
+##############################################################################
+##############################################################################
+
+
+##
+## leg kinds: (DRIVE, rotations) or (TURN, degrees, positive is right)
+##
+DRIVE = 0
+TURN = 1
+
+##
+## the standard search patterns in the library (PatternLibrary)
+##
+EXPANDING_SQUARE = 'expanding_square'
+SECTOR = 'sector'
+PARALLEL_TRACK = 'parallel_track'
+CREEPING_LINE = 'creeping_line'
+
+LIBRARY = (EXPANDING_SQUARE, SECTOR, PARALLEL_TRACK, CREEPING_LINE)
+
+
+def spiral(first=1, grow=2, angle=90):
+    """
+    Square spiral: drive, turn, and every second drive is `grow`
+    rotations longer than the one before.  Never ends
+    """
+    rotations = first
+    iteration = 0
+
+    while True:
+        yield (DRIVE, rotations)
+        yield (TURN, angle)
+
+        ##
+        ## only extend the rotations every other iteration
+        ##
+        if iteration > 0 and iteration%2 < 1:
+            rotations += grow
+
+        iteration += 1
+
+
+def tour(g, planned, spacing_ew, spacing_ns, inches_per_rotation):
+    """
+    Legs of a planned Tour over grid g (spacing in inches)
+    """
+    heading = planned.heading
+
+    for leg in planned.legs:
+        if leg != heading:
+            yield (TURN, grid.turn_angle(heading, leg))
+
+        if leg%2 > 0:
+            yield (DRIVE, spacing_ew/inches_per_rotation)
+        else:
+            yield (DRIVE, spacing_ns/inches_per_rotation)
+
+        heading = leg
+
+
+def expanding_square(spacing, reach, inches_per_rotation, angle=90):
+    """
+    Expanding square from the datum (wherever the tank is): legs of 1,
+    1, 2, 2, 3, 3 ... track spacings, turning the same way after each,
+    until the square is reach inches out from the datum on every side
+    (the square grows half a spacing off center, so one more ring)
+    """
+    legs = []
+    n = 1
+
+    while (n-1)*spacing < 2*reach+spacing:
+        for i in range(2):
+            legs.append((DRIVE, n*spacing/float(inches_per_rotation)))
+            legs.append((TURN, angle))
+
+        n += 1
+
+    return legs[:-1]
+
+
+def sector(radius, inches_per_rotation, passes=2, angle=120):
+    """
+    Sector search about the datum: three equilateral triangles with
+    sides of radius inches, each leg back to the datum carrying on
+    straight out as the first leg of the next triangle, so the search
+    runs six radials 60 degrees apart and ends on the datum, facing the
+    way it started.  Each further pass is turned by 60/passes degrees
+    to search between the radials of the ones before
+    """
+    r = radius/float(inches_per_rotation)
+
+    one = [ (DRIVE, r), (TURN, angle), (DRIVE, r), (TURN, angle),
+            (DRIVE, 2*r), (TURN, angle), (DRIVE, r), (TURN, angle),
+            (DRIVE, 2*r), (TURN, angle), (DRIVE, r), (TURN, angle),
+            (DRIVE, r) ]
+
+    legs = []
+    for i in range(passes):
+        if i > 0:
+            legs.append((TURN, 60//passes))
+
+        legs.extend(one)
+
+    return legs
+
+
+def boustrophedon(length, across, spacing, turn, inches_per_rotation):
+    """
+    Parallel lanes along length inches, side by side across inches,
+    the first turn at the end of a lane turn degrees (90 right, -90
+    left) and alternating after that.  The lanes are spread evenly at
+    most spacing apart and kept half a lane spacing in from either end.
+    Returns (lane spacing, legs)
+    """
+    lanes = max(1, int(math.ceil(across/float(spacing))))
+    step = across/float(lanes)
+
+    legs = []
+    for i in range(lanes):
+        if i > 0:
+            legs.extend([(TURN, turn), (DRIVE, step/inches_per_rotation), (TURN, turn)])
+            turn = -turn
+
+        legs.append((DRIVE, (length-step)/inches_per_rotation))
+
+    return step, legs
+
+
+def parallel_track(width, height, spacing, inches_per_rotation, along=None):
+    """
+    Parallel track (boustrophedon) over a width x height inch field:
+    lanes along the longer side (or along='width'/'height'), from the
+    north west corner.  Returns ((x, y, heading) to start from, legs)
+    """
+    if along is None:
+        along = 'width' if width >= height else 'height'
+
+    if along == 'width':
+        ##
+        ## lanes east and west, working south (first turn right)
+        ##
+        step, legs = boustrophedon(width, height, spacing, 90, inches_per_rotation)
+        return ((step/2.0, step/2.0, 90), legs)
+
+    ##
+    ## lanes south and north, working east (first turn left)
+    ##
+    step, legs = boustrophedon(height, width, spacing, -90, inches_per_rotation)
+    return ((step/2.0, step/2.0, 180), legs)
+
+
+def creeping_line(width, height, spacing, inches_per_rotation):
+    """
+    Creeping line over a width x height inch field: lanes across the
+    shorter side, creeping along the longer one from the north west
+    corner.  Returns ((x, y, heading) to start from, legs)
+    """
+    return parallel_track( width, height, spacing, inches_per_rotation,
+                           along='height' if width >= height else 'width' )
+
+
+def transit(start, target, inches_per_rotation):
+    """
+    Legs from start to target (x, y, heading): turn towards it, drive
+    straight there and turn to the target heading
+    """
+    x, y, heading = start
+    tx, ty, target_heading = target
+
+    legs = []
+
+    distance = math.hypot(tx-x, ty-y)
+    if distance >= 0.5:
+        bearing = math.degrees(math.atan2(tx-x, -(ty-y)))
+        turn = int(round((bearing-heading+180)%360-180))
+
+        if turn != 0:
+            legs.append((TURN, turn))
+
+        legs.append((DRIVE, distance/inches_per_rotation))
+        heading = bearing
+
+    turn = int(round((target_heading-heading+180)%360-180))
+    if turn != 0:
+        legs.append((TURN, turn))
+
+    return legs
+
+
+def _inside(x0, y0, x1, y1, width, height):
+    """
+    (t0, t1), the part of the segment (x0, y0)-(x1, y1) inside the
+    width x height field as fractions of the way along it, or None if
+    it misses the field (Liang-Barsky)
+    """
+    t0, t1 = 0.0, 1.0
+    dx, dy = x1-x0, y1-y0
+
+    for p, q in ((-dx, x0), (dx, width-x0), (-dy, y0), (dy, height-y0)):
+        if p == 0:
+            if q < 0:
+                return None
+            continue
+
+        t = q/float(p)
+
+        if p < 0:
+            t0 = max(t0, t)
+        else:
+            t1 = min(t1, t)
+
+        if t0 > t1:
+            return None
+
+    return (t0, t1)
+
+
+def clip(start, legs, width, height, inches_per_rotation, margin=0.0, shortest=0.5):
+    """
+    Legs of a pattern flown from start (x, y, heading) that stay on
+    the width x height inch field, give or take margin inches: a drive
+    is cut where it leaves, and the tank goes straight (transit) to
+    where the pattern comes back in.  The field is convex, so the
+    transit stays on it.  Drives shorter than shortest inches are left
+    out
+    """
+    x, y, heading = start
+    tank = start
+
+    clipped = []
+
+    for leg in legs:
+        if leg[0] == TURN:
+            heading += leg[1]
+            continue
+
+        inches = leg[1]*inches_per_rotation
+        h = math.radians(heading)
+        dx, dy = inches*math.sin(h), -inches*math.cos(h)
+
+        part = _inside(x+margin, y+margin, x+dx+margin, y+dy+margin, width+2*margin, height+2*margin)
+
+        if part is not None and (part[1]-part[0])*abs(inches) >= shortest:
+            t0, t1 = part
+
+            clipped.extend(transit(tank, (x+t0*dx, y+t0*dy, heading), inches_per_rotation))
+            clipped.append((DRIVE, (t1-t0)*leg[1]))
+
+            tank = (x+t1*dx, y+t1*dy, heading)
+
+        x, y = x+dx, y+dy
+
+    return clipped
+
+
+def totals(legs):
+    """
+    [rotations driven, degrees turned, legs] of a finite list of legs
+    """
+    rotations = 0.0
+    degrees = 0
+    n = 0
+
+    for leg in legs:
+        if leg[0] == DRIVE:
+            rotations += abs(leg[1])
+        else:
+            degrees += abs(leg[1])
+
+        n += 1
+
+    return [rotations, degrees, n]
+
+
+class PatternLibrary(object):
+    """
+    Leg tables of the standard search patterns (LIBRARY), built ahead
+    of time from the field size and the track spacing and cached, so a
+    search starts on its first leg instead of on planning
+
+        expanding_square    from the datum out, until the square
+                            reaches the farthest corner of the field
+        sector              about the datum, radius half the shorter
+                            side of the field
+        parallel_track      lanes along the longer side
+        creeping_line       lanes across the shorter side
+
+    The datum patterns are flown from wherever the tank is, clipped to
+    the field (a datum in a corner or on an edge would otherwise send
+    most of the legs off it).  A lane up to half a track spacing
+    outside is kept, since it still sweeps the edge of the field.  The field patterns start in the north
+    west corner; legs() puts a transit from the tank's pose in front of
+    them.  Tables are kept per (field,
+    spacing) like RoutePlanner keeps tours, up to cache_size of them.
+    Fill the cache before forking (prepare()) so the search processes
+    inherit it.
+    """
+
+    def __init__(self, cache_size=16):
+        self.cache_size = cache_size
+
+        self._cache = {}
+        self._order = []
+
+
+    def table(self, pattern, width, height, spacing, inches_per_rotation, reach=None):
+        """
+        (start (x, y, heading) or None for a datum pattern, legs)
+        """
+        key = (pattern, width, height, spacing, inches_per_rotation, reach)
+
+        table = self._cache.get(key)
+        if table is None:
+            table = self._build(pattern, width, height, spacing, inches_per_rotation, reach)
+
+            self._cache[key] = table
+            self._order.append(key)
+
+            if len(self._order) > self.cache_size:
+                del self._cache[self._order.pop(0)]
+
+        return table
+
+
+    def _build(self, pattern, width, height, spacing, inches_per_rotation, reach):
+        if pattern == EXPANDING_SQUARE:
+            return (None, tuple(expanding_square(spacing, reach, inches_per_rotation)))
+
+        if pattern == SECTOR:
+            return (None, tuple(sector(min(width, height)/2.0, inches_per_rotation)))
+
+        if pattern == PARALLEL_TRACK:
+            start, legs = parallel_track(width, height, spacing, inches_per_rotation)
+            return (start, tuple(legs))
+
+        if pattern == CREEPING_LINE:
+            start, legs = creeping_line(width, height, spacing, inches_per_rotation)
+            return (start, tuple(legs))
+
+        raise ValueError('unknown search pattern {}'.format(pattern))
+
+
+    @staticmethod
+    def reach(width, height, spacing, x, y):
+        """
+        How far (inches, along either axis) the farthest corner of the
+        field is from (x, y), rounded up to whole track spacings so
+        nearby datums share a table
+        """
+        farthest = max(x, width-x, y, height-y)
+
+        return int(math.ceil(farthest/float(spacing)))*spacing
+
+
+    def legs(self, pattern, width, height, spacing, inches_per_rotation, start):
+        """
+        Legs of a pattern for the tank at start (x, y, heading)
+        """
+        reach = None
+        if pattern == EXPANDING_SQUARE:
+            reach = self.reach(width, height, spacing, start[0], start[1])
+
+        begin, legs = self.table(pattern, width, height, spacing, inches_per_rotation, reach)
+
+        if begin is None:
+            return clip(start, legs, width, height, inches_per_rotation, margin=spacing/2.0)
+
+        return transit(start, begin, inches_per_rotation)+list(legs)
+
+
+    def prepare(self, width, height, spacing, inches_per_rotation, start):
+        """
+        Build every pattern's table for the field and datum.  Returns
+        the number of legs in them
+        """
+        return sum( len(self.legs(pattern, width, height, spacing, inches_per_rotation, start))
+                    for pattern in LIBRARY )
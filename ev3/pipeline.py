@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+import time
+import collections
+
+
+##############################################################################
+##############################################################################
+##
+## MOTION PIPELINE
+##
+##      keeps the motor worker a few legs ahead of the motors
+##
+##############################################################################
+##############################################################################
+
+
+class MotionPipeline(object):
+    """
+    Queues the legs of a mission on the motor worker ahead of time, so
+    the next leg starts the moment the previous one is done instead of
+    after a round trip through the gadget
+
+    submit() returns as soon as the leg is queued, unless depth legs
+    are already outstanding, in which case it first waits for the
+    oldest one.  With the default depth of 2 the worker always has the
+    next leg in hand while the current one runs, and a stop (search
+    over, killswitch) leaves at most one leg to cancel.
+
+    The worker's job timestamps give the time the motors actually ran.
+    stats() reports the duty cycle, the share of the mission the motors
+    were busy, and the gaps between one leg finishing and the next one
+    starting.  With a telemetry ring, every finished leg is also
+    recorded as a span of the kind it was submitted with.
+    """
+
+    def __init__(self, worker, depth=2, keep_going=None, telemetry=None, poll=0.5):
+        self.worker = worker
+        self.depth = depth
+        self.keep_going = keep_going
+        self.telemetry = telemetry
+        self.poll = poll
+
+        ##
+        ## (job id, telemetry kind, a, b, c) not yet retired
+        ##
+        self._pending = collections.deque()
+
+        self.legs = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.gaps = []
+
+        self._first_start = None
+        self._last_end = None
+
+
+    def _running(self):
+        return self.keep_going is None or self.keep_going()
+
+
+    def submit(self, kind, record=None, a=0, b=0, c=0, **kwargs):
+        """
+        Queue a leg (worker job kind and its kwargs).  Returns the job
+        id, or None if keep_going() said stop while waiting for room
+        """
+        while len(self._pending) >= self.depth:
+            if not self._running():
+                return None
+
+            self._retire(self.poll)
+
+        if not self._running():
+            return None
+
+        job_id = self.worker.submit(kind, **kwargs)
+        self._pending.append((job_id, record, a, b, c))
+
+        return job_id
+
+
+    def drain(self):
+        """
+        Wait for every queued leg, or until keep_going() says stop.
+        Returns True if they all finished
+        """
+        while self._pending:
+            if not self._running():
+                return False
+
+            self._retire(self.poll)
+
+        return True
+
+
+    def _retire(self, timeout):
+        """
+        Wait up to timeout for the oldest leg and account for it
+        """
+        job_id, record, a, b, c = self._pending[0]
+
+        state = self.worker.wait(job_id, timeout)
+        if state is None:
+            return
+
+        self._pending.popleft()
+
+        times = self.worker.times(job_id)
+        if times is None or state != self.worker.COMPLETED:
+            self.failed += 1
+            return
+
+        started = times[self.worker.T_STARTED]
+        completed = times[self.worker.T_COMPLETED]
+
+        if self._first_start is None:
+            self._first_start = started
+
+        elif self._last_end is not None:
+            self.gaps.append(max(0.0, started-self._last_end))
+
+        self._last_end = completed
+        self.legs += 1
+        self.busy += completed-started
+
+        if self.telemetry is not None and record is not None:
+            ##
+            ## job times are monotonic, telemetry is wall clock
+            ##
+            offset = time.time()-time.monotonic()
+            self.telemetry.span(record, started+offset, completed+offset, a, b, c)
+
+
+    def stats(self):
+        """
+        legs run, legs failed or cancelled, busy and total seconds from
+        the first leg starting to the last one finishing, duty cycle
+        (0..1) and mean/max gap between legs in seconds
+        """
+        span = 0.0
+        if self._first_start is not None:
+            span = self._last_end-self._first_start
+
+        return {
+            'legs' : self.legs,
+            'failed' : self.failed,
+            'busy' : self.busy,
+            'span' : span,
+            'duty_cycle' : (self.busy/span) if span > 0 else None,
+            'mean_gap' : (sum(self.gaps)/len(self.gaps)) if self.gaps else None,
+            'max_gap' : max(self.gaps) if self.gaps else None
+        }
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+
+import heapq
+import array
+
+import grid
+
+
+##############################################################################
+##############################################################################
+##
+## ROUTE PLANNER
+##
+##      precomputed covering tours over a GridGraph
+##
+##############################################################################
+##############################################################################
+
+
+class Tour(object):
+    """
+    A planned walk: the start node and heading, and one heading per leg
+    (each leg drives to the neighbouring node on that heading)
+    """
+    __slots__ = ('start', 'heading', 'legs', 'end', 'turns', 'degrees', 'repeated')
+
+    def __init__(self, start, heading, legs, end, turns, degrees, repeated):
+        self.start = start
+        self.heading = heading
+        self.legs = legs
+        self.end = end
+        self.turns = turns
+        self.degrees = degrees
+        self.repeated = repeated
+
+    def __len__(self):
+        return len(self.legs)
+
+
+class RoutePlanner(object):
+    """
+    Plans a perimeter walk that drives every perimeter edge and visits
+    every node of the grid, as one Eulerian walk from the start node
+
+        - the required edges are the perimeter plus one line through
+          each interior row (or column, whichever runs longer), joined
+          to the perimeter at alternating ends
+        - every node of odd degree is paired with its nearest odd
+          neighbour and the shortest path between them is driven twice
+          (Eulerian augmentation); the start node counts as odd so one
+          node is left over, which is where the walk ends
+        - the walk is read off with Hierholzer's algorithm, taking the
+          edge that needs the least turning at every node
+
+    Plans are computed once per (grid, start, heading) and cached.
+    """
+
+    def __init__(self, cache_size=8):
+        self.cache_size = cache_size
+
+        self._cache = {}
+        self._order = []
+
+
+    def perimeter_tour(self, g, start, heading):
+        key = (g.columns, g.rows, start, heading)
+
+        tour = self._cache.get(key)
+        if tour is None:
+            tour = self._plan(g, start, heading)
+
+            self._cache[key] = tour
+            self._order.append(key)
+
+            if len(self._order) > self.cache_size:
+                del self._cache[self._order.pop(0)]
+
+        return tour
+
+
+    def _required(self, g):
+        """
+        Edge multiplicities for the perimeter plus the interior lines
+        """
+        count = bytearray(g.edges)
+
+        for e in range(g.edges):
+            if g.is_perimeter_edge(e):
+                count[e] = 1
+
+        if g.columns >= g.rows:
+            lines = g.rows-2
+            span = g.columns
+            at = lambda line, i: g.node(line+1, i)
+            west, east = grid.WEST, grid.EAST
+        else:
+            lines = g.columns-2
+            span = g.rows
+            at = lambda line, i: g.node(i, line+1)
+            west, east = grid.NORTH, grid.SOUTH
+
+        for line in range(lines):
+            ##
+            ## interior nodes of the line, then one edge out to the
+            ## perimeter, on alternating sides
+            ##
+            for i in range(1, span-2):
+                count[g.edge(at(line, i), east)] += 1
+
+            if line%2 == 0:
+                count[g.edge(at(line, 1), west)] += 1
+            else:
+                count[g.edge(at(line, span-2), east)] += 1
+
+        return count
+
+
+    def _path(self, g, a, b):
+        """
+        Edges of a shortest path from a to b (along the row first)
+        """
+        ra, ca = g.position(a)
+        rb, cb = g.position(b)
+
+        edges = []
+        node = a
+
+        step = grid.EAST if cb > ca else grid.WEST
+        for i in range(abs(cb-ca)):
+            edges.append(g.edge(node, step))
+            node = g.neighbour(node, step)
+
+        step = grid.SOUTH if rb > ra else grid.NORTH
+        for i in range(abs(rb-ra)):
+            edges.append(g.edge(node, step))
+            node = g.neighbour(node, step)
+
+        return edges
+
+
+    def _plan(self, g, start, heading):
+        count = self._required(g)
+        required = sum(count)
+
+        ##
+        ## odd nodes, with the start node's parity flipped
+        ##
+        degree = array.array('i', [0])*g.nodes
+        for e in range(g.edges):
+            if count[e]:
+                a, h, b = g.edge_nodes(e)
+                degree[a] += count[e]
+                degree[b] += count[e]
+
+        odd = set(n for n in range(g.nodes) if degree[n]%2)
+        odd ^= set([start])
+
+        ##
+        ## greedy nearest pairing ... the odd nodes sit along the sides
+        ## of the grid next to each other, so this is close to optimal
+        ##
+        def distance(a, b):
+            ra, ca = g.position(a)
+            rb, cb = g.position(b)
+            return abs(ra-rb)+abs(ca-cb)
+
+        pending = sorted(odd)
+        pairs = sorted( (distance(a, pending[j]), a, pending[j])
+                        for i, a in enumerate(pending)
+                        for j in range(i+1, len(pending)) )
+
+        paired = set()
+        for d, a, b in pairs:
+            if a in paired or b in paired:
+                continue
+
+            paired.add(a)
+            paired.add(b)
+
+            for e in self._path(g, a, b):
+                count[e] += 1
+
+            if len(paired) >= len(pending)-1:
+                break
+
+        legs = self._hierholzer(g, count, start, heading)
+
+        ##
+        ## turns and end node
+        ##
+        node = start
+        current = heading
+        turns = 0
+        degrees = 0
+        for h in legs:
+            if h != current:
+                turns += 1
+                degrees += abs(grid.turn_angle(current, h))
+            current = h
+            node = g.neighbour(node, h)
+
+        return Tour(start, heading, legs, node, turns, degrees, len(legs)-required)
+
+
+    def _hierholzer(self, g, count, start, heading):
+        count = bytearray(count)
+
+        ##
+        ## stack of (node, heading we arrived on)
+        ##
+        stack = [(start, heading)]
+        out = []
+
+        while stack:
+            node, arrived = stack[-1]
+
+            ##
+            ## least turning first: straight on, left, right, back
+            ##
+            for h in (arrived, (arrived+3)%4, (arrived+1)%4, (arrived+2)%4):
+                e = g.edge(node, h)
+                if e >= 0 and count[e]:
+                    break
+            else:
+                stack.pop()
+                out.append(arrived)
+                continue
+
+            count[e] -= 1
+            stack.append((g.neighbour(node, h), h))
+
+        ##
+        ## popped in reverse, and the start entry is not a leg
+        ##
+        out.pop()
+        out.reverse()
+
+        return array.array('b', out)
+
+
+class PathTable(object):
+    """
+    Next move from any (node, heading) state to a target node
+
+    Costs are the inches driven (the node spacing east/west and
+    north/south) plus turn_cost inches for every 90 degrees of turning,
+    so the cheapest route avoids needless turns, not just extra legs.
+
+    For each target, one reverse Dijkstra over the 4 x nodes states
+    fills a table of the heading to take next, so a lookup is a single
+    array index.  Small grids get every target up front (all pairs);
+    on large grids, where all pairs would not fit, targets are filled
+    the first time they are asked for and the most recent few are kept.
+    Changing the grid dimensions only changes the weights, so the
+    tables are dropped and refilled, the graph is kept.
+    """
+
+    ##
+    ## next heading at the target itself
+    ##
+    ARRIVED = -1
+
+    def __init__(self, g, spacing_ew, spacing_ns, turn_cost, precompute=64, cache_size=16):
+        self.g = g
+        self.turn_cost = turn_cost
+        self.precompute = precompute
+        self.cache_size = cache_size
+
+        self.spacing = None
+        self._tables = {}
+        self._order = []
+
+        self.set_spacing(spacing_ew, spacing_ns)
+
+
+    def set_spacing(self, spacing_ew, spacing_ns):
+        """
+        New node spacing (inches) ... returns True if the tables had to
+        be rebuilt
+        """
+        spacing = (spacing_ew, spacing_ns)
+        if spacing == self.spacing:
+            return False
+
+        self.spacing = spacing
+        self._tables = {}
+        self._order = []
+
+        if self.g.nodes <= self.precompute:
+            for target in range(self.g.nodes):
+                self._table(target)
+
+        return True
+
+
+    def next_heading(self, node, heading, target):
+        return self._table(target)[0][node*4+heading]
+
+
+    def cost(self, node, heading, target):
+        """
+        Inches (driving plus turns) from the state to the target
+        """
+        return self._table(target)[1][node*4+heading]
+
+
+    def route(self, node, heading, target):
+        """
+        Headings of the legs from node (facing heading) to target
+        """
+        policy = self._table(target)[0]
+
+        legs = array.array('b')
+        while node != target:
+            heading = policy[node*4+heading]
+            legs.append(heading)
+            node = self.g.neighbour(node, heading)
+
+        return legs
+
+
+    def _table(self, target):
+        table = self._tables.get(target)
+
+        if table is None:
+            table = self._build(target)
+            self._tables[target] = table
+
+            if self.g.nodes > self.precompute:
+                self._order.append(target)
+                if len(self._order) > self.cache_size:
+                    del self._tables[self._order.pop(0)]
+
+        return table
+
+
+    def _build(self, target):
+        g = self.g
+        adjacency = g.adjacency
+        states = g.nodes*4
+
+        ##
+        ## leg length by heading, turn cost by (heading, new heading)
+        ##
+        length = (self.spacing[1], self.spacing[0], self.spacing[1], self.spacing[0])
+        turn = [ [ abs(grid.turn_angle(h, k))/90.0*self.turn_cost for k in range(4) ] for h in range(4) ]
+
+        dist = array.array('d', [float('inf')])*states
+        policy = array.array('b', [self.ARRIVED])*states
+
+        heap = []
+        for h in range(4):
+            dist[target*4+h] = 0.0
+            heap.append((0.0, target*4+h))
+
+        ##
+        ## state s = node*4+heading: at node, facing heading.  Working
+        ## backwards, s is reached by driving heading from the node
+        ## behind it, after turning from any heading there
+        ##
+        while heap:
+            d, s = heapq.heappop(heap)
+            if d > dist[s]:
+                continue
+
+            node, heading = divmod(s, 4)
+            previous = adjacency[node*4+(heading+2)%4]
+            if previous < 0:
+                continue
+
+            leg = d+length[heading]
+            for h in range(4):
+                c = leg+turn[h][heading]
+                p = previous*4+h
+                if c < dist[p]:
+                    dist[p] = c
+                    policy[p] = heading
+                    heapq.heappush(heap, (c, p))
+
+        return policy, dist
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+import math
+import time
+import multiprocessing
+
+
+##############################################################################
+##############################################################################
+##
+## POSE ESTIMATOR
+##
+##      dead reckoning from the wheel encoders and the gyro
+##
+##############################################################################
+##############################################################################
+
+
+def wrap(radians):
+    """
+    Angle folded into [-pi, pi)
+    """
+    return (radians+math.pi)%(2*math.pi)-math.pi
+
+
+class PoseEstimator(object):
+    """
+    Incremental (x, y, heading) of the tank, in inches east and south
+    of the north west corner of the grid and degrees clockwise from
+    north (the simulator's frame)
+
+    update() runs at a fixed rate inside the sensor hub process, off the
+    hub's 'left', 'right' and 'gyro' channels.  Distance comes from the
+    mean of the two encoder deltas.  Heading is predicted from the
+    difference between them (fine grained, but it drifts when a wheel
+    slips) and pulled towards the gyro by gyro_weight every update (the
+    gyro only reads whole degrees, but does not drift with slip), a
+    complementary filter.  Position is advanced along the heading half
+    way through each step.
+
+    The state is a handful of doubles in shared memory, so it costs the
+    same however long the mission runs, and any gadget process can read
+    it with pose().  The hub is the only writer: it bumps a sequence
+    number before and after every update, and readers retry until they
+    see the same even number on both sides of their read.  place() is
+    handed over through shared memory too and applied by the next
+    update.
+    """
+
+    ##
+    ## shared state slots
+    ##
+    X = 0
+    Y = 1
+    THETA = 2
+    LEFT = 3
+    RIGHT = 4
+    GYRO_REF = 5
+    THETA_REF = 6
+    T = 7
+    DISTANCE = 8
+    UPDATES = 9
+    GYRO_OFFSET = 10
+    PLACE_X = 11
+    PLACE_Y = 12
+    PLACE_THETA = 13
+
+    def __init__(self, inches_per_rotation=3.75, track=4.75, gyro_weight=0.05):
+        self.inches_per_degree = inches_per_rotation/360.0
+        self.track = track
+        self.gyro_weight = gyro_weight
+
+        self._state = multiprocessing.RawArray('d', 14)
+        self._seq = multiprocessing.RawValue('L', 0)
+
+        ##
+        ## placements requested / applied
+        ##
+        self._placed = multiprocessing.RawValue('L', 0)
+        self._applied = multiprocessing.RawValue('L', 0)
+
+
+    def place(self, x, y, heading):
+        """
+        Put the tank at (x, y) inches facing heading degrees, from the
+        next update on
+        """
+        s = self._state
+        s[self.PLACE_X] = x
+        s[self.PLACE_Y] = y
+        s[self.PLACE_THETA] = math.radians(heading)
+
+        self._placed.value += 1
+
+
+    def update(self, hub):
+        """
+        One step from the newest encoder and gyro samples (sensor hub
+        task)
+        """
+        left = hub.value('left')
+        right = hub.value('right')
+        gyro = hub.value('gyro')
+
+        if left is None or right is None or gyro is None:
+            return
+
+        s = self._state
+        placed = self._placed.value
+
+        self._seq.value += 1
+
+        if placed != self._applied.value:
+            s[self.X] = s[self.PLACE_X]
+            s[self.Y] = s[self.PLACE_Y]
+            s[self.THETA] = s[self.PLACE_THETA]
+            s[self.THETA_REF] = s[self.PLACE_THETA]
+            s[self.GYRO_REF] = gyro
+            s[self.LEFT] = left
+            s[self.RIGHT] = right
+            s[self.GYRO_OFFSET] = 0.0
+
+            self._applied.value = placed
+
+        elif placed > 0:
+            dl = (left-s[self.LEFT])*self.inches_per_degree
+            dr = (right-s[self.RIGHT])*self.inches_per_degree
+            s[self.LEFT] = left
+            s[self.RIGHT] = right
+
+            distance = (dl+dr)/2.0
+            theta = s[self.THETA]
+
+            predicted = theta+(dl-dr)/self.track
+            measured = s[self.THETA_REF]+math.radians(gyro-s[self.GYRO_REF])
+            offset = wrap(measured-predicted)
+
+            theta_1 = wrap(predicted+self.gyro_weight*offset)
+            middle = theta+wrap(theta_1-theta)/2.0
+
+            s[self.X] += distance*math.sin(middle)
+            s[self.Y] -= distance*math.cos(middle)
+            s[self.THETA] = theta_1
+            s[self.DISTANCE] += abs(distance)
+            s[self.GYRO_OFFSET] = offset
+
+        s[self.T] = time.monotonic()
+        s[self.UPDATES] += 1
+
+        self._seq.value += 1
+
+
+    def _snapshot(self, slots):
+        s = self._state
+
+        while True:
+            seq = self._seq.value
+
+            if seq%2 == 0:
+                values = [s[i] for i in slots]
+
+                if self._seq.value == seq:
+                    return values
+
+
+    def pose(self):
+        """
+        (x inches, y inches, heading degrees 0..360), or None until the
+        tank has been placed and the estimator has run
+        """
+        if self._applied.value == 0:
+            return None
+
+        x, y, theta = self._snapshot((self.X, self.Y, self.THETA))
+
+        return (x, y, math.degrees(theta)%360)
+
+
+    def stats(self):
+        """
+        Updates run, inches driven, age of the estimate (seconds) and
+        the last disagreement between gyro and encoder heading (degrees,
+        large when a wheel slips)
+        """
+        t, distance, updates, offset = self._snapshot((self.T, self.DISTANCE, self.UPDATES, self.GYRO_OFFSET))
+
+        return {
+            'updates' : int(updates),
+            'distance' : distance,
+            'age' : (time.monotonic()-t) if updates else None,
+            'gyro_offset' : math.degrees(offset)
+        }
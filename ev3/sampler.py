@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+import time
+import array
+import datetime
+import multiprocessing
+
+
+##############################################################################
+##############################################################################
+##
+## COLOR SAMPLER
+##
+##      fixed rate color sampling with N of M debounced detection
+##
+##############################################################################
+##############################################################################
+
+
+class ColorSampler(object):
+    """
+    Collects color samples at a fixed rate into a preallocated ring
+    buffer and declares a find only once `hits` of the last `window`
+    samples match the target color
+
+    A single matching sample is not enough on patterned floors, and
+    spinning on the sensor as fast as the loop allows burns the brick's
+    only core, so the loop sleeps until the next poll is due.  Each
+    poll takes the samples read since the one before (from the sensor
+    hub), so a reading counts once however the poll and sensor rates
+    compare ... polling a "latest value" faster than the sensor is read
+    would count one glimpse of green several times.
+
+    Create the sampler before forking the process that calls run(): the
+    published statistics live in shared memory so any gadget process can
+    read them with stats().
+    """
+
+    ##
+    ## published statistics (shared memory slots)
+    ##
+    S_RATE = 0
+    S_SAMPLES = 1
+    S_DETECTIONS = 2
+    S_LATENCY = 3
+    S_LATENCY_MAX = 4
+    S_OVERRUNS = 5
+
+    def __init__(self, target, rate=50, window=5, hits=3, size=256):
+        if hits > window:
+            raise ValueError('hits ({}) can not exceed window ({})'.format(hits, window))
+
+        self.target = target
+        self.rate = rate
+        self.period = 1.0/rate
+        self.window = window
+        self.hits = hits
+
+        ##
+        ## ring buffer, allocated once ... one sample longer than the
+        ## window, so the sample leaving the window is still there to
+        ## look at when the new one comes in
+        ##
+        self.size = max(size, window+1)
+        self.colors = array.array('b', [0])*self.size
+        self.times = array.array('d', [0.0])*self.size
+        self.count = 0
+
+        self._shared = multiprocessing.RawArray('d', 6)
+
+
+    def run(self, read, keep_going):
+        """
+        Poll read() for new (timestamp, color) samples until a debounced
+        match is found (returns True) or keep_going() returns False
+        (returns False)
+        """
+        size = self.size
+        window = self.window
+        target = self.target
+        period = self.period
+
+        colors = self.colors
+        times = self.times
+
+        self.count = 0
+        published = 0
+        matches = 0
+
+        start = time.monotonic()
+        next_poll = start
+
+        while keep_going():
+            for now, color in read():
+                i = self.count%size
+                colors[i] = color
+                times[i] = now
+                self.count += 1
+
+                if color == target:
+                    matches += 1
+
+                ##
+                ## keep a running count of matches inside the window
+                ##
+                if self.count > window:
+                    if colors[(self.count-window-1)%size] == target:
+                        matches -= 1
+
+                if matches >= self.hits:
+                    self._detected(now)
+                    self._publish(start)
+                    return True
+
+            if self.count-published >= self.rate:
+                self._publish(start)
+                published = self.count
+
+            ##
+            ## fixed rate ... sleep until the next poll is due, and if
+            ## we have fallen behind, start the schedule over from now
+            ##
+            next_poll += period
+            delay = next_poll-time.monotonic()
+
+            if delay > 0:
+                time.sleep(delay)
+
+            else:
+                self._shared[self.S_OVERRUNS] += 1
+                next_poll = time.monotonic()
+
+        self._publish(start)
+
+        return False
+
+
+    def _detected(self, now):
+        ##
+        ## latency is measured from the oldest matching sample still in
+        ## the window, i.e. the moment the subject came into view
+        ##
+        first = now
+        for n in range(1, min(self.window, self.count)+1):
+            i = (self.count-n)%self.size
+            if self.colors[i] == self.target:
+                first = self.times[i]
+
+        latency = now-first
+
+        self._shared[self.S_DETECTIONS] += 1
+        self._shared[self.S_LATENCY] = latency
+        if latency > self._shared[self.S_LATENCY_MAX]:
+            self._shared[self.S_LATENCY_MAX] = latency
+
+        print('[+] ({}) Color {} confirmed by {} of the last {} samples, {:.1f} ms after first sighting'.format(
+            datetime.datetime.now(), self.target, self.hits, self.window, latency*1000))
+
+
+    def _publish(self, start):
+        elapsed = time.monotonic()-start
+
+        if elapsed > 0:
+            self._shared[self.S_RATE] = self.count/elapsed
+
+        self._shared[self.S_SAMPLES] = self.count
+
+
+    def recent(self, n=None):
+        """
+        The last n (timestamp, color) samples, oldest first
+        """
+        if n is None:
+            n = self.size
+
+        n = min(n, self.count, self.size)
+
+        return [ (self.times[(self.count-k)%self.size], self.colors[(self.count-k)%self.size])
+                 for k in range(n, 0, -1) ]
+
+
+    def stats(self):
+        s = self._shared
+
+        stats = {
+            'samples_per_second' : s[self.S_RATE],
+            'samples' : int(s[self.S_SAMPLES]),
+            'detections' : int(s[self.S_DETECTIONS]),
+            'detection_latency' : s[self.S_LATENCY],
+            'detection_latency_max' : s[self.S_LATENCY_MAX],
+            'overruns' : int(s[self.S_OVERRUNS]),
+            'target_rate' : self.rate
+        }
+
+        return stats
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import heapq
+import datetime
+import threading
+import itertools
+
+
+##############################################################################
+##############################################################################
+##
+## COMMAND SCHEDULER
+##
+##      dispatch-table driven, prioritized and preemptible directive queue
+##
+##############################################################################
+##############################################################################
+
+
+class Command(object):
+    """
+    One queued directive
+    """
+    __slots__ = ('intent', 'payload', 'priority', 'seq', 'submit_time')
+
+    def __init__(self, intent, payload, priority, seq):
+        self.intent = intent
+        self.payload = payload
+        self.priority = priority
+        self.seq = seq
+        self.submit_time = time.monotonic()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class CommandScheduler(object):
+    """
+    Runs gadget directives off the Alexa callback thread
+
+    Intents are registered in a dispatch table with a handler and a
+    priority.  submit() only queues the directive and returns, so the
+    callback thread is free to receive the next one.  Normal commands
+    run one at a time, lowest priority number first, in arrival order.
+
+    Preempting intents (killswitch, pause) never wait behind the queue:
+    they run straight away on their own lane, even while a normal
+    command is still running, and may clear whatever is still queued.
+
+    A newly submitted command can be collapsed into the command queued
+    just before it (e.g. two moves in the same direction) through the
+    intent's coalesce function.
+    """
+
+    URGENT = 0
+    HIGH = 1
+    NORMAL = 2
+
+    def __init__(self):
+        self._table = {}
+
+        self._cond = threading.Condition()
+        self._heap = []
+        self._tail = None
+        self._seq = itertools.count()
+        self._running = False
+
+        self._urgent_cond = threading.Condition()
+        self._urgent = []
+
+        self._threads = []
+
+        ##
+        ## metrics
+        ##
+        self._max_depth = 0
+        self._wait_stats = {}
+        self._coalesced = 0
+
+
+    def register( self, intent, handler,
+                  priority=None,
+                  preempt=False,
+                  clear_queue=False,
+                  coalesce=None ):
+        """
+        handler(payload) runs the directive.  coalesce(queued, new)
+        returns a merged payload, or None if the two can't be merged
+        """
+        if priority is None:
+            priority = self.URGENT if preempt else self.NORMAL
+
+        self._table[intent] = {
+            'handler' : handler,
+            'priority' : priority,
+            'preempt' : preempt,
+            'clear_queue' : clear_queue,
+            'coalesce' : coalesce
+        }
+
+
+    def start(self):
+        self._running = True
+
+        for target in (self._run_normal, self._run_urgent):
+            t = threading.Thread(target=target)
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+
+    def shutdown(self):
+        self._running = False
+
+        with self._cond:
+            self._cond.notify_all()
+
+        with self._urgent_cond:
+            self._urgent_cond.notify_all()
+
+
+    def submit(self, intent, payload):
+        """
+        Queue a directive, returns False if the intent isn't registered
+        """
+        entry = self._table.get(intent)
+
+        if entry is None:
+            print('[-] ({}) No handler registered for intent {}'.format(datetime.datetime.now(), intent))
+            return False
+
+        command = Command(intent, payload, entry['priority'], next(self._seq))
+
+        if entry['preempt'] is True:
+
+            if entry['clear_queue'] is True:
+                self.clear()
+
+            with self._urgent_cond:
+                self._urgent.append(command)
+                self._urgent_cond.notify()
+
+            return True
+
+        with self._cond:
+            ##
+            ## only the most recently queued command may absorb the new
+            ## one ... anything further back would change the order
+            ##
+            tail = self._tail
+            if entry['coalesce'] is not None and tail is not None and tail.intent == intent:
+                merged = entry['coalesce'](tail.payload, payload)
+
+                if merged is not None:
+                    tail.payload = merged
+                    self._coalesced += 1
+                    print('[+] ({}) Collapsed queued {} ({} collapsed so far)'.format(datetime.datetime.now(), intent, self._coalesced))
+                    return True
+
+            heapq.heappush(self._heap, command)
+            self._tail = command
+
+            depth = len(self._heap)
+            if depth > self._max_depth:
+                self._max_depth = depth
+
+            self._cond.notify()
+
+        return True
+
+
+    def clear(self):
+        with self._cond:
+            dropped = len(self._heap)
+            self._heap = []
+            self._tail = None
+
+        if dropped > 0:
+            print('[+] ({}) Dropped {} queued commands'.format(datetime.datetime.now(), dropped))
+
+        return dropped
+
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._heap)
+
+
+    def stats(self):
+        """
+        queue depth and per-intent queue wait time (seconds)
+        """
+        with self._cond:
+            waits = {}
+            for intent in self._wait_stats:
+                w = self._wait_stats[intent]
+                waits[intent] = {
+                    'count' : w['count'],
+                    'mean' : w['total']/w['count'],
+                    'max' : w['max'],
+                    'last' : w['last']
+                }
+
+            stats = {
+                'depth' : len(self._heap),
+                'max_depth' : self._max_depth,
+                'coalesced' : self._coalesced,
+                'wait' : waits
+            }
+
+        return stats
+
+
+    def _record_wait(self, command):
+        wait = time.monotonic()-command.submit_time
+
+        with self._cond:
+            w = self._wait_stats.setdefault(command.intent, {'count' : 0, 'total' : 0.0, 'max' : 0.0, 'last' : 0.0})
+            w['count'] += 1
+            w['total'] += wait
+            w['last'] = wait
+            if wait > w['max']:
+                w['max'] = wait
+
+        return wait
+
+
+    def _execute(self, command):
+        wait = self._record_wait(command)
+
+        print('[+] ({}) Dispatching {} after {:.1f} ms in queue (depth {})'.format(
+            datetime.datetime.now(), command.intent, wait*1000, self.queue_depth()))
+
+        try:
+            self._table[command.intent]['handler'](command.payload)
+
+        except Exception as e:
+            exc_type, exc_obj, exc_tb = sys.exc_info()
+            print('[-] Scheduler {} Error: {} on line {}'.format(command.intent, e, exc_tb.tb_lineno))
+
+
+    def _run_normal(self):
+        while self._running:
+            with self._cond:
+                while self._running and not self._heap:
+                    self._cond.wait()
+
+                if not self._running:
+                    break
+
+                command = heapq.heappop(self._heap)
+                if command is self._tail:
+                    self._tail = None
+
+            self._execute(command)
+
+
+    def _run_urgent(self):
+        while self._running:
+            with self._urgent_cond:
+                while self._running and not self._urgent:
+                    self._urgent_cond.wait()
+
+                if not self._running:
+                    break
+
+                command = self._urgent.pop(0)
+
+            self._execute(command)
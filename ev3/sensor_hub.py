@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import datetime
+import multiprocessing
+
+
+##############################################################################
+##############################################################################
+##
+## SENSOR HUB
+##
+##      one process reads every sensor and publishes to shared memory
+##
+##############################################################################
+##############################################################################
+
+
+class SensorHub(object):
+    """
+    Long-lived process that opens each sensor once and samples it at a
+    fixed rate into a shared memory ring of (timestamp, value)
+
+    Without it every turn opened its own GyroSensor and every search its
+    own ColorSensor, and each reader went to sysfs by itself.  Now the
+    hub is the only one touching the sensors; anybody else looks up the
+    latest sample with value() or latest(), which is a couple of reads
+    of shared memory with no lock and no I/O.
+
+    Channels are added before start() with a factory (run inside the
+    hub process, so the port is opened there) and a read function.  A
+    sensor that can not be opened (not plugged in) is left out and its
+    channel stays empty.
+
+    Tasks attached with attach() run in the hub process at their own
+    rate, after the channels, e.g. to fuse the readings into a pose.
+
+    Each channel's ring is written slot first and count last, so a
+    reader that takes the slot just below count gets a complete sample
+    unless the hub has gone round the whole ring in between.
+    """
+
+    ##
+    ## published statistics per channel (shared memory slots)
+    ##
+    S_RATE = 0
+    S_ERRORS = 1
+    S_OVERRUNS = 2
+    S_OPEN = 3
+
+    def __init__(self, size=64):
+        self.size = size
+
+        self._channels = {}
+        self._order = []
+        self._tasks = []
+        self._process = None
+
+        self._stop = multiprocessing.Event()
+
+
+    def add(self, name, factory, read, rate):
+        """
+        factory() opens the sensor, read(sensor) returns a number.
+        Add every channel before start()
+        """
+        self._channels[name] = {
+            'factory' : factory,
+            'read' : read,
+            'rate' : rate,
+            'times' : multiprocessing.RawArray('d', self.size),
+            'values' : multiprocessing.RawArray('d', self.size),
+            'count' : multiprocessing.RawValue('L', 0),
+            'stats' : multiprocessing.RawArray('d', 4)
+        }
+
+        self._order.append(name)
+
+
+    def attach(self, name, task, rate):
+        """
+        task(hub) runs inside the hub process rate times a second.
+        Attach before start()
+        """
+        self._tasks.append((name, task, rate))
+
+
+    def start(self):
+        self._process = multiprocessing.Process(target=self._run)
+        self._process.daemon = True
+        self._process.start()
+
+        print('[+] ({}) Sensor hub started (pid {}): {}'.format(
+            datetime.datetime.now(), self._process.pid,
+            ', '.join('{} {} Hz'.format(name, self._channels[name]['rate']) for name in self._order)))
+
+
+    def shutdown(self, timeout=2):
+        if self._process is not None:
+            self._stop.set()
+            self._process.join(timeout)
+
+            if self._process.is_alive():
+                self._process.terminate()
+
+            self._process = None
+
+
+    def latest(self, name):
+        """
+        (timestamp, value) of the newest sample, or None if there is
+        none yet.  Lock-free
+        """
+        channel = self._channels[name]
+        count = channel['count'].value
+
+        if count == 0:
+            return None
+
+        i = (count-1)%self.size
+
+        return (channel['times'][i], channel['values'][i])
+
+
+    def value(self, name, default=None):
+        sample = self.latest(name)
+
+        if sample is None:
+            return default
+
+        return sample[1]
+
+
+    def count(self, name):
+        """
+        How many samples a channel has taken so far
+        """
+        return self._channels[name]['count'].value
+
+
+    def since(self, name, count):
+        """
+        (count, samples): the (timestamp, value) samples a channel has
+        taken since it held count samples, oldest first, and the count
+        to pass next time.  Each sample is handed out once per reader,
+        however often it asks; a reader that has fallen more than the
+        ring behind gets the newest ring's worth
+        """
+        channel = self._channels[name]
+        now = channel['count'].value
+
+        return now, [ (channel['times'][k%self.size], channel['values'][k%self.size])
+                      for k in range(max(count, now-self.size), now) ]
+
+
+    def recent(self, name, n=None):
+        """
+        The last n (timestamp, value) samples of a channel, oldest first
+        """
+        channel = self._channels[name]
+        count = channel['count'].value
+
+        if n is None:
+            n = self.size
+
+        n = min(n, count, self.size)
+
+        return [ (channel['times'][(count-k)%self.size], channel['values'][(count-k)%self.size])
+                 for k in range(n, 0, -1) ]
+
+
+    def stats(self):
+        """
+        Per channel: samples, samples per second, age of the newest
+        sample (seconds), read errors, overruns and whether the sensor
+        could be opened
+        """
+        now = time.monotonic()
+        stats = {}
+
+        for name in self._order:
+            channel = self._channels[name]
+            s = channel['stats']
+            sample = self.latest(name)
+
+            stats[name] = {
+                'samples' : channel['count'].value,
+                'samples_per_second' : s[self.S_RATE],
+                'age' : (now-sample[0]) if sample is not None else None,
+                'errors' : int(s[self.S_ERRORS]),
+                'overruns' : int(s[self.S_OVERRUNS]),
+                'open' : s[self.S_OPEN] == 1,
+                'target_rate' : channel['rate']
+            }
+
+        return stats
+
+
+    def _open(self):
+        sensors = {}
+
+        for name in self._order:
+            channel = self._channels[name]
+
+            try:
+                sensors[name] = channel['factory']()
+                channel['stats'][self.S_OPEN] = 1
+
+            except Exception as e:
+                exc_type, exc_obj, exc_tb = sys.exc_info()
+                print('[-] Sensor hub {} Error: {} on line {}'.format(name, e, exc_tb.tb_lineno))
+
+        return sensors
+
+
+    def _run(self):
+        sensors = self._open()
+        names = [name for name in self._order if name in sensors]
+
+        if not names and not self._tasks:
+            return
+
+        start = time.monotonic()
+        due = dict((name, start) for name in names)
+        task_due = [start]*len(self._tasks)
+
+        while not self._stop.is_set():
+            now = time.monotonic()
+
+            for name in names:
+                if due[name] > now:
+                    continue
+
+                channel = self._channels[name]
+                stats = channel['stats']
+
+                try:
+                    value = channel['read'](sensors[name])
+
+                    count = channel['count'].value
+                    i = count%self.size
+                    channel['times'][i] = now
+                    channel['values'][i] = value
+                    channel['count'].value = count+1
+
+                    if (count+1)%channel['rate'] == 0:
+                        stats[self.S_RATE] = (count+1)/max(now-start, 1e-6)
+
+                except Exception:
+                    ##
+                    ## counted, not printed, at these rates
+                    ##
+                    stats[self.S_ERRORS] += 1
+
+                ##
+                ## fixed rate per channel ... if it has fallen a whole
+                ## period behind, start its schedule over from now
+                ##
+                due[name] += 1.0/channel['rate']
+                if due[name] <= now:
+                    stats[self.S_OVERRUNS] += 1
+                    due[name] = now+1.0/channel['rate']
+
+            for i, (name, task, rate) in enumerate(self._tasks):
+                if task_due[i] > now:
+                    continue
+
+                try:
+                    task(self)
+
+                except Exception as e:
+                    exc_type, exc_obj, exc_tb = sys.exc_info()
+                    print('[-] Sensor hub {} Error: {} on line {}'.format(name, e, exc_tb.tb_lineno))
+
+                task_due[i] += 1.0/rate
+                if task_due[i] <= now:
+                    task_due[i] = now+1.0/rate
+
+            delay = min(list(due.values())+task_due)-time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+
+class HubGyro(object):
+    """
+    Gyro sensor look-alike backed by the hub's 'gyro' channel, for the
+    turn controller.  reset() only moves this view's zero, the sensor
+    itself is never reset
+    """
+
+    def __init__(self, hub, channel='gyro'):
+        self.hub = hub
+        self.channel = channel
+        self.zero = 0
+
+        self.reset()
+
+
+    @property
+    def angle(self):
+        return self.hub.value(self.channel, self.zero)-self.zero
+
+
+    def reset(self):
+        self.zero = self.hub.value(self.channel, 0)
@@ -0,0 +1,649 @@
+#!/usr/bin/env python3
+
+##
+## Offline simulator for the EV3 search gadget
+##
+## Stands in for the ev3dev2 classes and the agt AlexaGadget that main.py
+## uses, so missions can run on any Linux box:
+##
+##      - MoveTank drives a differential drive robot in a shared memory
+##        world (every gadget process drives the same robot)
+##      - GyroSensor reads the robot's heading
+##      - ColorSensor reads a floor color map under the sensor
+##      - time runs `speedup` times faster than real time
+##
+## usage: python3 sim.py [walk_perimeter|start_search] [speedup] [sim seconds] [search pattern]
+##
+
+import sys
+import math
+import time
+import json
+import types
+import threading
+import datetime
+import multiprocessing
+import multiprocessing.synchronize
+
+
+##############################################################################
+##############################################################################
+##
+## CLOCK
+##
+##############################################################################
+##############################################################################
+
+
+class SimClock(object):
+    """
+    Compressed time: every simulated second takes 1/speedup real seconds
+    """
+
+    def __init__(self, speedup=100):
+        self.speedup = float(speedup)
+
+        self._real_monotonic = time.monotonic
+        self._real_time = time.time
+        self._real_sleep = time.sleep
+
+        self._base = self._real_monotonic()
+        self._wall = self._real_time()
+
+        self._wait = None
+
+
+    def monotonic(self):
+        return self._base+(self._real_monotonic()-self._base)*self.speedup
+
+
+    def time(self):
+        return self._wall+(self._real_monotonic()-self._base)*self.speedup
+
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self._real_sleep(seconds/self.speedup)
+
+
+    def install(self):
+        time.monotonic = self.monotonic
+        time.time = self.time
+        time.sleep = self.sleep
+
+        ##
+        ## multiprocessing Condition.wait_for measures its timeout with
+        ## time.monotonic, so the waits it makes have to be scaled too
+        ##
+        self._wait = multiprocessing.synchronize.Condition.wait
+        wait = self._wait
+        speedup = self.speedup
+
+        def scaled_wait(cond, timeout=None):
+            if timeout is not None:
+                timeout = timeout/speedup
+            return wait(cond, timeout)
+
+        multiprocessing.synchronize.Condition.wait = scaled_wait
+
+
+    def uninstall(self):
+        time.monotonic = self._real_monotonic
+        time.time = self._real_time
+        time.sleep = self._real_sleep
+
+        if self._wait is not None:
+            multiprocessing.synchronize.Condition.wait = self._wait
+            self._wait = None
+
+
+##############################################################################
+##############################################################################
+##
+## WORLD
+##
+##############################################################################
+##############################################################################
+
+
+##
+## robot: wheel travel per rotation (inches), rotations/s at 100% (about
+## 0.5 s per rotation at 70%), wheel spacing and how far ahead of the
+## axle the color sensor sits (inches), and motor spin-down (seconds)
+##
+INCHES_PER_ROTATION = 3.75
+MAX_RPS = 2.0/0.7
+TRACK = 4.75
+SENSOR_OFFSET = 2.5
+COAST = 0.08
+
+
+class ColorMap(object):
+    """
+    Floor colors (ev3dev2 color numbers) in inches, x east and y south
+    of the north west corner.  Later patches cover earlier ones
+    """
+
+    def __init__(self, default=6):
+        self.default = default
+        self.patches = []
+
+
+    def add_disc(self, x, y, radius, color):
+        self.patches.append(('disc', x, y, radius, color))
+
+
+    def add_rect(self, x, y, width, height, color):
+        self.patches.append(('rect', x, y, width, height, color))
+
+
+    def color_at(self, x, y):
+        for patch in reversed(self.patches):
+            if patch[0] == 'disc':
+                kind, px, py, radius, color = patch
+                if (x-px)**2+(y-py)**2 <= radius**2:
+                    return color
+
+            else:
+                kind, px, py, width, height, color = patch
+                if px <= x <= px+width and py <= y <= py+height:
+                    return color
+
+        return self.default
+
+
+class World(object):
+    """
+    Pose of a differential drive robot in shared memory
+
+    Wheel speeds are piecewise constant, so the pose is integrated
+    exactly (along an arc) whenever the speeds change or it is read.
+    Heading is clockwise from north, like the gyro.
+    """
+
+    X = 0
+    Y = 1
+    THETA = 2
+    LEFT = 3
+    RIGHT = 4
+    T = 5
+    LEFT_DEG = 6
+    RIGHT_DEG = 7
+    GYRO_ZERO = 8
+    DISTANCE = 9
+    COMMANDS = 10
+
+    def __init__( self, clock, colors=None,
+                  inches_per_rotation=INCHES_PER_ROTATION,
+                  max_rps=MAX_RPS,
+                  track=TRACK,
+                  sensor_offset=SENSOR_OFFSET,
+                  coast=COAST ):
+        self.clock = clock
+        self.colors = colors if colors is not None else ColorMap()
+
+        self.inches_per_rotation = inches_per_rotation
+        self.max_rps = max_rps
+        self.track = track
+        self.sensor_offset = sensor_offset
+
+        ##
+        ## the gyro turn stops 5 degrees early to allow for the coast
+        ##
+        self.coast = coast
+
+        self._state = multiprocessing.RawArray('d', 11)
+        self._lock = multiprocessing.Lock()
+
+        self._state[self.T] = clock.monotonic()
+
+
+    def place(self, x, y, heading):
+        with self._lock:
+            s = self._state
+            s[self.X] = x
+            s[self.Y] = y
+            s[self.THETA] = math.radians(heading)
+            s[self.LEFT] = 0
+            s[self.RIGHT] = 0
+            s[self.T] = self.clock.monotonic()
+
+
+    def _integrate(self):
+        s = self._state
+        now = self.clock.monotonic()
+        dt = now-s[self.T]
+        s[self.T] = now
+
+        self._advance(dt)
+
+
+    def _advance(self, dt):
+        s = self._state
+
+        if dt <= 0:
+            return
+
+        k = self.max_rps/100.0
+        left_rps = s[self.LEFT]*k
+        right_rps = s[self.RIGHT]*k
+
+        s[self.LEFT_DEG] += left_rps*dt*360
+        s[self.RIGHT_DEG] += right_rps*dt*360
+
+        vl = left_rps*self.inches_per_rotation
+        vr = right_rps*self.inches_per_rotation
+
+        v = (vl+vr)/2.0
+        w = (vl-vr)/self.track
+
+        theta = s[self.THETA]
+
+        if abs(w) < 1e-9:
+            s[self.X] += v*math.sin(theta)*dt
+            s[self.Y] -= v*math.cos(theta)*dt
+
+        else:
+            theta_1 = theta+w*dt
+            s[self.X] += v/w*(math.cos(theta)-math.cos(theta_1))
+            s[self.Y] += v/w*(math.sin(theta)-math.sin(theta_1))
+            s[self.THETA] = theta_1
+
+        s[self.DISTANCE] += abs(v)*dt
+
+
+    def drive(self, left, right):
+        """
+        Set wheel speeds (percent), returns the command number
+        """
+        with self._lock:
+            self._integrate()
+            s = self._state
+
+            if left == 0 and right == 0:
+                ##
+                ## spinning down linearly covers half the distance the
+                ## old speeds would have in the same time
+                ##
+                self._advance(self.coast/2.0)
+
+            s[self.LEFT] = left
+            s[self.RIGHT] = right
+            s[self.COMMANDS] += 1
+
+            return s[self.COMMANDS]
+
+
+    def commands(self):
+        return self._state[self.COMMANDS]
+
+
+    def pose(self):
+        """
+        (x, y, heading degrees)
+        """
+        with self._lock:
+            self._integrate()
+            s = self._state
+            return (s[self.X], s[self.Y], math.degrees(s[self.THETA]))
+
+
+    def wheel_degrees(self):
+        with self._lock:
+            self._integrate()
+            return (self._state[self.LEFT_DEG], self._state[self.RIGHT_DEG])
+
+
+    def gyro(self):
+        x, y, heading = self.pose()
+        return int(round(heading-self._state[self.GYRO_ZERO]))
+
+
+    def reset_gyro(self):
+        x, y, heading = self.pose()
+        self._state[self.GYRO_ZERO] = heading
+
+
+    def color(self):
+        x, y, heading = self.pose()
+        theta = math.radians(heading)
+
+        return self.colors.color_at( x+self.sensor_offset*math.sin(theta),
+                                     y-self.sensor_offset*math.cos(theta) )
+
+
+    def distance(self):
+        with self._lock:
+            self._integrate()
+            return self._state[self.DISTANCE]
+
+
+##############################################################################
+##############################################################################
+##
+## EV3DEV2 / AGT STAND-INS
+##
+##############################################################################
+##############################################################################
+
+
+def _speed(value):
+    if value is None:
+        return 0.0
+
+    return float(getattr(value, 'percent', value))
+
+
+def _build_modules(world, events):
+
+    class LargeMotor(object):
+        def __init__(self, address=None):
+            self.address = address
+
+        @property
+        def position(self):
+            left, right = world.wheel_degrees()
+            return int(left if self.address == 'outB' else right)
+
+
+    class MoveTank(object):
+        def __init__(self, left_motor_port, right_motor_port, desc=None, motor_class=None):
+            self.left_motor = LargeMotor(left_motor_port)
+            self.right_motor = LargeMotor(right_motor_port)
+
+        def on(self, left_speed, right_speed):
+            world.drive(_speed(left_speed), _speed(right_speed))
+
+        def off(self, motors=None, brake=True):
+            world.drive(0, 0)
+
+        def on_for_seconds(self, left_speed, right_speed, seconds, brake=True, block=True):
+            command = world.drive(_speed(left_speed), _speed(right_speed))
+            end = time.monotonic()+seconds
+
+            def run_out():
+                ##
+                ## stop early if anyone else (e.g. the killswitch)
+                ## changes the motors meanwhile
+                ##
+                while time.monotonic() < end:
+                    if world.commands() != command:
+                        return
+                    time.sleep(min(0.02, max(0, end-time.monotonic())))
+
+                if world.commands() == command:
+                    world.drive(0, 0)
+
+            if block:
+                run_out()
+
+            else:
+                ##
+                ## the motor controller stops the motors on its own
+                ##
+                t = threading.Thread(target=run_out)
+                t.daemon = True
+                t.start()
+
+        def on_for_rotations(self, left_speed, right_speed, rotations, brake=True, block=True):
+            fastest = max(abs(_speed(left_speed)), abs(_speed(right_speed)))
+            if fastest == 0:
+                return
+
+            seconds = abs(rotations)/(fastest/100.0*world.max_rps)
+            sign = 1 if rotations >= 0 else -1
+
+            self.on_for_seconds(_speed(left_speed)*sign, _speed(right_speed)*sign, seconds, brake, block)
+
+        def on_for_degrees(self, left_speed, right_speed, degrees, brake=True, block=True):
+            self.on_for_rotations(left_speed, right_speed, degrees/360.0, brake, block)
+
+
+    class MoveSteering(MoveTank):
+        pass
+
+
+    class GyroSensor(object):
+        def __init__(self, address=None):
+            world.reset_gyro()
+
+        @property
+        def angle(self):
+            return world.gyro()
+
+        def reset(self):
+            world.reset_gyro()
+
+
+    class ColorSensor(object):
+        def __init__(self, address=None):
+            pass
+
+        @property
+        def color(self):
+            return world.color()
+
+
+    class TouchSensor(object):
+        def __init__(self, address=None):
+            self.is_pressed = False
+
+
+    class InfraredSensor(object):
+        def __init__(self, address=None):
+            self.proximity = 100
+
+
+    class Sound(object):
+        def speak(self, text, espeak_opts=None, volume=100, play_type=0):
+            print('[+] (sim) Sound: {}'.format(text))
+
+        def beep(self, args='', play_type=0):
+            pass
+
+
+    class AlexaGadget(object):
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def send_custom_event(self, namespace, name, payload):
+            events.put((namespace, name, payload))
+
+        def main(self):
+            pass
+
+
+    ev3dev2 = types.ModuleType('ev3dev2')
+
+    motor = types.ModuleType('ev3dev2.motor')
+    motor.LargeMotor = LargeMotor
+    motor.MoveTank = MoveTank
+    motor.MoveSteering = MoveSteering
+    motor.OUTPUT_A = 'outA'
+    motor.OUTPUT_B = 'outB'
+    motor.OUTPUT_C = 'outC'
+    motor.OUTPUT_D = 'outD'
+
+    sensor = types.ModuleType('ev3dev2.sensor')
+    sensor.INPUT_1 = 'in1'
+    sensor.INPUT_2 = 'in2'
+    sensor.INPUT_3 = 'in3'
+    sensor.INPUT_4 = 'in4'
+
+    lego = types.ModuleType('ev3dev2.sensor.lego')
+    lego.ColorSensor = ColorSensor
+    lego.GyroSensor = GyroSensor
+    lego.TouchSensor = TouchSensor
+    lego.InfraredSensor = InfraredSensor
+
+    sound = types.ModuleType('ev3dev2.sound')
+    sound.Sound = Sound
+
+    agt = types.ModuleType('agt')
+    agt.AlexaGadget = AlexaGadget
+
+    ev3dev2.motor = motor
+    ev3dev2.sensor = sensor
+    ev3dev2.sound = sound
+    sensor.lego = lego
+
+    return {
+        'ev3dev2' : ev3dev2,
+        'ev3dev2.motor' : motor,
+        'ev3dev2.sensor' : sensor,
+        'ev3dev2.sensor.lego' : lego,
+        'ev3dev2.sound' : sound,
+        'agt' : agt
+    }
+
+
+##############################################################################
+##############################################################################
+##
+## SIMULATOR
+##
+##############################################################################
+##############################################################################
+
+
+class Directive(object):
+    """
+    What agt hands to on_custom_ev3searchgadget_response
+    """
+
+    def __init__(self, payload):
+        self.payload = json.dumps(payload).encode('utf-8')
+
+
+class Simulator(object):
+    """
+    Installs the stand-ins (call install() before importing main) and
+    drives a gadget with directives as if they came from the skill
+    """
+
+    def __init__(self, speedup=100, colors=None):
+        self.clock = SimClock(speedup)
+        self.world = World(self.clock, colors)
+        self.events = multiprocessing.Queue()
+
+        self.received = []
+
+
+    def install(self):
+        self.clock.install()
+        sys.modules.update(_build_modules(self.world, self.events))
+
+
+    def place_on_grid(self, gadget):
+        """
+        Put the robot on the gadget's current grid node and heading
+        """
+        g, node, heading = gadget.walk_start()
+        spacing_ew, spacing_ns = g.spacing( gadget.data['coordinate_data']['grid_width'],
+                                            gadget.data['coordinate_data']['grid_height'] )
+        row, column = g.position(node)
+
+        self.world.place(column*spacing_ew, row*spacing_ns, heading*90)
+
+
+    def send(self, gadget, payload):
+        gadget.on_custom_ev3searchgadget_response(Directive(payload))
+
+
+    def poll(self):
+        while True:
+            try:
+                self.received.append(self.events.get_nowait())
+            except Exception:
+                break
+
+        return self.received
+
+
+    def run_until(self, done, limit):
+        """
+        Wait (simulated seconds) until done() is true, returns the
+        simulated time taken, or None on timeout
+        """
+        start = time.monotonic()
+
+        while time.monotonic()-start < limit:
+            self.poll()
+            if done():
+                return time.monotonic()-start
+
+            time.sleep(0.1)
+
+        return None
+
+
+def _mission(argv):
+    mission = argv[1] if len(argv) > 1 else 'walk_perimeter'
+    speedup = float(argv[2]) if len(argv) > 2 else 100
+    limit = float(argv[3]) if len(argv) > 3 else 1800
+    pattern = argv[4] if len(argv) > 4 else None
+
+    ##
+    ## 10 x 10 ft grid on a white floor, green subject on the east side
+    ##
+    colors = ColorMap(default=6)
+    colors.add_disc(120, 90, 4, 3)
+
+    sim = Simulator(speedup, colors)
+    sim.install()
+
+    import main
+
+    gadget = main.EV3SearchGadget()
+    sim.place_on_grid(gadget)
+
+    real = sim.clock._real_monotonic()
+
+    payload = {'intent' : mission}
+    if pattern is not None:
+        payload['pattern'] = pattern
+
+    sim.send(gadget, payload)
+
+    ##
+    ## the mission sets the search flag once it is running (in a forked
+    ## process for the walk), wait for that before waiting for it to
+    ## clear, or a slow start reads as a mission that is already over
+    ##
+    started = sim.run_until(lambda: gadget.control.search is True, limit)
+
+    elapsed = None
+    if started is not None:
+        elapsed = sim.run_until(lambda: gadget.control.search is not True, limit-started)
+
+    real = sim.clock._real_monotonic()-real
+
+    ##
+    ## let the last responses (e.g. after the killswitch) come in
+    ##
+    time.sleep(2)
+    x, y, heading = sim.world.pose()
+
+    if started is None:
+        print('[-] ({}) {} did not start within {:.0f} simulated seconds'.format(datetime.datetime.now(), mission, limit))
+
+    elif elapsed is None:
+        print('[-] ({}) {} still running after {:.0f} simulated seconds'.format(datetime.datetime.now(), mission, limit))
+    else:
+        print('[+] ({}) {} finished after {:.1f} simulated seconds ({:.1f} s real, {:.0f}x)'.format(
+            datetime.datetime.now(), mission, elapsed, real, elapsed/real if real > 0 else 0))
+
+    print('[+] Subject found: {}'.format(gadget.control.subject_found is True and sim.world.color() == gadget.data['default_color']))
+    print('[+] Final pose: x {:.1f} in, y {:.1f} in, heading {:.0f}, drove {:.1f} in'.format(x, y, heading%360, sim.world.distance()))
+    print('[+] Events: {}'.format([name for namespace, name, payload in sim.poll()]))
+
+    gadget.control.search = False
+    gadget.control.subject_found = True
+    gadget.shutdown()
+
+    for p in multiprocessing.active_children():
+        p.terminate()
+
+
+if __name__ == '__main__':
+    _mission(sys.argv)
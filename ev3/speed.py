@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+import math
+import multiprocessing
+
+
+##############################################################################
+##############################################################################
+##
+## SPEED CONTROLLER
+##
+##      search speed from the rate the color sensor is actually read at
+##
+##############################################################################
+##############################################################################
+
+
+class SpeedController(object):
+    """
+    Highest drive speed (percent) at which the color sensor still
+    leaves no gaps, given how many samples a second it is really
+    taking
+
+    Between two samples the tank must not move further than
+
+        - the sensor footprint, so the floor it reads is one unbroken
+          strip, nor
+        - the shortest stretch of subject a pass can cross (a chord of
+          the subject's disc, track_spacing/2 off its center) divided
+          by the hits the debounce needs, so a subject anywhere between
+          two lanes still gets enough samples to be confirmed
+
+    That distance times the sample rate is the fastest allowed
+    (inches/second).  update() picks the fastest speed, in steps of
+    10%, that the motion model says stays under it (choose() does the
+    same without publishing anything).  If the color sampling slows
+    down, the tank slows with it.  If sampling keeps up, the tank runs
+    up to max_speed.
+
+    The throughput is the sweep width (the footprint plus the subject's
+    diameter, the strip in which a subject is found) times the speed,
+    in square inches a second.  The figures are in shared memory, so
+    stats() works from any gadget process.
+    """
+
+    ##
+    ## published statistics (shared memory slots)
+    ##
+    S_RATE = 0
+    S_SPEED = 1
+    S_INCHES = 2
+    S_AREA = 3
+    S_UPDATES = 4
+    S_LIMITED = 5
+
+    def __init__( self, motion_model,
+                  inches_per_rotation=3.75,
+                  footprint=2.0,
+                  subject_radius=4.0,
+                  track_spacing=6.0,
+                  hits=3,
+                  min_speed=20,
+                  max_speed=100,
+                  step=10 ):
+        self.motion_model = motion_model
+        self.inches_per_rotation = inches_per_rotation
+        self.sweep_width = footprint+2*subject_radius
+        self.min_speed = min_speed
+        self.max_speed = max_speed
+        self.step = step
+
+        self.sample_spacing = self.spacing(footprint, subject_radius, track_spacing, hits)
+
+        self._shared = multiprocessing.RawArray('d', 6)
+
+
+    @staticmethod
+    def spacing(footprint, subject_radius, track_spacing, hits):
+        """
+        Longest distance (inches) allowed between two color samples
+        """
+        half = track_spacing/2.0
+
+        ##
+        ## lanes too far apart for every subject to be crossed are a
+        ## pattern problem, not a speed one ... use the diameter then
+        ##
+        if half < subject_radius:
+            chord = 2*math.sqrt(subject_radius*subject_radius-half*half)
+        else:
+            chord = 2*subject_radius
+
+        return min(footprint, chord/float(hits))
+
+
+    def inches_per_second(self, speed):
+        return self.inches_per_rotation/self.motion_model.seconds_per_rotation(speed)
+
+
+    def choose(self, rate):
+        """
+        Fastest speed (percent) that leaves no gaps with the color
+        sensor read rate times a second
+        """
+        limit = rate*self.sample_spacing
+
+        for speed in range(self.max_speed, self.min_speed-1, -self.step):
+            if self.inches_per_second(speed) <= limit:
+                return speed
+
+        return self.min_speed
+
+
+    def update(self, rate):
+        """
+        Speed (percent) for the next leg with the color sensor read
+        rate times a second, and the figures behind it published
+        """
+        speed = self.choose(rate)
+        inches = self.inches_per_second(speed)
+
+        s = self._shared
+        s[self.S_RATE] = rate
+        s[self.S_SPEED] = speed
+        s[self.S_INCHES] = inches
+        s[self.S_AREA] = inches*self.sweep_width
+        s[self.S_UPDATES] += 1
+
+        if speed < self.max_speed:
+            s[self.S_LIMITED] += 1
+
+        return speed
+
+
+    def reset(self):
+        """
+        Start counting legs over, e.g. for a new search
+        """
+        self._shared[self.S_UPDATES] = 0
+        self._shared[self.S_LIMITED] = 0
+
+
+    def stats(self):
+        """
+        Last sample rate, speed (percent and inches/second), area swept
+        per second (square inches) and how many legs ran below
+        max_speed because of the sample rate
+        """
+        s = self._shared
+
+        return {
+            'rate' : s[self.S_RATE],
+            'speed' : int(s[self.S_SPEED]),
+            'inches_per_second' : s[self.S_INCHES],
+            'area_per_second' : s[self.S_AREA],
+            'sample_spacing' : self.sample_spacing,
+            'max_inches_per_second' : s[self.S_RATE]*self.sample_spacing,
+            'updates' : int(s[self.S_UPDATES]),
+            'limited' : int(s[self.S_LIMITED])
+        }
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+##
+## Parallel parameter sweep for the search tuning constants
+##
+## Every combination of the values below is run through the Monte Carlo
+## robot of bench_search.py (same subjects for every combination), and
+## once without a subject to measure how much of the field it sweeps
+## within the time limit and how soon it has swept 90% of it.  The
+## results are ranked by how often the subject is found, then by the
+## mean time to find it, then by the time to 90% coverage, and the
+## winner is written to tuning.json, which the gadget loads at startup
+## (main.py).
+##
+## usage: python3 sweep.py [trials] [output]
+##
+
+import os
+import sys
+import json
+import datetime
+import itertools
+import multiprocessing
+
+import bench_search
+
+
+##
+## the values to try, keyed by the gadget's data keys (main.py)
+##
+GRID = [
+    ('spiral_first', (1, 2)),
+    ('spiral_grow', (1, 2, 3)),
+    ('default_bowstearn_speed', (50, 70, 90)),
+    ('default_portstarboard_speed', (30, 50, 70))
+]
+
+TUNING_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tuning.json')
+
+
+def combinations(grid=GRID):
+    """
+    One params dict per combination of the grid values
+    """
+    keys = [k for k, values in grid]
+
+    for values in itertools.product(*[v for k, v in grid]):
+        yield dict(zip(keys, values))
+
+
+def rank(summary):
+    """
+    Sort key: most finds first, then the quickest on average, then the
+    quickest to cover the field
+    """
+    mean = summary['mean']
+    if mean is None:
+        mean = float('inf')
+
+    covered = summary['coverage_time']
+    if covered is None:
+        covered = float('inf')
+
+    return (-summary['found_rate'], mean, covered, summary['p95'] or float('inf'))
+
+
+def sweep( trials=300,
+           grid=GRID,
+           strategy='spiral',
+           field=bench_search.FIELD,
+           radius=bench_search.SUBJECT_RADIUS,
+           limit=bench_search.TIME_LIMIT,
+           seed=1,
+           processes=None,
+           chunk=100 ):
+    """
+    Returns [(summary, params)], best first
+    """
+    candidates = list(combinations(grid))
+
+    jobs = []
+    owner = []
+    for i, params in enumerate(candidates):
+        for start in range(0, trials, chunk):
+            jobs.append((strategy, seed+start, min(chunk, trials-start), field, radius, limit, params))
+            owner.append(i)
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        ##
+        ## a small chunksize keeps every core busy, the spiral trials
+        ## vary a lot in length
+        ##
+        chunks = pool.imap(bench_search.run_trials, jobs, 4)
+        results = [[] for params in candidates]
+        for i, chunk_results in zip(owner, chunks):
+            results[i].extend(chunk_results)
+
+        coverage = pool.map( bench_search.run_coverage,
+                             [(strategy, field, radius, limit, params) for params in candidates] )
+
+    finally:
+        pool.close()
+        pool.join()
+
+    ranked = []
+    for r, (swept, swept_time), params in zip(results, coverage, candidates):
+        summary = bench_search.summarize(r)
+        summary['coverage'] = swept
+        summary['coverage_time'] = swept_time
+
+        ranked.append((summary, params))
+    ranked.sort(key=lambda item: rank(item[0]))
+
+    return ranked
+
+
+def write_tuning(path, params, summary, trials):
+    """
+    Winning params plus how they scored, as loaded by the gadget
+    """
+    tuning = dict(params)
+    tuning['_sweep'] = {
+        'date' : str(datetime.datetime.now()),
+        'trials' : trials,
+        'found_rate' : round(summary['found_rate'], 4),
+        'mean' : None if summary['mean'] is None else round(summary['mean'], 1),
+        'p95' : None if summary['p95'] is None else round(summary['p95'], 1),
+        'coverage' : round(summary['coverage'], 4),
+        'coverage_time' : None if summary['coverage_time'] is None else round(summary['coverage_time'], 1)
+    }
+
+    with open(path, 'w') as f:
+        json.dump(tuning, f, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    trials = 300
+    if len(sys.argv) > 1:
+        trials = int(sys.argv[1])
+
+    path = TUNING_FILE
+    if len(sys.argv) > 2:
+        path = sys.argv[2]
+
+    s = datetime.datetime.now()
+    ranked = sweep(trials)
+
+    print('[+] {} combinations x {} trials ({:.1f} s on {} cores)'.format(
+        len(ranked), trials, (datetime.datetime.now()-s).total_seconds(), multiprocessing.cpu_count()))
+
+    print('[+] {:>5s} {:>5s} {:>5s} {:>5s} {:>7s} {:>8s} {:>8s} {:>8s} {:>8s}'.format(
+        'first', 'grow', 'drive', 'turn', 'found', 'mean s', 'p95 s', 'covered', '90% s'))
+
+    for summary, params in ranked[:10]:
+        print('[+] {:>5d} {:>5d} {:>5d} {:>5d} {:>6.1f}% {:>8s} {:>8s} {:>7.1f}% {:>8s}'.format(
+            params['spiral_first'], params['spiral_grow'], params['default_bowstearn_speed'],
+            params['default_portstarboard_speed'],
+            summary['found_rate']*100, bench_search._fmt(summary['mean']), bench_search._fmt(summary['p95']),
+            summary['coverage']*100, bench_search._fmt(summary['coverage_time'])))
+
+    summary, params = ranked[0]
+    write_tuning(path, params, summary, trials)
+
+    print('[+] Wrote {}'.format(path))
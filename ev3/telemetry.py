@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import ctypes
+import struct
+import multiprocessing
+
+
+##############################################################################
+##############################################################################
+##
+## TELEMETRY
+##
+##      fixed capacity mission telemetry shared by all gadget processes
+##
+##############################################################################
+##############################################################################
+
+
+##
+## record kinds
+##
+LAUNCH = 1
+DIRECTIVE = 2
+MOVE = 3
+TURN = 4
+SET_GRID = 5
+START_SEARCH = 6
+WALK_PERIMETER = 7
+PERIMETER_WALK = 8
+SEARCH_LEG = 9
+COLOR_SEARCH = 10
+PAUSE = 11
+KILLSWITCH = 12
+CLOSE_SKILL = 13
+EXPIRE = 14
+GO_TO = 15
+TURN_CONTROL = 16
+CALIBRATE_TURNS = 17
+PIPELINE = 18
+SUBJECT_FOUND = 19
+SEARCH_SPEED = 20
+
+KIND_NAMES = {
+    LAUNCH : 'launch',
+    DIRECTIVE : 'directive',
+    MOVE : 'move',
+    TURN : 'turn',
+    SET_GRID : 'set_grid',
+    START_SEARCH : 'start_search',
+    WALK_PERIMETER : 'start_walk_perimeter',
+    PERIMETER_WALK : 'walk_perimeter_function',
+    SEARCH_LEG : 'search_leg',
+    COLOR_SEARCH : 'color_search',
+    PAUSE : 'pause',
+    KILLSWITCH : 'killswitch',
+    CLOSE_SKILL : 'close_skill',
+    EXPIRE : 'expire',
+    GO_TO : 'go_to_position',
+    TURN_CONTROL : 'turn_control',
+    CALIBRATE_TURNS : 'calibrate_turns',
+    PIPELINE : 'pipeline',
+    SUBJECT_FOUND : 'subject_found',
+    SEARCH_SPEED : 'search_speed'
+}
+
+##
+## intents are logged by number instead of storing the whole payload
+##
+INTENTS = (
+    'unknown',
+    'launch',
+    'move_robot',
+    'turn_robot',
+    'start_search',
+    'walk_perimeter',
+    'pause_robot',
+    'killswitch',
+    'stop_cancel',
+    'expired',
+    'set_grid',
+    'go_to_position',
+    'calibrate_turns'
+)
+
+
+def intent_code(intent):
+    try:
+        return INTENTS.index(intent)
+    except ValueError:
+        return 0
+
+
+##
+## on-disk record: seq, kind, start, end, a, b, c (little endian, 36 bytes)
+##
+RECORD_FORMAT = '<IB3xddfff'
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+
+class Record(ctypes.Structure):
+    _fields_ = [
+        ('seq', ctypes.c_uint32),
+        ('kind', ctypes.c_uint8),
+        ('start', ctypes.c_double),
+        ('end', ctypes.c_double),
+        ('a', ctypes.c_float),
+        ('b', ctypes.c_float),
+        ('c', ctypes.c_float)
+    ]
+
+
+class Span(object):
+    """
+    An open record, held by the caller until end()
+    """
+    __slots__ = ('kind', 'start', 'a', 'b', 'c')
+
+    def __init__(self, kind, start, a, b, c):
+        self.kind = kind
+        self.start = start
+        self.a = a
+        self.b = b
+        self.c = c
+
+
+class TelemetryRing(object):
+    """
+    Fixed capacity ring of compact telemetry records in shared memory
+
+    Every gadget process writes into the same array of structs, so
+    records from forked workers are no longer lost with the worker.
+    Records are flushed to an append-only binary log on the brick,
+    either when asked to or when the ring is about to wrap, so a long
+    mission runs in constant memory.
+
+    Each record carries its kind, start/end time and three numeric
+    fields whose meaning depends on the kind (e.g. speed/rotations for
+    a move, signed degrees for a turn).
+
+    If the log can't be written, a full ring overwrites its oldest
+    records (counted as dropped) and the writers only try the log
+    again every retry_interval seconds, instead of on every record.
+    """
+
+    def __init__(self, path, capacity=256, retry_interval=5.0):
+        self.path = path
+        self.capacity = capacity
+        self.retry_interval = retry_interval
+
+        self._ring = multiprocessing.RawArray(Record, capacity)
+
+        ##
+        ## next sequence number to hand out, and the first one not yet
+        ## written to the log
+        ##
+        self._head = multiprocessing.RawValue('L', 0)
+        self._flushed = multiprocessing.RawValue('L', 0)
+        self._dropped = multiprocessing.RawValue('L', 0)
+
+        ##
+        ## failed flushes, and when (time.monotonic()) a full ring may
+        ## try the log again
+        ##
+        self._errors = multiprocessing.RawValue('L', 0)
+        self._retry_at = multiprocessing.RawValue('d', 0.0)
+
+        self._reserve_lock = multiprocessing.Lock()
+        self._flush_lock = multiprocessing.Lock()
+
+
+    def begin(self, kind, a=0, b=0, c=0):
+        return Span(kind, time.time(), a, b, c)
+
+
+    def end(self, span, a=None, b=None, c=None):
+        if span is None:
+            return
+
+        if a is not None:
+            span.a = a
+        if b is not None:
+            span.b = b
+        if c is not None:
+            span.c = c
+
+        self._write(span.kind, span.start, time.time(), span.a, span.b, span.c)
+
+
+    def record(self, kind, a=0, b=0, c=0):
+        now = time.time()
+        self._write(kind, now, now, a, b, c)
+
+
+    def span(self, kind, start, end, a=0, b=0, c=0):
+        """
+        A record whose start/end (time.time()) were measured elsewhere
+        """
+        self._write(kind, start, end, a, b, c)
+
+
+    def _write(self, kind, start, end, a, b, c):
+        with self._reserve_lock:
+            seq = self._head.value
+            self._head.value = seq+1
+
+        ##
+        ## about to overwrite a record that never made it to disk
+        ##
+        if seq-self._flushed.value >= self.capacity:
+            if time.monotonic() >= self._retry_at.value:
+                self.flush()
+
+            if seq-self._flushed.value >= self.capacity:
+                ##
+                ## the log is not taking records ... give up on the
+                ## oldest one so the ring keeps going
+                ##
+                with self._flush_lock:
+                    lost = seq-self.capacity+1-self._flushed.value
+
+                    if lost > 0:
+                        self._flushed.value += lost
+                        self._dropped.value += lost
+
+        r = self._ring[seq%self.capacity]
+        r.kind = kind
+        r.start = start
+        r.end = end
+        r.a = a
+        r.b = b
+        r.c = c
+
+        ##
+        ## seq is written last (stored +1 so 0 means empty), the flusher
+        ## only takes records whose seq matches
+        ##
+        r.seq = seq+1
+
+
+    def flush(self):
+        """
+        Append every completed record not yet on disk to the log file.
+        Returns the number of records written
+        """
+        with self._flush_lock:
+            start = self._flushed.value
+            head = self._head.value
+
+            chunks = []
+            seq = start
+            while seq < head:
+                r = self._ring[seq%self.capacity]
+
+                if r.seq != seq+1:
+                    ##
+                    ## reserved but not written yet (or already reused)
+                    ##
+                    if seq+self.capacity < head:
+                        seq += 1
+                        continue
+                    break
+
+                chunks.append(struct.pack(RECORD_FORMAT, seq, r.kind, r.start, r.end, r.a, r.b, r.c))
+                seq += 1
+
+            if chunks:
+                try:
+                    with open(self.path, 'ab') as f:
+                        f.write(b''.join(chunks))
+
+                except Exception as e:
+                    exc_type, exc_obj, exc_tb = sys.exc_info()
+                    print('[-] Telemetry flush Error: {} on line {}'.format(e, exc_tb.tb_lineno))
+
+                    self._errors.value += 1
+                    self._retry_at.value = time.monotonic()+self.retry_interval
+                    return 0
+
+            self._flushed.value = seq
+
+            return len(chunks)
+
+
+    def recent(self, n=None):
+        """
+        The last n records still in memory, oldest first, as tuples of
+        (seq, kind, start, end, a, b, c)
+        """
+        head = self._head.value
+        if n is None:
+            n = self.capacity
+
+        n = min(n, self.capacity, head)
+
+        records = []
+        for seq in range(head-n, head):
+            r = self._ring[seq%self.capacity]
+            if r.seq == seq+1:
+                records.append((seq, r.kind, r.start, r.end, r.a, r.b, r.c))
+
+        return records
+
+
+    def stats(self):
+        return {
+            'records' : self._head.value,
+            'flushed' : self._flushed.value,
+            'dropped' : self._dropped.value,
+            'flush_errors' : self._errors.value,
+            'capacity' : self.capacity
+        }
+
+
+def read_log(path):
+    """
+    Yields (seq, kind name, start, end, a, b, c) from a telemetry log
+    """
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(RECORD_SIZE)
+            if len(chunk) < RECORD_SIZE:
+                break
+
+            seq, kind, start, end, a, b, c = struct.unpack(RECORD_FORMAT, chunk)
+            yield (seq, KIND_NAMES.get(kind, kind), start, end, a, b, c)
+
+
+if __name__ == '__main__':
+    ##
+    ## dump a telemetry log: python3 telemetry.py [path]
+    ##
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'telemetry.bin')
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+
+    for seq, kind, start, end, a, b, c in read_log(path):
+        print('{:8d} {:24s} {:.3f} {:8.3f}s {:10.3f} {:10.3f} {:10.3f}'.format(seq, kind, start, end-start, a, b, c))
@@ -0,0 +1,8 @@
+import os
+import sys
+
+##
+## the gadget modules import each other by name (they run from ev3/ on
+## the brick), so the tests need ev3/ on the path
+##
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
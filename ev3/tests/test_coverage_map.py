@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+import math
+import itertools
+import unittest
+
+import patterns
+from coverage_map import CoverageMap, greedy_legs, numpy
+
+
+@unittest.skipIf(numpy is None, 'the coverage map needs numpy')
+class CoverageMapTest(unittest.TestCase):
+
+    def setUp(self):
+        ##
+        ## 40 x 20 inches in 2 inch cells
+        ##
+        self.map = CoverageMap(40, 20, cell=2.0, subject_radius=4.0, p_detect=0.9, batch=4)
+
+    def test_starts_uniform(self):
+        self.assertEqual((self.map.columns, self.map.rows), (20, 10))
+        self.assertAlmostEqual(self.map.p.sum(), 1.0)
+        self.assertEqual(self.map.coverage(), 0.0)
+
+    def test_cells_within_the_subject_radius(self):
+        x, y = 9.0, 11.0
+        column, row = int(x//2), int(y//2)
+
+        expected = [ r*20+c for r in range(10) for c in range(20)
+                     if math.hypot(c-column, r-row)*2.0 <= 4.0 ]
+
+        self.assertEqual(list(self.map.cells(numpy.array([x]), numpy.array([y]))), expected)
+
+        ##
+        ## off the field on the north west corner
+        ##
+        self.assertEqual(list(self.map.cells(numpy.array([0.5]), numpy.array([0.5]))), [0, 1, 2, 20, 21, 40])
+
+    def test_a_miss_moves_the_probability_elsewhere(self):
+        looked = self.map.cells(numpy.array([9.0]), numpy.array([11.0]))
+        before = self.map.p[0]
+
+        self.map.sample(9.0, 11.0)
+        self.map.flush()
+
+        p = self.map.p
+        self.assertAlmostEqual(p.sum(), 1.0)
+        self.assertGreater(p[0], before)
+        self.assertAlmostEqual(p[looked[0]]/p[0], 0.1)
+        self.assertEqual(int(self.map.seen.sum()), len(looked))
+        self.assertEqual(self.map.stats()['samples'], 1)
+
+    def test_standing_still_is_one_look(self):
+        for i in range(12):
+            self.map.sample(9.0, 11.0)
+
+        self.map.flush()
+
+        self.assertEqual(int(self.map.seen.max()), 1)
+        self.assertEqual(self.map.stats()['flushes'], 3)
+
+        ##
+        ## moving on by a cell is another look
+        ##
+        self.map.sample(11.0, 11.0)
+        self.map.flush()
+        self.assertEqual(int(self.map.seen.max()), 2)
+
+    def test_next_leg_heads_for_unseen_floor(self):
+        ##
+        ## everything west of x = 20 already seen
+        ##
+        for x, y in itertools.product(range(1, 20, 2), range(1, 20, 2)):
+            self.map.sample(x, y)
+        self.map.flush()
+
+        turn, length, gain = self.map.next_leg(20.0, 10.0, 0, lengths=(6, 12))
+        self.assertEqual(turn, 90)
+        self.assertGreater(gain, 0)
+
+        tx, ty = self.map.most_likely()
+        self.assertGreater(tx, 20)
+
+        ##
+        ## no leg off the field: facing north from the north edge
+        ##
+        leg = self.map.next_leg(20.0, 1.0, 0, turns=(0,))
+        self.assertIsNone(leg)
+
+    def test_greedy_legs(self):
+        legs = list(itertools.islice(greedy_legs(self.map, (20.0, 10.0, 0), lengths=(6, 12)), 10))
+
+        self.assertTrue(all(kind in (patterns.TURN, patterns.DRIVE) for kind, value in legs))
+        self.assertTrue(any(kind == patterns.DRIVE for kind, value in legs))
+
+        ##
+        ## each leg is planned from where the one before ends, so the
+        ## drives stay on the field
+        ##
+        x, y, heading = 20.0, 10.0, 0
+        for kind, value in legs:
+            if kind == patterns.TURN:
+                heading = (heading+value)%360
+            else:
+                h = math.radians(heading)
+                x += value*3.75*math.sin(h)
+                y -= value*3.75*math.cos(h)
+
+                self.assertTrue(-1e-6 <= x <= 40+1e-6 and -1e-6 <= y <= 20+1e-6, (x, y))
+
+
+if __name__ == '__main__':
+    unittest.main()
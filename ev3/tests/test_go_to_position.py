@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+##
+## Go to position in the simulator: the position numbers set_grid takes
+## (0 north west ... 8 south east) end up at that corner, side or center
+## of the grid, whatever its resolution
+##
+## As in test_killswitch.py, the simulated gadget runs in a child python
+##
+
+import os
+import sys
+import json
+import subprocess
+import unittest
+
+EV3 = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def _child(columns, rows, speedup=20):
+    sys.path.insert(0, EV3)
+
+    import time
+    import multiprocessing
+
+    import sim
+
+    s = sim.Simulator(speedup)
+    s.install()
+
+    import main
+
+    gadget = main.EV3SearchGadget()
+
+    ##
+    ## at the center of the grid, heading north
+    ##
+    coordinates = gadget.data['coordinate_data']
+    coordinates['grid_columns'] = columns
+    coordinates['grid_rows'] = rows
+    coordinates.clear_coverage(gadget.search_grid().edges)
+    coordinates.update(current_grid_position=gadget.search_grid().cardinal_node(4), heading=0)
+
+    s.place_on_grid(gadget)
+
+    poses = []
+    for position in (8, 1, 3):
+        s.send(gadget, {'intent' : 'go_to_position', 'position' : position})
+
+        start = time.monotonic()
+        while time.monotonic()-start < 120:
+            if [name for namespace, name, payload in s.poll() if name == 'EV3ResponseAfterGoToPosition'][len(poses):]:
+                break
+            time.sleep(0.1)
+
+        poses.append(s.world.pose())
+
+    gadget.shutdown()
+
+    for p in multiprocessing.active_children():
+        p.terminate()
+
+    print(json.dumps(poses))
+
+
+class GoToPositionTest(unittest.TestCase):
+
+    def go(self, columns, rows):
+        out = subprocess.run( [sys.executable, os.path.abspath(__file__), '--child', str(columns), str(rows)],
+                              cwd=EV3,
+                              stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT,
+                              universal_newlines=True,
+                              timeout=300 ).stdout
+
+        return json.loads(out.strip().splitlines()[-1])
+
+    def check(self, poses):
+        ##
+        ## 10 x 10 ft grid: south east corner, north side, west side
+        ##
+        for (x, y, heading), (ex, ey) in zip(poses, [(120, 120), (60, 0), (0, 60)]):
+            self.assertLess(abs(x-ex), 4)
+            self.assertLess(abs(y-ey), 4)
+
+    def test_3x3(self):
+        self.check(self.go(3, 3))
+
+    def test_5x5(self):
+        self.check(self.go(5, 5))
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        _child(int(sys.argv[2]), int(sys.argv[3]))
+    else:
+        unittest.main()
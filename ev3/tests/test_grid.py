@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import grid
+from grid import GridGraph, NORTH, EAST, SOUTH, WEST
+
+
+SIZES = ((2, 2), (3, 3), (5, 3), (4, 7), (11, 11))
+
+
+def expected_neighbour(g, node, heading):
+    """
+    Neighbour worked out from the row and column, one node at a time
+    """
+    r, c = divmod(node, g.columns)
+    dr, dc = ((-1, 0), (0, 1), (1, 0), (0, -1))[heading]
+    r += dr
+    c += dc
+
+    if 0 <= r < g.rows and 0 <= c < g.columns:
+        return r*g.columns+c
+
+    return -1
+
+
+class GridGraphTest(unittest.TestCase):
+
+    def test_adjacency(self):
+        for columns, rows in SIZES:
+            g = GridGraph(columns, rows)
+
+            for node in range(g.nodes):
+                for heading in range(4):
+                    self.assertEqual(g.neighbour(node, heading), expected_neighbour(g, node, heading),
+                                     (columns, rows, node, heading))
+
+                self.assertEqual(g.degree(node), len(g.neighbours(node)))
+
+    def test_edge_ids(self):
+        for columns, rows in SIZES:
+            g = GridGraph(columns, rows)
+            seen = set()
+
+            for node in range(g.nodes):
+                for heading, other in g.neighbours(node):
+                    edge = g.edge(node, heading)
+
+                    ##
+                    ## the same id from either end, and back again
+                    ##
+                    self.assertEqual(edge, g.edge(other, grid.complement(heading)))
+                    self.assertIn(g.edge_nodes(edge), ((node, heading, other), (other, grid.complement(heading), node)))
+                    seen.add(edge)
+
+            self.assertEqual(seen, set(range(g.edges)))
+            self.assertEqual(sum(g.is_perimeter_edge(e) for e in range(g.edges)), g.perimeter_edges)
+            self.assertEqual(g.edge(0, NORTH), -1)
+            self.assertEqual(g.edge(0, WEST), -1)
+
+    def test_3x3_matches_the_original_grid(self):
+        g = GridGraph()
+
+        self.assertEqual(g.neighbours(4), [(NORTH, 1), (EAST, 5), (SOUTH, 7), (WEST, 3)])
+        self.assertEqual([g.cardinal_node(p) for p in range(9)], list(range(9)))
+        self.assertEqual(g.describe(7), 'south')
+        self.assertEqual([n for n in range(9) if not g.is_perimeter(n)], [4])
+
+    def test_cardinal_nodes_on_a_larger_grid(self):
+        g = GridGraph(5, 5)
+
+        self.assertEqual([g.cardinal_node(p) for p in range(9)], [0, 2, 4, 10, 12, 14, 20, 22, 24])
+        self.assertEqual(g.describe(12), 'center')
+        self.assertEqual(g.describe(6), 'row 1 column 1')
+
+    def test_for_field(self):
+        ##
+        ## 10 ft at most 12 inches apart: 11 nodes, 12 inches apart
+        ##
+        g = GridGraph.for_field(10, 10, 12)
+        self.assertEqual((g.columns, g.rows), (11, 11))
+        self.assertEqual(g.spacing(10, 10), (12.0, 12.0))
+
+        ##
+        ## not a whole number of spacings: one more node, closer together
+        ##
+        g = GridGraph.for_field(10, 5, 25)
+        self.assertEqual((g.columns, g.rows), (6, 4))
+        self.assertLessEqual(max(g.spacing(10, 5)), 25)
+
+        g = GridGraph.for_field(1, 1, 100)
+        self.assertEqual((g.columns, g.rows), (2, 2))
+
+    def test_too_small(self):
+        with self.assertRaises(ValueError):
+            GridGraph(1, 3)
+
+    def test_turns(self):
+        self.assertEqual(grid.turn_angle(NORTH, EAST), 90)
+        self.assertEqual(grid.turn_angle(NORTH, WEST), -90)
+        self.assertEqual(grid.turn_angle(EAST, WEST), 180)
+        self.assertEqual(grid.turn_angle(SOUTH, SOUTH), 0)
+        self.assertEqual(grid.complement(WEST), EAST)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+##
+## Killswitch in the middle of a perimeter walk turn, in the simulator
+##
+## The simulator patches time and ev3dev2 for the whole interpreter, so
+## the scenario runs in a child python (this file with --child) and
+## reports back as JSON on its last line
+##
+
+import os
+import sys
+import json
+import subprocess
+import unittest
+
+EV3 = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def _child(speedup=5):
+    sys.path.insert(0, EV3)
+
+    import time
+    import multiprocessing
+
+    import sim
+
+    s = sim.Simulator(speedup)
+    s.install()
+
+    import main
+
+    gadget = main.EV3SearchGadget()
+    s.place_on_grid(gadget)
+
+    world = s.world
+    state = world._state
+
+    def turning():
+        return state[world.LEFT]*state[world.RIGHT] < 0
+
+    s.send(gadget, {'intent' : 'walk_perimeter'})
+
+    ##
+    ## wait for the walker to be half way through a turn
+    ##
+    start = time.monotonic()
+    while not turning() and time.monotonic()-start < 120:
+        time.sleep(0.01)
+
+    mid_turn = turning()
+    time.sleep(0.2)
+
+    s.send(gadget, {'intent' : 'killswitch'})
+
+    ##
+    ## the motors are off a few ms after receipt ... from then on the
+    ## wheels must not turn, whatever the walker does next
+    ##
+    time.sleep(0.1)
+    distance = world.distance()
+    left, right = world.wheel_degrees()
+
+    time.sleep(20)
+
+    result = {
+        'mid_turn' : mid_turn,
+        'moved' : world.distance()-distance,
+        'wheels' : [abs(a-b) for a, b in zip(world.wheel_degrees(), (left, right))],
+        'speeds' : [state[world.LEFT], state[world.RIGHT]],
+        'killswitch' : [payload for namespace, name, payload in s.poll() if name == 'EV3ResponseAfterKillSwitch']
+    }
+
+    gadget.control.search = False
+    gadget.shutdown()
+
+    for p in multiprocessing.active_children():
+        p.terminate()
+
+    print(json.dumps(result))
+
+
+class HaltTest(unittest.TestCase):
+
+    def setUp(self):
+        sys.path.insert(0, EV3)
+
+        from control import MotionCompletion
+        from motor_worker import MotorWorker
+
+        self.motion = MotionCompletion()
+        self.worker = MotorWorker(self.motion, tank_factory=None)
+
+    def test_motion_begun_after_interrupt_is_halted(self):
+        token = self.motion.begin()
+        self.motion.interrupt()
+
+        self.assertEqual(self.motion.wait(token, timeout=1), self.motion.INTERRUPTED)
+
+        token = self.motion.begin()
+        self.assertFalse(self.motion.running(token))
+        self.assertEqual(self.motion.wait(token, timeout=1), self.motion.HALTED)
+
+        self.motion.resume()
+
+        token = self.motion.begin()
+        self.assertTrue(self.motion.running(token))
+
+    def test_worker_refuses_jobs_while_halted(self):
+        self.motion.interrupt()
+
+        token = self.motion.begin()
+        job = self.worker.submit('drive', token=token, rotations=10)
+
+        self.assertEqual(self.worker.state(job), self.worker.CANCELLED)
+        self.assertTrue(self.worker._queue.empty())
+
+        self.motion.resume()
+
+        job = self.worker.submit('drive', token=self.motion.begin(), rotations=10)
+        self.assertEqual(self.worker.state(job), self.worker.SUBMITTED)
+
+
+class KillswitchMidTurnTest(unittest.TestCase):
+
+    def test_wheels_stay_stopped(self):
+        out = subprocess.run( [sys.executable, os.path.abspath(__file__), '--child'],
+                              cwd=EV3,
+                              stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT,
+                              universal_newlines=True,
+                              timeout=300 ).stdout
+
+        result = json.loads(out.strip().splitlines()[-1])
+
+        self.assertTrue(result['mid_turn'])
+        self.assertLess(result['moved'], 0.1)
+        self.assertLess(max(result['wheels']), 1)
+        self.assertEqual(result['speeds'], [0, 0])
+
+        self.assertEqual(len(result['killswitch']), 1)
+        self.assertTrue(result['killswitch'][0]['deadline_met'])
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['--child']:
+        _child()
+    else:
+        unittest.main()
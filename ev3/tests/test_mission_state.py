@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import unittest
+import multiprocessing
+
+from mission_state import MissionState
+
+
+class MissionStateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.state = MissionState( { 'current_grid_position' : 4,
+                                     'heading' : 0,
+                                     'grid_width' : 120.0,
+                                     'last_seen' : None },
+                                   capacity=64,
+                                   edges=12 )
+
+    def test_fields_read_back_as_given(self):
+        self.assertEqual(self.state['current_grid_position'], 4)
+        self.assertIsInstance(self.state['current_grid_position'], int)
+        self.assertEqual(self.state['grid_width'], 120.0)
+        self.assertIsNone(self.state['last_seen'])
+
+        self.state['last_seen'] = 3
+        self.assertEqual(self.state.get('last_seen'), 3)
+        self.assertEqual(self.state.get('missing', 'default'), 'default')
+
+        with self.assertRaises(KeyError):
+            self.state['missing'] = 1
+
+    def test_update_with_expected_version(self):
+        version = self.state.snapshot()['version']
+
+        self.assertEqual(self.state.update(expected=version, heading=1, current_grid_position=5), version+1)
+
+        ##
+        ## stale: someone wrote since that snapshot
+        ##
+        self.assertIsNone(self.state.update(expected=version, heading=2))
+
+        snapshot = self.state.snapshot()
+        self.assertEqual(snapshot['heading'], 1)
+        self.assertEqual(snapshot['current_grid_position'], 5)
+        self.assertEqual(snapshot['version'], version+1)
+
+    def test_cover(self):
+        self.state.cover(3)
+        self.state.cover(3)
+        self.state.cover(11)
+
+        self.assertTrue(self.state.covered(3))
+        self.assertFalse(self.state.covered(4))
+        self.assertEqual(self.state.snapshot()['covered'], 2)
+
+        for edge in (-1, 12):
+            with self.assertRaises(IndexError):
+                self.state.cover(edge)
+
+    def test_clear_coverage_resizes_in_place(self):
+        self.state.cover(3)
+        self.state.clear_coverage(40)
+
+        self.assertEqual(self.state.edges, 40)
+        self.assertFalse(self.state.covered(3))
+        self.assertEqual(self.state.snapshot()['covered'], 0)
+
+        self.state.cover(39)
+        self.assertTrue(self.state.covered(39))
+
+        with self.assertRaises(ValueError):
+            self.state.clear_coverage(65)
+
+        with self.assertRaises(ValueError):
+            MissionState({'heading' : 0}, capacity=8, edges=9)
+
+    def test_forked_process_sees_a_new_grid(self):
+        ##
+        ## forked before the grid grows, like a walker that outlives a
+        ## set_grid
+        ##
+        resized = multiprocessing.Event()
+        result = multiprocessing.RawValue('i', 0)
+
+        def walker():
+            resized.wait(5)
+
+            self.state.cover(30)
+            result.value = self.state.edges
+
+        p = multiprocessing.Process(target=walker)
+        p.start()
+
+        self.state.clear_coverage(40)
+        resized.set()
+        p.join(5)
+
+        self.assertEqual(p.exitcode, 0)
+        self.assertEqual(result.value, 40)
+        self.assertTrue(self.state.covered(30))
+        self.assertEqual(self.state.snapshot()['covered'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import unittest
+import multiprocessing
+
+from control import MotionCompletion
+from motor_worker import MotorWorker
+
+
+class MotorWorkerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.motion = MotionCompletion()
+        self.done = multiprocessing.RawValue('i', 0)
+
+        self.worker = MotorWorker(self.motion, tank_factory=lambda: None)
+        self.worker.register('drive', self.drive)
+
+    def tearDown(self):
+        self.worker.shutdown()
+
+    def drive(self, tank, rotations=0):
+        self.done.value += rotations
+
+    def test_jobs_run_in_order_and_complete_the_motion(self):
+        token = self.motion.begin()
+        self.worker.start()
+
+        first = self.worker.submit('drive', rotations=1)
+        last = self.worker.submit('drive', token=token, rotations=2)
+
+        self.assertEqual(self.worker.wait(last, timeout=5), MotorWorker.COMPLETED)
+        self.assertEqual(self.worker.state(first), MotorWorker.COMPLETED)
+        self.assertEqual(self.done.value, 3)
+
+        self.assertEqual(self.motion.wait(token, timeout=1), MotionCompletion.COMPLETE)
+        self.assertEqual(self.worker.dispatch_stats()['count'], 2)
+
+    def test_cancel_all_drops_the_queued_jobs(self):
+        ##
+        ## queued before the worker is running, so nothing has started
+        ##
+        jobs = [self.worker.submit('drive', rotations=1) for i in range(5)]
+
+        self.assertEqual(self.worker.cancel_all(), 5)
+
+        after = self.worker.submit('drive', rotations=10)
+        self.worker.start()
+
+        self.assertEqual(self.worker.wait(after, timeout=5), MotorWorker.COMPLETED)
+
+        for job in jobs:
+            self.assertEqual(self.worker.state(job), MotorWorker.CANCELLED)
+
+        self.assertEqual(self.done.value, 10)
+
+    def test_failed_job(self):
+        self.worker.start()
+
+        job = self.worker.submit('drive', rotations='lots')
+        self.assertEqual(self.worker.wait(job, timeout=5), MotorWorker.FAILED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import grid
+from grid import GridGraph
+from planner import RoutePlanner, PathTable
+
+
+##
+## grids the tests walk, columns x rows
+##
+SIZES = [(2, 2), (3, 3), (4, 3), (3, 5), (5, 5), (6, 4), (7, 2), (9, 9)]
+
+
+def drive(g, start, legs):
+    """
+    Follow the legs from start, returns (times each edge was driven,
+    nodes visited, end node) ... fails on a leg off the grid
+    """
+    driven = [0]*g.edges
+    visited = set([start])
+
+    node = start
+    for h in legs:
+        e = g.edge(node, h)
+        if e < 0:
+            raise AssertionError('leg {} off the grid at node {}'.format(grid.HEADING_NAMES[h], node))
+
+        driven[e] += 1
+        node = g.neighbour(node, h)
+        visited.add(node)
+
+    return driven, visited, node
+
+
+class HierholzerTest(unittest.TestCase):
+    """
+    Every node of even degree: the walk is an Eulerian circuit, every
+    edge driven exactly as often as asked
+    """
+
+    def test_perimeter_once_round(self):
+        planner = RoutePlanner()
+
+        for columns, rows in SIZES:
+            g = GridGraph(columns, rows)
+            count = bytearray(1 if g.is_perimeter_edge(e) else 0 for e in range(g.edges))
+
+            for start in (0, g.node(0, columns-1), g.node(rows-1, 0)):
+                for heading in range(4):
+                    legs = planner._hierholzer(g, count, start, heading)
+                    driven, visited, end = drive(g, start, legs)
+
+                    self.assertEqual(driven, list(count))
+                    self.assertEqual(end, start)
+
+    def test_doubled_grid(self):
+        ##
+        ## every edge twice: all degrees even, interior included
+        ##
+        planner = RoutePlanner()
+
+        for columns, rows in SIZES:
+            g = GridGraph(columns, rows)
+            count = bytearray([2])*g.edges
+
+            legs = planner._hierholzer(g, count, g.node(rows//2, columns//2), grid.NORTH)
+            driven, visited, end = drive(g, g.node(rows//2, columns//2), legs)
+
+            self.assertEqual(driven, [2]*g.edges)
+            self.assertEqual(len(visited), g.nodes)
+            self.assertEqual(end, g.node(rows//2, columns//2))
+
+
+class PerimeterTourTest(unittest.TestCase):
+    """
+    The planned walk on grids with odd nodes, after the duplicated paths
+    """
+
+    def test_valid_covering_walk(self):
+        planner = RoutePlanner()
+
+        for columns, rows in SIZES:
+            g = GridGraph(columns, rows)
+            required = planner._required(g)
+
+            for start in range(g.nodes):
+                for heading in range(4):
+                    tour = planner.perimeter_tour(g, start, heading)
+                    driven, visited, end = drive(g, start, tour.legs)
+
+                    for e in range(g.edges):
+                        self.assertGreaterEqual(driven[e], required[e])
+                        if g.is_perimeter_edge(e):
+                            self.assertGreaterEqual(driven[e], 1)
+
+                    self.assertEqual(len(visited), g.nodes)
+                    self.assertEqual(end, tour.end)
+                    self.assertEqual(tour.repeated, len(tour)-sum(required))
+
+    def test_turns(self):
+        g = GridGraph(4, 3)
+        tour = RoutePlanner().perimeter_tour(g, 0, grid.EAST)
+
+        turns = 0
+        degrees = 0
+        current = grid.EAST
+        for h in tour.legs:
+            if h != current:
+                turns += 1
+                degrees += abs(grid.turn_angle(current, h))
+            current = h
+
+        self.assertEqual((tour.turns, tour.degrees), (turns, degrees))
+
+    def test_cached(self):
+        planner = RoutePlanner(cache_size=2)
+        g = GridGraph(3, 3)
+
+        tour = planner.perimeter_tour(g, 4, grid.NORTH)
+        self.assertIs(planner.perimeter_tour(g, 4, grid.NORTH), tour)
+
+        planner.perimeter_tour(g, 0, grid.NORTH)
+        planner.perimeter_tour(g, 8, grid.NORTH)
+
+        self.assertIsNot(planner.perimeter_tour(g, 4, grid.NORTH), tour)
+
+
+def relaxed(g, target, spacing_ew, spacing_ns, turn_cost):
+    """
+    Brute force cost to target from every (node, heading) state: relax
+    every move from every state until nothing changes (Bellman-Ford)
+    """
+    length = (spacing_ns, spacing_ew, spacing_ns, spacing_ew)
+    inf = float('inf')
+
+    dist = [inf]*(g.nodes*4)
+    for h in range(4):
+        dist[target*4+h] = 0.0
+
+    changed = True
+    while changed:
+        changed = False
+
+        for node in range(g.nodes):
+            if node == target:
+                continue
+
+            for h in range(4):
+                best = dist[node*4+h]
+
+                for k, neighbour in g.neighbours(node):
+                    c = abs(grid.turn_angle(h, k))/90.0*turn_cost+length[k]+dist[neighbour*4+k]
+                    if c < best-1e-9:
+                        best = c
+
+                if best < dist[node*4+h]:
+                    dist[node*4+h] = best
+                    changed = True
+
+    return dist
+
+
+class PathTableTest(unittest.TestCase):
+
+    def check(self, g, spacing_ew, spacing_ns, turn_cost, precompute=64):
+        t = PathTable(g, spacing_ew, spacing_ns, turn_cost, precompute=precompute)
+
+        for target in range(g.nodes):
+            dist = relaxed(g, target, spacing_ew, spacing_ns, turn_cost)
+
+            for node in range(g.nodes):
+                for heading in range(4):
+                    cost = t.cost(node, heading, target)
+                    self.assertAlmostEqual(cost, dist[node*4+heading])
+
+                    ##
+                    ## and the route costs what the table says
+                    ##
+                    legs = t.route(node, heading, target)
+                    driven, visited, end = drive(g, node, legs)
+                    self.assertEqual(end, target)
+
+                    total = 0.0
+                    current = heading
+                    for h in legs:
+                        total += abs(grid.turn_angle(current, h))/90.0*turn_cost
+                        total += spacing_ns if h%2 == 0 else spacing_ew
+                        current = h
+
+                    self.assertAlmostEqual(total, cost)
+
+    def test_against_brute_force(self):
+        for columns, rows in SIZES[:6]:
+            g = GridGraph(columns, rows)
+
+            self.check(g, 12.0, 12.0, 6.0)
+            self.check(g, 30.0, 10.0, 20.0)
+            self.check(g, 10.0, 10.0, 0.0)
+
+    def test_lazy_tables(self):
+        ##
+        ## more nodes than precompute: targets are filled on demand
+        ##
+        self.check(GridGraph(5, 4), 12.0, 18.0, 9.0, precompute=4)
+
+    def test_set_spacing(self):
+        g = GridGraph(3, 3)
+        t = PathTable(g, 12.0, 12.0, 6.0)
+
+        self.assertFalse(t.set_spacing(12.0, 12.0))
+        self.assertTrue(t.set_spacing(24.0, 12.0))
+
+        self.assertAlmostEqual(t.cost(0, grid.EAST, 2), 48.0)
+        self.assertEqual(t.next_heading(2, grid.EAST, 2), PathTable.ARRIVED)
+
+
+if __name__ == '__main__':
+    unittest.main()
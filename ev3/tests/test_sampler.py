@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from sampler import ColorSampler
+
+
+GREEN = 3
+WHITE = 6
+
+
+def feed(colors):
+    """
+    read() for ColorSampler.run(): every sample on the first poll, then
+    nothing, and keep_going() for a few polls after that
+    """
+    samples = [[(i*0.01, color) for i, color in enumerate(colors)]]
+    polls = [0]
+
+    def read():
+        return samples.pop() if samples else []
+
+    def keep_going():
+        polls[0] += 1
+        return polls[0] < 5
+
+    return read, keep_going
+
+
+class ColorSamplerTest(unittest.TestCase):
+
+    def run_sampler(self, colors, **kwargs):
+        sampler = ColorSampler(GREEN, rate=1000, window=5, hits=3, **kwargs)
+        read, keep_going = feed(colors)
+
+        return sampler, sampler.run(read, keep_going)
+
+    def test_hits_in_the_window(self):
+        sampler, found = self.run_sampler([WHITE]*10+[GREEN, WHITE, GREEN, WHITE, GREEN])
+
+        self.assertTrue(found)
+        self.assertEqual(sampler.stats()['detections'], 1)
+        self.assertEqual(sampler.count, 15)
+
+    def test_hits_spread_wider_than_the_window(self):
+        sampler, found = self.run_sampler([GREEN, WHITE, WHITE]*10)
+
+        self.assertFalse(found)
+        self.assertEqual(sampler.stats()['samples'], 30)
+
+    def test_ring_no_larger_than_the_window(self):
+        ##
+        ## size <= window still has to drop the sample leaving the window
+        ## before it is overwritten
+        ##
+        for size in (1, 5):
+            sampler, found = self.run_sampler([WHITE]*10+[GREEN]*3, size=size)
+            self.assertTrue(found)
+            self.assertEqual(sampler.size, 6)
+
+            sampler, found = self.run_sampler([GREEN, WHITE, WHITE]*10, size=size)
+            self.assertFalse(found)
+
+    def test_recent(self):
+        sampler, found = self.run_sampler([WHITE, WHITE, GREEN], size=8)
+
+        self.assertFalse(found)
+        self.assertEqual(sampler.recent(2), [(0.01, WHITE), (0.02, GREEN)])
+        self.assertEqual(len(sampler.recent()), 3)
+
+    def test_more_hits_than_window(self):
+        with self.assertRaises(ValueError):
+            ColorSampler(GREEN, window=3, hits=4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import threading
+import unittest
+
+import sim
+from scheduler import CommandScheduler
+
+
+def wait_for(done, timeout=5):
+    end = time.monotonic()+timeout
+    while not done() and time.monotonic() < end:
+        time.sleep(0.005)
+
+    return done()
+
+
+def import_main():
+    """
+    main.py with the simulator's ev3dev2 and agt stand-ins, but without
+    the simulated clock ... only for its pure helpers
+    """
+    if 'main' not in sys.modules:
+        s = sim.Simulator()
+        for name, module in sim._build_modules(s.world, s.events).items():
+            sys.modules.setdefault(name, module)
+
+    import main
+    return main
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.ran = []
+        self.scheduler = CommandScheduler()
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def record(self, name):
+        return lambda payload: self.ran.append((name, payload))
+
+    def test_priority_then_arrival_order(self):
+        s = self.scheduler
+        s.register('move', self.record('move'))
+        s.register('stop', self.record('stop'), priority=CommandScheduler.HIGH)
+
+        s.submit('move', 1)
+        s.submit('move', 2)
+        s.submit('stop', 3)
+        s.submit('move', 4)
+
+        s.start()
+
+        self.assertTrue(wait_for(lambda: len(self.ran) == 4))
+        self.assertEqual(self.ran, [('stop', 3), ('move', 1), ('move', 2), ('move', 4)])
+
+    def test_unregistered_intent(self):
+        self.assertFalse(self.scheduler.submit('dance', {}))
+
+    def walking(self, started, release):
+        def walk(payload):
+            started.set()
+            release.wait(5)
+
+        return walk
+
+    def test_urgent_runs_while_a_command_is_running(self):
+        started = threading.Event()
+        release = threading.Event()
+        s = self.scheduler
+
+        s.register('walk', self.walking(started, release))
+        s.register('killswitch', self.record('killswitch'), preempt=True)
+        s.start()
+
+        s.submit('walk', {})
+        self.assertTrue(started.wait(5))
+        s.submit('killswitch', {})
+
+        self.assertTrue(wait_for(lambda: self.ran == [('killswitch', {})]))
+        self.assertFalse(release.is_set())
+
+        release.set()
+
+    def test_clear_queue_drops_what_is_waiting(self):
+        started = threading.Event()
+        release = threading.Event()
+        s = self.scheduler
+
+        s.register('walk', self.walking(started, release))
+        s.register('move', self.record('move'))
+        s.register('killswitch', self.record('killswitch'), preempt=True, clear_queue=True)
+        s.start()
+
+        s.submit('walk', {})
+        self.assertTrue(started.wait(5))
+        s.submit('move', 1)
+        s.submit('move', 2)
+        self.assertEqual(s.queue_depth(), 2)
+
+        s.submit('killswitch', {})
+        self.assertEqual(s.queue_depth(), 0)
+
+        release.set()
+        s.submit('move', 3)
+
+        ##
+        ## the lanes run side by side, so only what ran is certain
+        ##
+        self.assertTrue(wait_for(lambda: len(self.ran) == 2))
+        time.sleep(0.05)
+        self.assertCountEqual(self.ran, [('killswitch', {}), ('move', 3)])
+
+    def test_coalesce_only_into_the_tail(self):
+        s = self.scheduler
+        s.register('move', self.record('move'), coalesce=lambda queued, new: queued+new)
+        s.register('turn', self.record('turn'))
+
+        s.submit('move', 1)
+        s.submit('move', 2)
+        s.submit('turn', 10)
+        s.submit('move', 3)
+        s.submit('move', 4)
+
+        self.assertEqual(s.stats()['coalesced'], 2)
+
+        s.start()
+
+        self.assertTrue(wait_for(lambda: len(self.ran) == 3))
+        self.assertEqual(self.ran, [('move', 3), ('turn', 10), ('move', 7)])
+
+    def test_coalesce_refused(self):
+        s = self.scheduler
+        s.register('move', self.record('move'), coalesce=lambda queued, new: None)
+
+        s.submit('move', 1)
+        s.submit('move', 2)
+        s.start()
+
+        self.assertTrue(wait_for(lambda: len(self.ran) == 2))
+        self.assertEqual(self.ran, [('move', 1), ('move', 2)])
+
+
+class CoalesceAmountTest(unittest.TestCase):
+    """
+    The gadget's move/turn coalesce function (main.py)
+    """
+
+    class Gadget(object):
+        def __init__(self):
+            self.data = {'default_bowstearn_rotations' : 4}
+
+    def setUp(self):
+        main = import_main()
+
+        gadget = self.Gadget()
+        gadget._requests = lambda payload: main.EV3SearchGadget._requests(gadget, payload)
+
+        self.coalesce = main.EV3SearchGadget._coalesce_amount( gadget,
+                                                               'BowStearnDirection',
+                                                               'BowStearnDuration',
+                                                               'default_bowstearn_rotations' )
+
+    def move(self, direction, rotations=None):
+        slots = {'BowStearnDirection' : {'name' : 'BowStearnDirection', 'value' : direction}}
+        if rotations is not None:
+            slots['BowStearnDuration'] = {'name' : 'BowStearnDuration', 'value' : str(rotations)}
+
+        return {'intent' : 'move_robot', 'slots' : slots}
+
+    def test_same_direction_sums(self):
+        merged = self.coalesce(self.move('forward', 2), self.move('forward', 3))
+
+        self.assertEqual(merged['slots']['BowStearnDuration']['value'], '5')
+        self.assertEqual(merged['coalesced'], 2)
+
+        merged = self.coalesce(merged, self.move('forward', 1))
+
+        self.assertEqual(merged['slots']['BowStearnDuration']['value'], '6')
+        self.assertEqual(merged['coalesced'], 3)
+
+    def test_missing_amount_is_the_default(self):
+        merged = self.coalesce(self.move('forward'), self.move('forward', 1))
+        self.assertEqual(merged['slots']['BowStearnDuration']['value'], '5')
+
+    def test_other_direction_is_not_merged(self):
+        self.assertIsNone(self.coalesce(self.move('forward', 2), self.move('backward', 2)))
+
+    def test_unreadable_amount_is_not_merged(self):
+        self.assertIsNone(self.coalesce(self.move('forward', 'lots'), self.move('forward', 2)))
+
+
+if __name__ == '__main__':
+    unittest.main()
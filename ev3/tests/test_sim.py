@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import math
+import subprocess
+import unittest
+
+import sim
+
+EV3 = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+class ManualClock(object):
+    """
+    Simulated time that only moves when the test says so
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+class WorldTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = ManualClock()
+        self.world = sim.World(self.clock, coast=0)
+        self.world.place(0, 0, 90)
+
+    def test_straight_line(self):
+        ##
+        ## 70% is about 0.5 s per rotation
+        ##
+        self.world.drive(70, 70)
+        self.clock.now = 2.0
+
+        x, y, heading = self.world.pose()
+        inches = 2.0*sim.MAX_RPS*0.7*sim.INCHES_PER_ROTATION
+
+        self.assertAlmostEqual(x, inches)
+        self.assertAlmostEqual(y, 0)
+        self.assertAlmostEqual(heading, 90)
+        self.assertAlmostEqual(self.world.distance(), inches)
+
+    def test_turn_on_the_spot(self):
+        self.world.drive(50, -50)
+        self.clock.now = 1.0
+
+        x, y, heading = self.world.pose()
+        degrees = math.degrees(2*sim.MAX_RPS*0.5*sim.INCHES_PER_ROTATION/sim.TRACK)
+
+        self.assertAlmostEqual(x, 0)
+        self.assertAlmostEqual(y, 0)
+        self.assertAlmostEqual(heading, 90+degrees)
+        self.assertEqual(self.world.gyro(), int(round(90+degrees)))
+
+    def test_color_under_the_sensor(self):
+        colors = sim.ColorMap(default=6)
+        colors.add_disc(10, 0, 1, 3)
+
+        world = sim.World(self.clock, colors)
+        world.place(10-sim.SENSOR_OFFSET, 0, 90)
+
+        self.assertEqual(world.color(), 3)
+
+        world.place(10, 0, 90)
+        self.assertEqual(world.color(), 6)
+
+
+class MissionTest(unittest.TestCase):
+
+    def test_walk_perimeter_runs_to_the_end(self):
+        ##
+        ## the harness used to read a walker that had not set the
+        ## search flag yet as a mission already over
+        ##
+        for i in range(3):
+            out = subprocess.run( [sys.executable, 'sim.py', 'walk_perimeter', '20', '600'],
+                                  cwd=EV3,
+                                  stdout=subprocess.PIPE,
+                                  stderr=subprocess.STDOUT,
+                                  universal_newlines=True,
+                                  timeout=300 ).stdout
+
+            elapsed = re.search(r'finished after ([0-9.]+) simulated seconds', out)
+
+            self.assertIsNotNone(elapsed, out)
+            self.assertGreater(float(elapsed.group(1)), 10)
+            self.assertIn('Subject found: True', out)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import math
+import unittest
+
+from control import MotionModel
+from speed import SpeedController
+
+
+class SpeedControllerTest(unittest.TestCase):
+
+    def setUp(self):
+        ##
+        ## 0.5 s a rotation at 70%: 3.75 inches a rotation is 7.5 in/s
+        ## at 70%, 10.7 in/s at 100%
+        ##
+        self.controller = SpeedController(MotionModel(seconds_per_rotation=0.5, reference_speed=70))
+
+    def test_spacing(self):
+        ##
+        ## lanes 6 in apart over a 4 in radius subject: the shortest
+        ## chord is 2*sqrt(16-9), shared by 3 hits
+        ##
+        self.assertAlmostEqual(SpeedController.spacing(2.0, 4.0, 6.0, 3), 2*math.sqrt(7)/3)
+
+        ##
+        ## the footprint when that is shorter
+        ##
+        self.assertEqual(SpeedController.spacing(1.0, 4.0, 6.0, 3), 1.0)
+
+        ##
+        ## lanes wider than the subject: the diameter
+        ##
+        self.assertAlmostEqual(SpeedController.spacing(10.0, 4.0, 12.0, 2), 4.0)
+
+    def test_choose(self):
+        self.assertEqual(self.controller.choose(50), 100)
+        self.assertEqual(self.controller.choose(5), 80)
+        self.assertEqual(self.controller.choose(1), 20)
+
+        ##
+        ## never faster than the samples allow, except at min_speed
+        ##
+        for rate in range(2, 60):
+            speed = self.controller.choose(rate)
+            self.assertLessEqual(self.controller.inches_per_second(speed), rate*self.controller.sample_spacing)
+
+    def test_follows_the_motion_model(self):
+        ##
+        ## motors slower than expected (battery running down): the same
+        ## rate allows a higher speed setting
+        ##
+        model = self.controller.motion_model
+        model.observe(4, 90, model.rampup+4*model.seconds_per_rotation(90)*1.5)
+
+        self.assertEqual(self.controller.choose(5), 90)
+
+    def test_stats(self):
+        self.controller.update(50)
+        self.controller.update(5)
+
+        stats = self.controller.stats()
+        self.assertEqual(stats['speed'], 80)
+        self.assertEqual(stats['rate'], 5)
+        self.assertEqual(stats['updates'], 2)
+        self.assertEqual(stats['limited'], 1)
+        self.assertAlmostEqual(stats['area_per_second'], stats['inches_per_second']*10.0)
+
+        self.controller.reset()
+        self.assertEqual(self.controller.stats()['updates'], 0)
+        self.assertEqual(self.controller.stats()['limited'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
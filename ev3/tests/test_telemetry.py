@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import telemetry
+from telemetry import TelemetryRing, read_log
+
+
+class TelemetryRingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'telemetry.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_flushed_when_the_ring_wraps(self):
+        ring = TelemetryRing(self.path, capacity=4)
+
+        for i in range(10):
+            ring.record(telemetry.MOVE, a=i)
+
+        self.assertEqual(ring.flush(), 2)
+
+        log = list(read_log(self.path))
+        self.assertEqual([r[0] for r in log], list(range(10)))
+        self.assertEqual([r[4] for r in log], list(range(10)))
+        self.assertEqual(log[0][1], 'move')
+
+        stats = ring.stats()
+        self.assertEqual(stats['records'], 10)
+        self.assertEqual(stats['flushed'], 10)
+        self.assertEqual(stats['dropped'], 0)
+
+    def test_span(self):
+        ring = TelemetryRing(self.path, capacity=4)
+
+        span = ring.begin(telemetry.TURN, a=90)
+        ring.end(span, b=1)
+        ring.end(None)
+
+        seq, kind, start, end, a, b, c = ring.recent()[0]
+        self.assertEqual((seq, kind, a, b), (0, telemetry.TURN, 90, 1))
+        self.assertLessEqual(start, end)
+
+    def test_unwritable_log_backs_off(self):
+        ##
+        ## a directory that isn't there ... every flush fails
+        ##
+        ring = TelemetryRing(os.path.join(self.dir, 'missing', 'telemetry.bin'), capacity=4, retry_interval=60)
+
+        for i in range(100):
+            ring.record(telemetry.MOVE, a=i)
+
+        stats = ring.stats()
+        self.assertEqual(stats['flush_errors'], 1)
+        self.assertEqual(stats['dropped'], 96)
+        self.assertEqual([r[4] for r in ring.recent()], [96, 97, 98, 99])
+
+        ##
+        ## what is still in memory reaches the log once it can be written
+        ##
+        ring.path = self.path
+        self.assertEqual(ring.flush(), 4)
+        self.assertEqual([r[0] for r in read_log(self.path)], [96, 97, 98, 99])
+
+    def test_retry_after_the_interval(self):
+        ring = TelemetryRing(os.path.join(self.dir, 'missing', 'telemetry.bin'), capacity=4, retry_interval=0)
+
+        for i in range(8):
+            ring.record(telemetry.MOVE, a=i)
+
+        self.assertEqual(ring.stats()['flush_errors'], 4)
+
+        ring.path = self.path
+        ring.record(telemetry.MOVE, a=8)
+
+        self.assertEqual([r[0] for r in read_log(self.path)], [4, 5, 6, 7])
+        self.assertEqual(ring.stats()['dropped'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
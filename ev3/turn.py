@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import time
+import bisect
+import datetime
+import multiprocessing
+
+
+##############################################################################
+##############################################################################
+##
+## TURN CONTROLLER
+##
+##      closed loop gyro turns
+##
+##############################################################################
+##############################################################################
+
+
+class TurnController(object):
+    """
+    Turns the tank on the spot by a number of degrees in one motion
+
+    The gyro is sampled at a fixed rate and the wheel speed follows a
+    PID on the remaining angle, clamped between min_speed (enough to
+    keep the tank moving) and max_speed, so the turn runs at full speed
+    and slows down on approach instead of stopping early and correcting
+    with a second motion.  If it overshoots, the error changes sign and
+    the same loop backs up.  The turn is done once the angle has stayed
+    within tolerance for settle seconds.
+
+    With a calibration table (TurnCalibration) the motors are stopped
+    early by the lead learned for the angle and speed, so the tank
+    coasts onto the target instead of past it and having to back up.
+
+    Settle time and overshoot of the most recent turns are kept in
+    shared memory, so turns made by any gadget process show up in
+    stats().
+    """
+
+    def __init__( self,
+                  kp=3.0,
+                  ki=0.0,
+                  kd=0.02,
+                  min_speed=6,
+                  max_speed=50,
+                  tolerance=1,
+                  rate=100,
+                  settle=0.05,
+                  timeout=10.0,
+                  history=64 ):
+
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.min_speed = min_speed
+        self.max_speed = max_speed
+        self.tolerance = tolerance
+        self.rate = rate
+        self.settle = settle
+        self.timeout = timeout
+
+        self.calibration = None
+
+        ##
+        ## ring of (settle time, overshoot) for the most recent turns
+        ##
+        self._history = history
+        self._settle_times = multiprocessing.RawArray('d', history)
+        self._overshoots = multiprocessing.RawArray('d', history)
+        self._count = multiprocessing.RawValue('i', 0)
+        self._timeouts = multiprocessing.RawValue('i', 0)
+        self._corrected = multiprocessing.RawValue('i', 0)
+
+
+    def turn(self, tank, gyro, degrees, running=None, max_speed=None):
+        """
+        Turn by degrees (positive is right).  running() is polled every
+        sample and the turn is abandoned as soon as it returns False.
+
+        Returns (reached, settle time, overshoot, final error, motions),
+        angles in degrees, overshoot past the target in the turn
+        direction, motions the number of times the motors were started
+        from standstill (1 unless the turn had to be corrected)
+        """
+        if max_speed is None:
+            max_speed = self.max_speed
+
+        lead = 0.0
+        if self.calibration is not None:
+            lead = min(self.calibration.lead(abs(degrees), max_speed), abs(degrees)/2.0)
+
+        sign = 1 if degrees >= 0 else -1
+        target = abs(degrees)
+        period = 1.0/self.rate
+
+        start_angle = gyro.angle
+        start = time.monotonic()
+        deadline = start+self.timeout
+
+        integral = 0.0
+        last_error = None
+        peak = 0
+        inside = None
+        stopped = start
+        speed = 0
+        motions = 0
+        reached = False
+        error = target
+
+        ##
+        ## the integral may never ask for more than max_speed by itself
+        ##
+        windup = max_speed/self.ki if self.ki else 0.0
+
+        next_sample = start
+
+        while True:
+            if running is not None and not running():
+                break
+
+            turned = (gyro.angle-start_angle)*sign
+            peak = max(peak, turned)
+            error = target-turned
+            now = time.monotonic()
+
+            if speed == 0:
+                ##
+                ## standing still: done once the reading has stayed
+                ## within tolerance, otherwise give it settle seconds
+                ## to stop coasting before moving again
+                ##
+                if abs(error) <= self.tolerance:
+                    if inside is None:
+                        inside = now
+
+                    elif now-inside >= self.settle:
+                        reached = True
+                        break
+
+                else:
+                    inside = None
+
+                move = abs(error) > self.tolerance and (motions == 0 or now-stopped >= self.settle)
+
+            ##
+            ## keep creeping until the target itself (less the lead) is
+            ## reached, not just the edge of the tolerance, or the turns
+            ## would all come up short by the same amount
+            ##
+            elif (speed > 0 and error <= lead) or (speed < 0 and error >= 0-lead):
+                tank.off(brake=True)
+                speed = 0
+                stopped = now
+                inside = None
+                move = False
+
+            else:
+                move = True
+
+            if move:
+                if self.ki:
+                    integral = max(-windup, min(windup, integral+error*period))
+
+                derivative = 0.0
+                if last_error is not None:
+                    derivative = (error-last_error)/period
+
+                output = self.kp*error+self.ki*integral+self.kd*derivative
+
+                ##
+                ## only touch the motors when the speed actually changes
+                ##
+                new_speed = int(round(max(self.min_speed, min(max_speed, abs(output)))))
+                if output < 0:
+                    new_speed = -new_speed
+
+                if new_speed != speed:
+                    if speed == 0:
+                        motions += 1
+
+                    tank.on( left_speed=sign*new_speed,
+                             right_speed=(0-sign*new_speed) )
+                    speed = new_speed
+
+            last_error = error
+
+            if now >= deadline:
+                self._timeouts.value += 1
+                break
+
+            next_sample += period
+            delay = next_sample-time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_sample = time.monotonic()
+
+        if speed != 0:
+            tank.off(brake=True)
+
+        settle_time = time.monotonic()-start
+        overshoot = max(0, peak-target)
+
+        if motions > 1:
+            self._corrected.value += 1
+
+        if reached:
+            i = self._count.value%self._history
+            self._settle_times[i] = settle_time
+            self._overshoots[i] = overshoot
+            self._count.value += 1
+
+        return (reached, settle_time, overshoot, error, motions)
+
+
+    def stats(self):
+        """
+        count/last/mean/max of settle time (seconds) and overshoot
+        (degrees) over the most recent completed turns, and how many
+        turns timed out or took more than one motion
+        """
+        count = self._count.value
+        n = min(count, self._history)
+        settle_times = [self._settle_times[i] for i in range(n)]
+        overshoots = [self._overshoots[i] for i in range(n)]
+
+        last = (count-1)%self._history
+
+        return {
+            'count' : count,
+            'timeouts' : self._timeouts.value,
+            'corrected' : self._corrected.value,
+            'last_settle' : self._settle_times[last] if count else None,
+            'mean_settle' : (sum(settle_times)/n) if n else None,
+            'max_settle' : max(settle_times) if n else None,
+            'last_overshoot' : self._overshoots[last] if count else None,
+            'mean_overshoot' : (sum(overshoots)/n) if n else None,
+            'max_overshoot' : max(overshoots) if n else None
+        }
+
+
+##############################################################################
+##############################################################################
+##
+## TURN CALIBRATION
+##
+##      learned per angle/speed lead for the turn controller
+##
+##############################################################################
+##############################################################################
+
+
+class TurnCalibration(object):
+    """
+    How far (degrees) the tank carries on past the target once the
+    motors are stopped, by turn angle and turn speed
+
+    calibrate() measures it by turning the tank back and forth through
+    a sweep of angles at each speed.  lead() interpolates linearly
+    between the calibrated angles and speeds (and holds the end values
+    outside them).  The table is small enough to be kept as JSON on the
+    brick and loaded at startup.
+    """
+
+    ANGLES = (10, 30, 45, 90, 135, 180)
+    SPEEDS = (30, 50, 70)
+
+    def __init__(self, angles=ANGLES, speeds=SPEEDS, leads=None):
+        self.angles = list(angles)
+        self.speeds = list(speeds)
+
+        ##
+        ## leads[speed index][angle index]
+        ##
+        if leads is None:
+            leads = [ [0.0]*len(self.angles) for speed in self.speeds ]
+
+        self.leads = leads
+
+
+    @staticmethod
+    def _interpolate(xs, ys, x):
+        if x <= xs[0]:
+            return ys[0]
+
+        if x >= xs[-1]:
+            return ys[-1]
+
+        i = bisect.bisect_right(xs, x)
+        x0, x1 = xs[i-1], xs[i]
+
+        return ys[i-1]+(ys[i]-ys[i-1])*(x-x0)/float(x1-x0)
+
+
+    def lead(self, degrees, speed):
+        by_speed = [ self._interpolate(self.angles, row, abs(degrees)) for row in self.leads ]
+
+        return self._interpolate(self.speeds, by_speed, abs(speed))
+
+
+    def calibrate(self, controller, tank, gyro, repeats=1, timeout=3.0, running=None):
+        """
+        Fill the table from turns made with controller (its own table
+        is left out while measuring, and a turn gets timeout seconds).
+        Every angle is turned right then left, so the tank ends up
+        facing the way it started.  Returns False if running() stopped
+        it before the end
+        """
+        saved = (controller.calibration, controller.timeout)
+        controller.calibration = None
+        controller.timeout = timeout
+
+        try:
+            for i, speed in enumerate(self.speeds):
+                for j, angle in enumerate(self.angles):
+                    overshoots = []
+
+                    for k in range(repeats):
+                        for direction in (1, -1):
+                            if running is not None and not running():
+                                return False
+
+                            gyro.reset()
+
+                            reached, settle_time, overshoot, error, motions = controller.turn( tank,
+                                                                                               gyro,
+                                                                                               direction*angle,
+                                                                                               running=running,
+                                                                                               max_speed=speed )
+
+                            ##
+                            ## a turn that never settles overshot too,
+                            ## which is what the table is there to fix
+                            ##
+                            overshoots.append(overshoot)
+
+                    self.leads[i][j] = sum(overshoots)/float(len(overshoots))
+
+            return True
+
+        finally:
+            controller.calibration, controller.timeout = saved
+
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump( { 'angles' : self.angles,
+                         'speeds' : self.speeds,
+                         'leads' : self.leads,
+                         'date' : str(datetime.datetime.now()) },
+                       f, indent=4 )
+
+
+    @classmethod
+    def load(cls, path):
+        """
+        The table saved at path, or None if there isn't a usable one
+        """
+        try:
+            with open(path) as f:
+                table = json.load(f)
+
+            return cls(table['angles'], table['speeds'], table['leads'])
+
+        except Exception as e:
+            exc_type, exc_obj, exc_tb = sys.exc_info()
+            print('[-] Turn calibration load Error: {} on line {}'.format(e, exc_tb.tb_lineno))
+
+        return None
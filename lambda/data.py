@@ -249,13 +249,34 @@ AFTER_TURN_ROBOT_MESSAGE = "I have turned the robot."
 ## START SEARCH MESSAGES
 ##
 START_SEARCH_MESSAGE = "I am starting a search."
+START_PATTERN_SEARCH_MESSAGE = "I am starting {} search."
 AFTER_START_SEARCH_MESSAGE = "I have started a search."
 
+##
+## SearchPattern slot values for each search pattern the gadget knows,
+## and how it is said back
+##
+SEARCH_PATTERN_VALUES = {}
+SEARCH_PATTERN_VALUES['spiral'] = ["spiral"]
+SEARCH_PATTERN_VALUES['expanding_square'] = ["expanding square", "square"]
+SEARCH_PATTERN_VALUES['sector'] = ["sector", "vector"]
+SEARCH_PATTERN_VALUES['parallel_track'] = ["parallel track", "parallel", "ladder", "lawnmower"]
+SEARCH_PATTERN_VALUES['creeping_line'] = ["creeping line", "creeping"]
+SEARCH_PATTERN_VALUES['coverage'] = ["coverage", "probability"]
+
+SEARCH_PATTERN_NAMES = {}
+SEARCH_PATTERN_NAMES['spiral'] = 'a spiral'
+SEARCH_PATTERN_NAMES['expanding_square'] = 'an expanding square'
+SEARCH_PATTERN_NAMES['sector'] = 'a sector'
+SEARCH_PATTERN_NAMES['parallel_track'] = 'a parallel track'
+SEARCH_PATTERN_NAMES['creeping_line'] = 'a creeping line'
+SEARCH_PATTERN_NAMES['coverage'] = 'a coverage'
+
 ##
 ## WALK PERIMETER MESSAGES
 ##
 WALK_PERIMETER_MESSAGE = "I am starting perimeter walk."
-AFTER_WALK_PERIMETER_MESSAGE = "I have started a perimeter walk."
+AFTER_WALK_PERIMETER_MESSAGE = "I have finished the perimeter walk."
 
 ##
 ## PAUSE MESSAGES
@@ -275,3 +296,24 @@ AFTER_KILLSWITCH_MESSAGE = "I have stopped the robot."
 SET_GRID_MESSAGE = "Setting grid {}."
 AFTER_SET_GRID_MESSAGE = "I have set the grid."
 
+##
+## GO TO POSITION MESSAGES
+##
+GO_TO_POSITION_MESSAGE = "Going to the {} now."
+AFTER_GO_TO_POSITION_MESSAGE = "I have arrived."
+GO_TO_POSITION_STOPPED_MESSAGE = "I stopped before reaching the position."
+GO_TO_POSITION_UNKNOWN_MESSAGE = "Sorry, where to? Say a corner, a side or the center of the grid, or a position from 0 to 8."
+
+##
+## CALIBRATE TURNS MESSAGES
+##
+CALIBRATE_TURNS_MESSAGE = "Calibrating my turns, I will spin on the spot for about a minute."
+AFTER_CALIBRATE_TURNS_MESSAGE = "I have calibrated my turns."
+CALIBRATE_TURNS_STOPPED_MESSAGE = "I stopped before finishing the calibration."
+
+##
+## SUBJECT FOUND MESSAGES
+##
+AFTER_SUBJECT_FOUND_MESSAGE = "I have found the subject, {} feet east and {} feet south of the north west corner of the grid."
+SUBJECT_FOUND_MESSAGE = "I have found the subject."
+
@@ -0,0 +1,170 @@
+import math
+
+
+##############################################################################
+##############################################################################
+##
+## MISSION ESTIMATOR
+##
+##      how long the EV3 will take over a mission, before it is sent
+##
+##############################################################################
+##############################################################################
+
+
+##
+## the longest a custom event handler may wait (Alexa's limit)
+##
+MAX_EXPIRATION_MS = 90000
+MIN_EXPIRATION_MS = 8000
+
+##
+## allowance for a mission that answers as soon as it is dispatched
+## (start search, pause, set grid ...), and how much to stretch a
+## prediction (plus a fixed slack for the round trip) before giving up
+##
+ACK_SECONDS = 5.0
+MARGIN = 1.25
+SLACK_SECONDS = 5.0
+
+##
+## the gadget's defaults (ev3/main.py), until it reports its own
+##
+DEFAULT_MODEL = {
+    'grid_width' : 10,
+    'grid_height' : 10,
+    'inches_per_rotation' : 3.75,
+    'seconds_per_rotation' : 0.5,
+    'search_seconds_per_rotation' : None,
+    'seconds_per_turn' : 1.0,
+    'leg_gap' : 0.25,
+    'default_rotations' : 10,
+    'default_degrees' : 90,
+    'search_pattern' : 'spiral',
+    'plans' : {}
+}
+
+
+class MissionEstimator(object):
+    """
+    Predicts mission time from the legs the gadget has planned and the
+    timings it has measured
+
+    The gadget sends a model with its launch, set grid, go to position
+    and calibrate turns responses (EV3SearchGadget.mission_model): the
+    grid size, seconds per rotation at the default speed and at the
+    speed the searches run at (learned from every move), seconds per
+    settled 90 degree turn (from the turn controller), and for the
+    perimeter walk, turn calibration and each standard search pattern
+    the plan as [rotations, degrees turned, legs], and the search
+    pattern it uses when none is asked for.  A mission then takes
+
+        rotations*seconds_per_rotation
+        + degrees/90*seconds_per_turn
+        + legs*leg_gap
+
+    Moves and turns only need the timings.  Without a plan (no model
+    yet) seconds() returns None and the handler waits as long as Alexa
+    allows, as it always did.
+    """
+
+    def __init__(self, model=None):
+        self.model = dict(DEFAULT_MODEL)
+
+        if model:
+            self.model.update((key, value) for key, value in model.items() if value is not None)
+
+
+    def legs(self, rotations, degrees, legs, seconds_per_rotation=None):
+        m = self.model
+
+        if seconds_per_rotation is None:
+            seconds_per_rotation = m['seconds_per_rotation']
+
+        return ( abs(rotations)*seconds_per_rotation
+                 + abs(degrees)/90.0*m['seconds_per_turn']
+                 + legs*m['leg_gap'] )
+
+
+    def plan(self, name):
+        """
+        Seconds for a planned mission, or None if the gadget has not
+        sent its plan
+        """
+        plan = self.model['plans'].get(name)
+        if plan is None:
+            return None
+
+        rotations, degrees, legs = plan
+
+        ##
+        ## the walk and the searches drive at the search speed, turn
+        ## calibration does not drive at all
+        ##
+        return self.legs(rotations, degrees, legs, self.model['search_seconds_per_rotation'])
+
+
+    def go_to(self):
+        """
+        Seconds for the longest trip to a position: corner to corner
+        along the grid lines, turning twice
+        """
+        m = self.model
+        rotations = (m['grid_width']+m['grid_height'])*12.0/m['inches_per_rotation']
+
+        return self.legs(rotations, 180, 2)
+
+
+    def seconds(self, intent, rotations=None, degrees=None):
+        """
+        Predicted seconds until the gadget answers a directive, or None
+        if there is no telling
+        """
+        if intent == 'move_robot':
+            if rotations is None:
+                rotations = self.model['default_rotations']
+
+            return self.legs(rotations, 0, 1)
+
+        if intent == 'turn_robot':
+            if degrees is None:
+                degrees = self.model['default_degrees']
+
+            return self.legs(0, degrees, 1)
+
+        if intent in ('walk_perimeter', 'calibrate_turns'):
+            return self.plan(intent)
+
+        if intent == 'go_to_position':
+            return self.go_to()
+
+        return ACK_SECONDS
+
+
+    def search(self, pattern=None):
+        """
+        Seconds for a search with pattern (None: the gadget's default),
+        or None if it has no plan (spiral and coverage searches run
+        until the subject is found)
+        """
+        return self.plan(pattern or self.model['search_pattern'])
+
+
+def wait_seconds(seconds):
+    """
+    How long to wait for a mission predicted to take seconds (None:
+    unknown)
+    """
+    if seconds is None:
+        return MAX_EXPIRATION_MS/1000.0
+
+    return seconds*MARGIN+SLACK_SECONDS
+
+
+def expiration_ms(wait):
+    """
+    Event handler expiration (ms) for waiting wait seconds, within what
+    Alexa allows ... a longer wait is covered by re-arming the handler
+    when it expires
+    """
+    return int(min(MAX_EXPIRATION_MS, max(MIN_EXPIRATION_MS, math.ceil(wait*1000))))
@@ -2,6 +2,7 @@ import logging.handlers
 import requests 
 import uuid 
 import random
+import time
  
 from ask_sdk_core.skill_builder import SkillBuilder 
 from ask_sdk_core.utils import is_request_type, is_intent_name 
@@ -20,6 +21,15 @@ from ask_sdk_model.interfaces.custom_interface_controller import (
 ) 
 
 import data
+import estimator
+
+
+##
+## what the gadget may send, unasked, while a search or a walk is
+## running ... the handler started with those missions listens for
+## these as well as for its own answer
+##
+MISSION_EVENTS = ['EV3ResponseAfterSubjectFound', 'EV3ResponseAfterKillSwitch']
 
 logger = logging.getLogger() 
 logger.setLevel(logging.INFO) 
@@ -79,6 +89,22 @@ def custom_interface_event_handler(handler_input: HandlerInput):
     namespace = custom_event.header.namespace
     name = custom_event.header.name
 
+    ##
+    ## the gadget's timings and plans, for sizing the next event
+    ## handler (estimator.py)
+    ##
+    if 'model' in payload:
+        session_attr['mission_model'] = payload['model']
+
+    ##
+    ## a search keeps going (and the handler keeps listening for a
+    ## find) after the gadget has said it started
+    ##
+    if name == 'EV3ResponseAfterStartSearch' and 'mission' in session_attr:
+        session_attr['mission']['event'] = MISSION_EVENTS
+    else:
+        session_attr.pop('mission', None)
+
     ## 
     ## this is probably the wrong place to start interacting with the
     ## user ... going to use this for cloud status updates only
@@ -170,6 +196,11 @@ def custom_interface_event_handler(handler_input: HandlerInput):
             ##
             logger.info("== EV3 responded after killswitch: %s ==", payload['report'])
 
+            if 'stop_time_ms' in payload:
+                logger.info("== EV3 motors off %s ms after receipt, teardown %s ms (deadline %s ms, met: %s) ==",
+                            payload['stop_time_ms'], payload['teardown_time_ms'],
+                            payload['deadline_ms'], payload['deadline_met'])
+
             confirmation = random.choice(data.CONFIRMATIONS)
             message = data.AFTER_KILLSWITCH_MESSAGE
             action_question = random.choice(data.ACTION_QUESTIONS)
@@ -192,6 +223,65 @@ def custom_interface_event_handler(handler_input: HandlerInput):
 
             response_builder.speak(msg).set_should_end_session(False) 
 
+        elif name == 'EV3ResponseAfterGoToPosition':
+            ##
+            ## On receipt of 'Custom.EV3SearchGadget.EV3Response' event, speak the report
+            ##
+            logger.info("== EV3 responded after go to position: %s (node %s after %s legs) ==",
+                        payload['report'], payload.get('position'), payload.get('legs'))
+
+            confirmation = random.choice(data.CONFIRMATIONS)
+            if payload.get('arrived', True):
+                message = data.AFTER_GO_TO_POSITION_MESSAGE
+            else:
+                message = data.GO_TO_POSITION_STOPPED_MESSAGE
+            action_question = random.choice(data.ACTION_QUESTIONS)
+
+            msg = ' '.join([confirmation, message, action_question])
+
+            response_builder.speak(msg).set_should_end_session(False)
+
+        elif name == 'EV3ResponseAfterCalibrateTurns':
+            ##
+            ## On receipt of 'Custom.EV3SearchGadget.EV3Response' event, speak the report
+            ##
+            logger.info("== EV3 responded after calibrate turns: %s (mean lead %s degrees) ==",
+                        payload['report'], payload.get('mean_lead'))
+
+            confirmation = random.choice(data.CONFIRMATIONS)
+            if payload.get('calibrated', True):
+                message = data.AFTER_CALIBRATE_TURNS_MESSAGE
+            else:
+                message = data.CALIBRATE_TURNS_STOPPED_MESSAGE
+            action_question = random.choice(data.ACTION_QUESTIONS)
+
+            msg = ' '.join([confirmation, message, action_question])
+
+            response_builder.speak(msg).set_should_end_session(False)
+
+        elif name == 'EV3ResponseAfterSubjectFound':
+            ##
+            ## On receipt of 'Custom.EV3SearchGadget.EV3Response' event, speak the report
+            ##
+            logger.info("== EV3 responded after subject found: %s (%s ft east, %s ft south) ==",
+                        payload['report'], payload.get('east_feet'), payload.get('south_feet'))
+
+            if payload.get('east_feet') is not None:
+                message = data.AFTER_SUBJECT_FOUND_MESSAGE.format(payload['east_feet'], payload['south_feet'])
+            else:
+                message = data.SUBJECT_FOUND_MESSAGE
+            action_question = random.choice(data.ACTION_QUESTIONS)
+
+            msg = ' '.join([message, action_question])
+
+            ##
+            ## the search is over, so is the handler listening for it
+            ##
+            (response_builder
+                .add_directive(build_stop_event_handler_directive(session_attr['token']))
+                .speak(msg)
+                .set_should_end_session(False))
+
     return response_builder.response
 
 
@@ -259,11 +349,17 @@ def launch_request_handler(handler_input: HandlerInput):
     ##
     no_response_msg = random.choice(data.NO_RESPONSE_MESSAGES)
 
+    ##
+    ## wait about as long as the mission should take
+    ##
+    mission = estimator.MissionEstimator(session_attr.get('mission_model'))
+    expiration = mission_expiration(session_attr, 'EV3ResponseAfterLaunch', mission.seconds('launch'))
+
     return (response_builder 
             .speak(w_msg)
             .ask(reprompt_msg)
             .add_directive(build_ev3_directive(endpoint_id, payload))
-            .add_directive(build_start_event_handler_directive(session_attr['token'], 90000,
+            .add_directive(build_start_event_handler_directive(session_attr['token'], expiration,
                                                                'Custom.EV3SearchGadget', 'EV3ResponseAfterLaunch',
                                                                FilterMatchAction.SEND_AND_TERMINATE,
                                                                {'data': no_response_msg}))
@@ -330,10 +426,16 @@ def move_robot_intent_handler(handler_input: HandlerInput):
 
     no_response_msg = random.choice(data.NO_RESPONSE_MESSAGES)
 
+    ##
+    ## wait about as long as the mission should take
+    ##
+    mission = estimator.MissionEstimator(session_attr.get('mission_model'))
+    expiration = mission_expiration(session_attr, 'EV3ResponseAfterMove', mission.seconds('move_robot', rotations=slot_number(slots, 'BowStearnDuration')))
+
     return (response_builder 
             .speak(msg)
             .add_directive(build_ev3_directive(endpoint_id, payload))
-            .add_directive(build_start_event_handler_directive(session_attr['token'], 90000,
+            .add_directive(build_start_event_handler_directive(session_attr['token'], expiration,
                                                                'Custom.EV3SearchGadget', 'EV3ResponseAfterMove',
                                                                FilterMatchAction.SEND_AND_TERMINATE,
                                                                {'data': no_response_msg}))
@@ -396,10 +498,16 @@ def turn_robot_intent_handler(handler_input: HandlerInput):
 
     no_response_msg = random.choice(data.NO_RESPONSE_MESSAGES)
 
+    ##
+    ## wait about as long as the mission should take
+    ##
+    mission = estimator.MissionEstimator(session_attr.get('mission_model'))
+    expiration = mission_expiration(session_attr, 'EV3ResponseAfterTurn', mission.seconds('turn_robot', degrees=slot_number(slots, 'PortStarboardDuration')))
+
     return (response_builder 
             .speak(msg)
             .add_directive(build_ev3_directive(endpoint_id, payload))
-            .add_directive(build_start_event_handler_directive(session_attr['token'], 90000,
+            .add_directive(build_start_event_handler_directive(session_attr['token'], expiration,
                                                                'Custom.EV3SearchGadget', 'EV3ResponseAfterTurn',
                                                                FilterMatchAction.SEND_AND_TERMINATE,
                                                                {'data': no_response_msg}))
@@ -430,26 +538,51 @@ def start_search_intent_handler(handler_input: HandlerInput):
     response_builder = handler_input.response_builder 
  
     ##
-    ## build payload
+    ## get slots
+    ##
+    slots=handler_input.request_envelope.request.intent.slots
+
+    ##
+    ## build payload ... a named search pattern is sent by its gadget
+    ## name, otherwise the gadget uses its default (search_pattern)
     ##
     payload = {
         'intent' : 'start_search'
     }
 
+    mission = estimator.MissionEstimator(session_attr.get('mission_model'))
+
+    pattern = None
+    if slots is not None and 'SearchPattern' in slots:
+        pattern = get_search_pattern(slots['SearchPattern'].value)
 
-    affirmation = random.choice(data.AFFIRMATIONS)
     message = data.START_SEARCH_MESSAGE
 
+    if pattern is not None:
+        payload['pattern'] = pattern
+
+        message = data.START_PATTERN_SEARCH_MESSAGE.format(data.SEARCH_PATTERN_NAMES[pattern])
+
+    affirmation = random.choice(data.AFFIRMATIONS)
+
     msg = ' '.join([affirmation, message])
 
     no_response_msg = random.choice(data.NO_RESPONSE_MESSAGES)
 
+    ##
+    ## the gadget answers as soon as the search has started, then
+    ## again if it finds the subject ... keep listening (SEND, not
+    ## terminate) for about as long as the search should take
+    ##
+    events = ['EV3ResponseAfterStartSearch']+MISSION_EVENTS
+    expiration = mission_expiration(session_attr, events, mission.search(pattern))
+
     return (response_builder 
             .speak(msg)
             .add_directive(build_ev3_directive(endpoint_id, payload))
-            .add_directive(build_start_event_handler_directive(session_attr['token'], 90000,
-                                                               'Custom.EV3SearchGadget', 'EV3ResponseAfterStartSearch',
-                                                               FilterMatchAction.SEND_AND_TERMINATE,
+            .add_directive(build_start_event_handler_directive(session_attr['token'], expiration,
+                                                               'Custom.EV3SearchGadget', events,
+                                                               FilterMatchAction.SEND,
                                                                {'data': no_response_msg}))
             .response)
 
@@ -490,11 +623,19 @@ def walk_perimeter_intent_handler(handler_input: HandlerInput):
 
     no_response_msg = random.choice(data.NO_RESPONSE_MESSAGES)
 
+    ##
+    ## wait about as long as the mission should take
+    ##
+    mission = estimator.MissionEstimator(session_attr.get('mission_model'))
+
+    events = ['EV3ResponseAfterWalkPerimeter']+MISSION_EVENTS
+    expiration = mission_expiration(session_attr, events, mission.seconds('walk_perimeter'))
+
     return (response_builder 
             .speak(msg)
             .add_directive(build_ev3_directive(endpoint_id, payload))
-            .add_directive(build_start_event_handler_directive(session_attr['token'], 90000,
-                                                               'Custom.EV3SearchGadget', 'EV3ResponseAfterWalkPerimeter',
+            .add_directive(build_start_event_handler_directive(session_attr['token'], expiration,
+                                                               'Custom.EV3SearchGadget', events,
                                                                FilterMatchAction.SEND_AND_TERMINATE,
                                                                {'data': no_response_msg}))
             .response)
@@ -543,10 +684,16 @@ def pause_robot_intent_handler(handler_input: HandlerInput):
 
     no_response_msg = random.choice(data.NO_RESPONSE_MESSAGES)
 
+    ##
+    ## wait about as long as the mission should take
+    ##
+    mission = estimator.MissionEstimator(session_attr.get('mission_model'))
+    expiration = mission_expiration(session_attr, 'EV3ResponseAfterPause', mission.seconds('pause_robot'))
+
     return (response_builder 
             .speak(msg)
             .add_directive(build_ev3_directive(endpoint_id, payload))
-            .add_directive(build_start_event_handler_directive(session_attr['token'], 90000,
+            .add_directive(build_start_event_handler_directive(session_attr['token'], expiration,
                                                                'Custom.EV3SearchGadget', 'EV3ResponseAfterPause',
                                                                FilterMatchAction.SEND_AND_TERMINATE,
                                                                {'data': no_response_msg}))
@@ -596,10 +743,16 @@ def killswitch_intent_handler(handler_input: HandlerInput):
 
     no_response_msg = random.choice(data.NO_RESPONSE_MESSAGES)
 
+    ##
+    ## wait about as long as the mission should take
+    ##
+    mission = estimator.MissionEstimator(session_attr.get('mission_model'))
+    expiration = mission_expiration(session_attr, 'EV3ResponseAfterKillSwitch', mission.seconds('killswitch'))
+
     return (response_builder 
             .speak(msg)
             .add_directive(build_ev3_directive(endpoint_id, payload))
-            .add_directive(build_start_event_handler_directive(session_attr['token'], 90000,
+            .add_directive(build_start_event_handler_directive(session_attr['token'], expiration,
                                                                'Custom.EV3SearchGadget', 'EV3ResponseAfterKillSwitch',
                                                                FilterMatchAction.SEND_AND_TERMINATE,
                                                                {'data': no_response_msg}))
@@ -624,6 +777,28 @@ def custom_interface_expiration_handler(handler_input):
     session_attr = handler_input.attributes_manager.session_attributes 
     endpoint_id = session_attr['endpointId'] 
 
+    ##
+    ## a mission predicted to outlast the longest event handler Alexa
+    ## allows ... keep listening for its answer until it should be over
+    ##
+    mission = session_attr.get('mission')
+
+    if mission is not None and mission['end']-time.time() >= 1:
+        wait = mission['end']-time.time()
+
+        logger.info("== still expecting %s, waiting another %.1f seconds ==", mission['event'], wait)
+
+        session_attr['token'] = create_token()
+
+        return (response_builder 
+                .add_directive(build_start_event_handler_directive(session_attr['token'], estimator.expiration_ms(wait),
+                                                                   'Custom.EV3SearchGadget', mission['event'],
+                                                                   FilterMatchAction.SEND_AND_TERMINATE,
+                                                                   request.expiration_payload))
+                .response)
+
+    session_attr.pop('mission', None)
+
     payload = {
         'intent' : 'expired'
     }
@@ -820,6 +995,13 @@ def build_start_event_handler_directive( token, duration_ms,
 
     logger.info("== build_start_event_handler_directive ==")
 
+    ##
+    ## name is one event name, or a list of them
+    ##
+    if isinstance(name, list):
+        match_name = {'in': [{'var': 'header.name'}, name]}
+    else:
+        match_name = {'==': [{'var': 'header.name'}, name]}
 
     return StartEventHandlerDirective( 
         token=token, 
@@ -827,7 +1009,7 @@ def build_start_event_handler_directive( token, duration_ms,
             filter_expression={ 
                 'and': [ 
                     {'==': [{'var': 'header.namespace'}, namespace]}, 
-                    {'==': [{'var': 'header.name'}, name]} 
+                    match_name
                 ] 
             }, 
             filter_match_action=filter_match_action 
@@ -835,7 +1017,37 @@ def build_start_event_handler_directive( token, duration_ms,
         expiration=Expiration( 
             duration_in_milliseconds=duration_ms, 
             expiration_payload=expiration_payload)) 
- 
+
+
+def mission_expiration(session_attr, name, seconds):
+    """
+    Event handler expiration (ms) for the answer (event name, or
+    list of names) to a mission predicted to take seconds (None if
+    unknown).  A mission
+    that runs longer than one handler may wait is remembered, so the
+    handler is started again when it expires
+    """
+    wait = estimator.wait_seconds(seconds)
+
+    if seconds is not None:
+        session_attr['mission'] = {'event' : name, 'end' : time.time()+wait}
+    else:
+        session_attr.pop('mission', None)
+
+    logger.info("== expecting %s in %s seconds, waiting %.1f seconds ==", name, seconds, wait)
+
+    return estimator.expiration_ms(wait)
+
+
+def slot_number(slots, name):
+    """
+    Integer value of a slot, or None if it was not given
+    """
+    try:
+        return int(slots[name].value)
+    except Exception:
+        return None
+
  
 ############################################################################## 
 ############################################################################## 
@@ -898,25 +1110,7 @@ def set_grid_intent_handler(handler_input):
 
     if 'GridPositionCardinal' in slots:
 
-        position = None
-        if slots['GridPositionCardinal'].value in data.NORTHWEST_CARDINAL_VALUES:
-            position = 0
-        elif slots['GridPositionCardinal'].value in data.NORTH_CARDINAL_VALUES:
-            position = 1
-        elif slots['GridPositionCardinal'].value in data.NORTHEAST_CARDINAL_VALUES:
-            position = 2
-        elif slots['GridPositionCardinal'].value in data.WEST_CARDINAL_VALUES:
-            position = 3
-        elif slots['GridPositionCardinal'].value in data.CENTER_CARDINAL_VALUES:
-            position = 4
-        elif slots['GridPositionCardinal'].value in data.EAST_CARDINAL_VALUES:
-            position = 5
-        elif slots['GridPositionCardinal'].value in data.SOUTHWEST_CARDINAL_VALUES:
-            position = 6
-        elif slots['GridPositionCardinal'].value in data.SOUTH_CARDINAL_VALUES:
-            position = 7
-        elif slots['GridPositionCardinal'].value in data.SOUTHEAST_CARDINAL_VALUES:
-            position = 8
+        position = get_cardinal_position(slots['GridPositionCardinal'].value)
 
         if position is not None:
             payload['position'] = position
@@ -930,16 +1124,211 @@ def set_grid_intent_handler(handler_input):
 
     no_response_msg = random.choice(data.NO_RESPONSE_MESSAGES)
 
+    ##
+    ## wait about as long as the mission should take
+    ##
+    mission = estimator.MissionEstimator(session_attr.get('mission_model'))
+    expiration = mission_expiration(session_attr, 'EV3ResponseAfterSetGrid', mission.seconds('set_grid'))
+
     return (response_builder 
             .speak(msg)
             .add_directive(build_ev3_directive(endpoint_id, payload))
-            .add_directive(build_start_event_handler_directive(session_attr['token'], 90000,
+            .add_directive(build_start_event_handler_directive(session_attr['token'], expiration,
                                                                'Custom.EV3SearchGadget', 'EV3ResponseAfterSetGrid',
                                                                FilterMatchAction.SEND_AND_TERMINATE,
                                                                {'data': no_response_msg}))
             .response)
 
 
+############################################################################## 
+############################################################################## 
+## 
+## CARDINAL POSITIONS
+## 
+############################################################################## 
+############################################################################## 
+ 
+ 
+def get_cardinal_position(value):
+    """
+    Cardinal position number (0 northwest ... 8 southeast) for a
+    GridPositionCardinal slot value, or None
+    """
+    if value in data.NORTHWEST_CARDINAL_VALUES:
+        return 0
+    elif value in data.NORTH_CARDINAL_VALUES:
+        return 1
+    elif value in data.NORTHEAST_CARDINAL_VALUES:
+        return 2
+    elif value in data.WEST_CARDINAL_VALUES:
+        return 3
+    elif value in data.CENTER_CARDINAL_VALUES:
+        return 4
+    elif value in data.EAST_CARDINAL_VALUES:
+        return 5
+    elif value in data.SOUTHWEST_CARDINAL_VALUES:
+        return 6
+    elif value in data.SOUTH_CARDINAL_VALUES:
+        return 7
+    elif value in data.SOUTHEAST_CARDINAL_VALUES:
+        return 8
+
+    return None
+
+
+def get_position_number(number):
+    """
+    Position number (0 northwest ... 8 southeast) for a spoken
+    GridPosition number, or None if it is not one of the nine
+    """
+    if number is not None and 0 <= number <= 8:
+        return number
+
+    return None
+
+
+def get_search_pattern(value):
+    """
+    Gadget search pattern name for a SearchPattern slot value, or None
+    """
+    for pattern, values in data.SEARCH_PATTERN_VALUES.items():
+        if value in values:
+            return pattern
+
+    return None
+
+
+############################################################################## 
+############################################################################## 
+## 
+## GO TO POSITION
+## 
+############################################################################## 
+############################################################################## 
+ 
+ 
+@skill_builder.request_handler(can_handle_func=is_intent_name("GoToPositionIntent")) 
+def go_to_position_intent_handler(handler_input): 
+    logger.info("== GoToPositionIntent received ==") 
+ 
+    ##
+    ## Retrieve the stored gadget endpoint ID from the SessionAttributes. 
+    ##
+    session_attr = handler_input.attributes_manager.session_attributes 
+    endpoint_id = session_attr['endpointId'] 
+
+    session_attr['token'] = create_token()
+
+    response_builder = handler_input.response_builder 
+ 
+    ##
+    ## get slots
+    ##
+    slots=handler_input.request_envelope.request.intent.slots
+
+    ##
+    ## a cardinal name or a spoken number, both as the position number
+    ## set grid position takes (0 northwest ... 8 southeast), which the
+    ## gadget turns into a node of its grid
+    ##
+    position = None
+
+    if 'GridPositionCardinal' in slots:
+        position = get_cardinal_position(slots['GridPositionCardinal'].value)
+
+    if position is None:
+        position = get_position_number(slot_number(slots, 'GridPosition'))
+
+    if position is None:
+        reprompt_msg = random.choice(data.REPROMPT_MESSAGES)
+
+        return (response_builder
+                .speak(data.GO_TO_POSITION_UNKNOWN_MESSAGE)
+                .ask(reprompt_msg)
+                .response)
+
+    payload = {
+        'intent' : 'go_to_position',
+        'slots' : slots,
+        'position' : position
+    }
+
+    affirmation = random.choice(data.AFFIRMATIONS)
+    message = data.GO_TO_POSITION_MESSAGE.format(data.CARDINAL_POSITIONS[position]) 
+
+    msg = ' '.join([affirmation, message])
+
+    no_response_msg = random.choice(data.NO_RESPONSE_MESSAGES)
+
+    ##
+    ## wait about as long as the mission should take
+    ##
+    mission = estimator.MissionEstimator(session_attr.get('mission_model'))
+    expiration = mission_expiration(session_attr, 'EV3ResponseAfterGoToPosition', mission.seconds('go_to_position'))
+
+    return (response_builder 
+            .speak(msg)
+            .add_directive(build_ev3_directive(endpoint_id, payload))
+            .add_directive(build_start_event_handler_directive(session_attr['token'], expiration,
+                                                               'Custom.EV3SearchGadget', 'EV3ResponseAfterGoToPosition',
+                                                               FilterMatchAction.SEND_AND_TERMINATE,
+                                                               {'data': no_response_msg}))
+            .response)
+
+
+############################################################################## 
+############################################################################## 
+## 
+## CALIBRATE TURNS
+## 
+############################################################################## 
+############################################################################## 
+ 
+ 
+@skill_builder.request_handler(can_handle_func=is_intent_name("CalibrateTurnsIntent")) 
+def calibrate_turns_intent_handler(handler_input): 
+    logger.info("== CalibrateTurnsIntent received ==") 
+ 
+    ##
+    ## Retrieve the stored gadget endpoint ID from the SessionAttributes. 
+    ##
+    session_attr = handler_input.attributes_manager.session_attributes 
+    endpoint_id = session_attr['endpointId'] 
+
+    session_attr['token'] = create_token()
+
+    response_builder = handler_input.response_builder 
+ 
+    ##
+    ## build payload
+    ##
+    payload = {
+        'intent' : 'calibrate_turns'
+    }
+
+    affirmation = random.choice(data.AFFIRMATIONS)
+    message = data.CALIBRATE_TURNS_MESSAGE
+
+    msg = ' '.join([affirmation, message])
+
+    no_response_msg = random.choice(data.NO_RESPONSE_MESSAGES)
+
+    ##
+    ## wait about as long as the mission should take
+    ##
+    mission = estimator.MissionEstimator(session_attr.get('mission_model'))
+    expiration = mission_expiration(session_attr, 'EV3ResponseAfterCalibrateTurns', mission.seconds('calibrate_turns'))
+
+    return (response_builder 
+            .speak(msg)
+            .add_directive(build_ev3_directive(endpoint_id, payload))
+            .add_directive(build_start_event_handler_directive(session_attr['token'], expiration,
+                                                               'Custom.EV3SearchGadget', 'EV3ResponseAfterCalibrateTurns',
+                                                               FilterMatchAction.SEND_AND_TERMINATE,
+                                                               {'data': no_response_msg}))
+            .response)
+
+
 ############################################################################## 
 ############################################################################## 
 ## 
@@ -0,0 +1,7 @@
+import os
+import sys
+
+##
+## the skill modules import each other by name, as Lambda runs them
+##
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
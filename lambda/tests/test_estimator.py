@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import estimator
+from estimator import MissionEstimator
+
+
+##
+## as sent by EV3SearchGadget.mission_model
+##
+MODEL = {
+    'seconds_per_rotation' : 0.4,
+    'search_seconds_per_rotation' : 0.8,
+    'seconds_per_turn' : 2.0,
+    'leg_gap' : 0.5,
+    'search_pattern' : 'lawnmower',
+    'plans' : {
+        'walk_perimeter' : [32, 360, 8],
+        'calibrate_turns' : [0, 720, 8],
+        'lawnmower' : [100, 900, 20]
+    }
+}
+
+
+class MissionEstimatorTest(unittest.TestCase):
+
+    def test_moves_and_turns(self):
+        e = MissionEstimator()
+
+        ##
+        ## the gadget's defaults: 10 rotations at 0.5 s, 90 degrees in 1 s
+        ##
+        self.assertAlmostEqual(e.seconds('move_robot'), 10*0.5+0.25)
+        self.assertAlmostEqual(e.seconds('move_robot', rotations=-4), 4*0.5+0.25)
+        self.assertAlmostEqual(e.seconds('turn_robot'), 1.0+0.25)
+        self.assertAlmostEqual(e.seconds('turn_robot', degrees=-180), 2.0+0.25)
+
+        self.assertEqual(e.seconds('pause_robot'), estimator.ACK_SECONDS)
+
+    def test_no_plan_without_a_model(self):
+        e = MissionEstimator()
+
+        self.assertIsNone(e.seconds('walk_perimeter'))
+        self.assertIsNone(e.search())
+        self.assertEqual(estimator.wait_seconds(None), estimator.MAX_EXPIRATION_MS/1000.0)
+
+    def test_plans_from_the_gadget(self):
+        e = MissionEstimator(MODEL)
+
+        ##
+        ## the walk drives at the search speed
+        ##
+        self.assertAlmostEqual(e.seconds('walk_perimeter'), 32*0.8+4*2.0+8*0.5)
+        self.assertAlmostEqual(e.seconds('calibrate_turns'), 8*2.0+8*0.5)
+        self.assertAlmostEqual(e.search(), 100*0.8+10*2.0+20*0.5)
+        self.assertIsNone(e.search('spiral'))
+
+        ##
+        ## moves still use the default speed
+        ##
+        self.assertAlmostEqual(e.seconds('move_robot', rotations=10), 10*0.4+0.5)
+
+    def test_unknown_values_keep_the_defaults(self):
+        e = MissionEstimator({'seconds_per_turn' : None, 'plans' : {'walk_perimeter' : [10, 0, 1]}})
+
+        self.assertEqual(e.model['seconds_per_turn'], 1.0)
+
+        ##
+        ## no search speed measured yet: the default one
+        ##
+        self.assertAlmostEqual(e.seconds('walk_perimeter'), 10*0.5+0.25)
+
+    def test_go_to(self):
+        e = MissionEstimator()
+
+        ##
+        ## 10 + 10 ft along the grid lines, two turns
+        ##
+        self.assertAlmostEqual(e.seconds('go_to_position'), 240/3.75*0.5+2.0+0.5)
+
+    def test_expiration(self):
+        self.assertAlmostEqual(estimator.wait_seconds(10), 10*estimator.MARGIN+estimator.SLACK_SECONDS)
+
+        self.assertEqual(estimator.expiration_ms(1), estimator.MIN_EXPIRATION_MS)
+        self.assertEqual(estimator.expiration_ms(20.0001), 20001)
+        self.assertEqual(estimator.expiration_ms(1000), estimator.MAX_EXPIRATION_MS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import unittest
+
+try:
+    from ask_sdk_core.handler_input import HandlerInput
+    from ask_sdk_core.attributes_manager import AttributesManager
+    from ask_sdk_model import RequestEnvelope, IntentRequest, Intent, Slot, Session
+    from ask_sdk_model.interfaces.custom_interface_controller import SendDirectiveDirective
+
+    import function
+
+except ImportError:
+    function = None
+
+
+def intent(name, slots, session=None):
+    """
+    HandlerInput for an intent request with the given slot values
+    """
+    attributes = {'endpointId' : 'amzn1.ask.endpoint.test'}
+    attributes.update(session or {})
+
+    envelope = RequestEnvelope( request=IntentRequest( intent=Intent( name=name,
+                                                                      slots=dict( (k, Slot(name=k, value=v))
+                                                                                  for k, v in slots.items() ) ) ),
+                                session=Session(attributes=attributes) )
+
+    return HandlerInput( request_envelope=envelope,
+                         attributes_manager=AttributesManager(request_envelope=envelope) )
+
+
+def handle(handler_input):
+    for handler in function.skill_builder.request_handlers:
+        if handler.can_handle(handler_input):
+            return handler.handle(handler_input)
+
+    raise AssertionError('no handler')
+
+
+def gadget_payload(response):
+    for directive in response.directives or []:
+        if isinstance(directive, SendDirectiveDirective):
+            return directive.payload
+
+    return None
+
+
+@unittest.skipIf(function is None, 'needs ask_sdk_core (lambda/requirements.txt)')
+class GoToPositionTest(unittest.TestCase):
+
+    def test_position_number(self):
+        self.assertEqual(function.get_position_number(0), 0)
+        self.assertEqual(function.get_position_number(8), 8)
+        self.assertIsNone(function.get_position_number(9))
+        self.assertIsNone(function.get_position_number(-1))
+        self.assertIsNone(function.get_position_number(None))
+
+    def test_cardinal(self):
+        response = handle(intent('GoToPositionIntent', {'GridPositionCardinal' : 'south', 'GridPosition' : None}))
+
+        self.assertEqual(gadget_payload(response)['position'], 7)
+        self.assertIn('south', response.output_speech.ssml)
+        self.assertNotIn('None', response.output_speech.ssml)
+
+    def test_number(self):
+        response = handle(intent('GoToPositionIntent', {'GridPositionCardinal' : None, 'GridPosition' : '2'}))
+
+        self.assertEqual(gadget_payload(response)['position'], 2)
+        self.assertIn('northeast', response.output_speech.ssml)
+
+    def test_nothing_understood(self):
+        for slots in ({'GridPositionCardinal' : None, 'GridPosition' : None},
+                      {'GridPositionCardinal' : 'upstairs', 'GridPosition' : '12'}):
+            response = handle(intent('GoToPositionIntent', slots))
+
+            self.assertIsNone(gadget_payload(response))
+            self.assertNotIn('None', response.output_speech.ssml)
+            self.assertFalse(response.should_end_session)
+
+
+if __name__ == '__main__':
+    unittest.main()
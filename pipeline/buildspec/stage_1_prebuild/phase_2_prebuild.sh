@@ -14,6 +14,7 @@ REQUIREMENTS_PATH="lambda/requirements.txt"
 FUNCTION_PATH="lambda"
 FUNCTION_EXE="function.py"
 FUNCTION_DATA_CONF="data.py"
+FUNCTION_ESTIMATOR="estimator.py"
 SKILL_ZIP_PATH="../../skill-code.zip"
 
 mkdir $CODEBUILD_SRC_DIR/$SKILL_PATH
@@ -25,6 +26,9 @@ cp $CODEBUILD_SRC_DIR/$FUNCTION_PATH/$FUNCTION_EXE $CODEBUILD_SRC_DIR/$SKILL_PAT
 echo '[+] Copying data config into skill path'
 cp $CODEBUILD_SRC_DIR/$FUNCTION_PATH/$FUNCTION_DATA_CONF $CODEBUILD_SRC_DIR/$SKILL_PATH
 
+echo '[+] Copying mission estimator into skill path'
+cp $CODEBUILD_SRC_DIR/$FUNCTION_PATH/$FUNCTION_ESTIMATOR $CODEBUILD_SRC_DIR/$SKILL_PATH
+
 echo '[+] Running zip -r'
 
 cd $CODEBUILD_SRC_DIR/$SKILL_PATH